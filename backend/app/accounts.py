@@ -0,0 +1,288 @@
+# app/accounts.py
+"""
+Удаление аккаунта и выгрузка данных пользователя (GDPR).
+
+Удаление в два этапа:
+
+1. request_deletion() — в запросе, несколько точечных UPDATE/DELETE:
+   email заменяется заглушкой (старый токен и логин перестают работать),
+   объявления снимаются с публикации, карточка ученика удаляется, матчи
+   гасятся. Пользователь сразу пропадает из лент.
+2. Фоновый воркер "account-deletion" удаляет остальное set-based DELETE'ами
+   пачками по ACCOUNT_DELETE_BATCH_SIZE строк, каждая пачка — отдельная
+   короткая транзакция. Строки не грузятся в сессию, ORM-каскады User
+   не участвуют; последней удаляется сама строка users.
+
+Шаги идемпотентны: если процесс упал посреди удаления, следующий проход
+продолжит с того же места.
+
+Экспорт — генератор NDJSON-строк: каждая таблица читается через yield_per,
+в памяти одновременно держится не больше одной пачки.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import and_, delete, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.events import emit
+from app.models import (
+    Block,
+    IdempotencyKey,
+    IncomingLike,
+    Listing,
+    Match,
+    Message,
+    MessageArchive,
+    NotificationOutbox,
+    StudentCard,
+    Swipe,
+    SwipeArchive,
+    User,
+    UserDailyStats,
+    UserPreference,
+    user_preference_types,
+    user_subject,
+)
+from app.shards import ShardSessions, group_by_shard
+from app.workers import BackgroundWorker
+
+BATCH_SIZE = int(os.getenv("ACCOUNT_DELETE_BATCH_SIZE", "500"))
+EXPORT_CHUNK = 500
+INTERVAL = float(os.getenv("ACCOUNT_DELETE_INTERVAL", "60"))
+
+
+def _placeholder_email(user_id: int) -> str:
+    return f"deleted+{user_id}@korfinder.invalid"
+
+
+def request_deletion(db: Session, user: User) -> None:
+    """Этап 1: «гасим» аккаунт сразу (без commit). Остальное — воркер."""
+    now = datetime.utcnow()
+    user.deleted_at = now
+    user.email = _placeholder_email(user.id)
+    user.hashed_password = ""
+    db.execute(
+        update(Listing)
+        .where(Listing.owner_id == user.id)
+        .values(is_published=False)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(StudentCard).where(StudentCard.user_id == user.id))
+    db.execute(
+        update(Match)
+        .where(or_(Match.user1_id == user.id, Match.user2_id == user.id), Match.is_active == True)  # noqa: E712
+        .values(is_active=False, deactivated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    emit(db, "account.deleted", user_id=user.id)
+
+
+# --- Удаление пачками --------------------------------------------------------
+
+
+def _batched(db: Session, model, where, batch_size: int) -> int:
+    """DELETE ... WHERE id IN (SELECT id ... LIMIT n) до опустошения, commit на пачку."""
+    total = 0
+    while True:
+        ids = list(db.execute(select(model.id).where(where).limit(batch_size)).scalars())
+        if not ids:
+            return total
+        db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        total += len(ids)
+
+
+def _user_matches(user_id: int):
+    return select(Match.id).where(or_(Match.user1_id == user_id, Match.user2_id == user_id))
+
+
+def delete_account_data(db: Session, user_id: int, *, batch_size: int = BATCH_SIZE) -> int:
+    """Этап 2: удаляет все данные пользователя. Возвращает число удалённых строк."""
+    deleted = 0
+    # свайпы и сообщения могут лежать в шардах (app.shards) — id матчей берём заранее
+    match_ids = group_by_shard(db.execute(_user_matches(user_id)).scalars())
+    with ShardSessions(db) as shards:
+        # сначала сообщения — на них ссылаются матчи пользователя
+        for index, shard in shards.each():
+            for model in (Message, MessageArchive):
+                deleted += _batched(
+                    shard,
+                    model,
+                    or_(model.match_id.in_(match_ids.get(index, [])), model.sender_id == user_id),
+                    batch_size,
+                )
+        deleted += _batched(db, Match, or_(Match.user1_id == user_id, Match.user2_id == user_id), batch_size)
+        # лайки пользователю есть в любом шарде
+        for _, shard in shards.each():
+            for model in (Swipe, SwipeArchive):
+                deleted += _batched(
+                    shard, model, or_(model.from_user_id == user_id, model.to_user_id == user_id), batch_size
+                )
+    deleted += _batched(db, Listing, Listing.owner_id == user_id, batch_size)
+    deleted += _batched(db, NotificationOutbox, NotificationOutbox.recipient_id == user_id, batch_size)
+
+    # у одного пользователя здесь единицы строк — хватает одного DELETE
+    for stmt in (
+        delete(user_preference_types).where(user_preference_types.c.user_id == user_id),
+        delete(UserPreference).where(UserPreference.user_id == user_id),
+        delete(user_subject).where(user_subject.c.user_id == user_id),
+        delete(StudentCard).where(StudentCard.user_id == user_id),
+        delete(UserDailyStats).where(UserDailyStats.user_id == user_id),
+        delete(Block).where(or_(Block.blocker_id == user_id, Block.blocked_id == user_id)),
+        delete(IncomingLike).where(
+            or_(IncomingLike.to_user_id == user_id, IncomingLike.from_user_id == user_id)
+        ),
+        delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id),
+        delete(User).where(User.id == user_id),
+    ):
+        deleted += db.execute(stmt.execution_options(synchronize_session=False)).rowcount
+    db.commit()
+    return deleted
+
+
+def _job() -> bool:
+    with SessionLocal() as db:
+        user_id = db.execute(
+            select(User.id).where(User.deleted_at.isnot(None)).order_by(User.deleted_at).limit(1)
+        ).scalar()
+        if user_id is None:
+            return False
+        delete_account_data(db, user_id)
+    # удалили одного — возможно, в очереди есть ещё
+    return True
+
+
+worker = BackgroundWorker("account-deletion", _job, interval=INTERVAL)
+
+
+# --- Экспорт ----------------------------------------------------------------
+
+
+def _line(kind: str, data: dict) -> str:
+    return json.dumps({"type": kind, **data}, ensure_ascii=False, default=str) + "\n"
+
+
+_MESSAGE_COLUMNS = ("id", "match_id", "sender_id", "body", "created_at")
+
+
+def _export_queries(user_id: int, match_ids: List[int]) -> List[tuple]:
+    """
+    (тип строки, SELECT колонок, из шардов ли) — в порядке выгрузки.
+    Запросы «из шардов» выполняются в каждом шарде (app.shards).
+    """
+    return [
+        (
+            "listing",
+            select(
+                Listing.id,
+                Listing.subject_id,
+                Listing.title,
+                Listing.description,
+                Listing.level,
+                Listing.city,
+                Listing.is_online,
+                Listing.is_offline,
+                Listing.hourly_rate,
+                Listing.is_published,
+                Listing.photo_url,
+                Listing.created_at,
+            ).where(Listing.owner_id == user_id),
+            False,
+        ),
+        (
+            "swipe",
+            # свои свайпы и лайки, поставленные пользователю; чужие дизлайки
+            # (и архив, где только дизлайки) — не его данные
+            select(Swipe.id, Swipe.from_user_id, Swipe.to_user_id, Swipe.like, Swipe.created_at).where(
+                or_(
+                    Swipe.from_user_id == user_id,
+                    and_(Swipe.to_user_id == user_id, Swipe.like == True),  # noqa: E712
+                )
+            ),
+            True,
+        ),
+        (
+            "swipe",
+            select(
+                SwipeArchive.id,
+                SwipeArchive.from_user_id,
+                SwipeArchive.to_user_id,
+                literal(False).label("like"),
+                SwipeArchive.created_at,
+            ).where(SwipeArchive.from_user_id == user_id),
+            True,
+        ),
+        (
+            "match",
+            select(Match.id, Match.user1_id, Match.user2_id, Match.is_active, Match.created_at).where(
+                Match.id.in_(match_ids)
+            ),
+            False,
+        ),
+        (
+            "message",
+            select(*[getattr(MessageArchive, c) for c in _MESSAGE_COLUMNS]).where(
+                MessageArchive.match_id.in_(match_ids)
+            ),
+            True,
+        ),
+        (
+            "message",
+            select(*[getattr(Message, c) for c in _MESSAGE_COLUMNS]).where(Message.match_id.in_(match_ids)),
+            True,
+        ),
+    ]
+
+
+def export_user_data(user_id: int, session_factory: Callable[[], Session] = SessionLocal) -> Iterator[str]:
+    """
+    Генератор NDJSON: профиль, анкета, объявления, свайпы, матчи, сообщения.
+    Открывает свою сессию — она живёт дольше, чем сессия запроса.
+    """
+    with session_factory() as db:
+        user: Optional[User] = db.get(User, user_id)
+        if user is None:
+            return
+        yield _line(
+            "user",
+            {
+                "id": user.id,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "email": user.email,
+                "role": user.role.value,
+                "onboarding_done": user.onboarding_done,
+                "created_at": user.created_at,
+            },
+        )
+        pref = user.preferences
+        if pref is not None:
+            yield _line(
+                "preferences",
+                {
+                    "online": pref.online,
+                    "offline": pref.offline,
+                    "group_classes": pref.group_classes,
+                    "city": pref.city,
+                    "hourly_rate": pref.hourly_rate,
+                    "types": pref.type_names,
+                    "subjects": [s.name for s in user.subjects],
+                },
+            )
+
+        match_ids = list(db.execute(_user_matches(user_id)).scalars())
+        # читаем колонки, а не объекты: строки не оседают в identity map
+        with ShardSessions(db) as shards:
+            for kind, stmt, sharded in _export_queries(user_id, match_ids):
+                sessions = [shard for _, shard in shards.each()] if sharded else [db]
+                for session in sessions:
+                    rows = session.execute(
+                        stmt.order_by(stmt.selected_columns[0]).execution_options(yield_per=EXPORT_CHUNK)
+                    )
+                    for row in rows:
+                        yield _line(kind, dict(row._mapping))
@@ -0,0 +1,201 @@
+# app/analytics.py
+"""
+Аналитика свайпов / матчей / сообщений на инкрементальных дневных роллапах.
+
+Агрегатор — потребитель outbox ("analytics"): курсор в outbox_cursors и есть
+watermark. Каждая новая пачка событий раскладывается в приращения счётчиков
+и добавляется к строкам user_daily_stats / segment_daily_stats в том же
+commit, что и сдвиг курсора. Дашборды и /analytics/* читают только роллапы,
+сырые swipes и messages аналитика не сканирует.
+
+Что считаем:
+- swipe.created / swipe.updated — действие «лайк» или «дизлайк» за день
+  (смена оценки считается новым действием, прошлые дни не переписываются);
+- match.created — матч у обоих участников;
+- message.created — отправленное / полученное сообщение.
+
+Сегмент пары — предметы и город репетитора в ней (на момент агрегации).
+Пары без репетитора в сегменты не попадают.
+"""
+
+import os
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Match,
+    OutboxEvent,
+    SegmentDailyStats,
+    Subject,
+    User,
+    UserDailyStats,
+    UserPreference,
+    UserRole,
+    user_subject,
+)
+from app.outbox import Consumer, event_payload
+from app.workers import BackgroundWorker
+
+CONSUMER = "analytics"
+BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "1000"))
+INTERVAL = float(os.getenv("ANALYTICS_INTERVAL", "30"))
+
+DIMENSIONS = ("subject", "city")
+
+UserKey = Tuple[int, date]
+SegmentKey = Tuple[date, str, str]
+
+
+class _Deltas:
+    """Приращения счётчиков одной пачки, сгруппированные по строкам роллапов."""
+
+    def __init__(self) -> None:
+        self.users: Dict[UserKey, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.segments: Dict[SegmentKey, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def user(self, user_id: int, day: date, field: str) -> None:
+        self.users[(user_id, day)][field] += 1
+
+    def segment(self, day: date, segments: Iterable[Tuple[str, str]], field: str) -> None:
+        for dimension, key in segments:
+            self.segments[(day, dimension, key)][field] += 1
+
+
+class _Lookup:
+    """Роли, сегменты репетиторов и участники матчей — по одному запросу на пачку."""
+
+    def __init__(self, db: Session, user_ids: Set[int], match_ids: Set[int]) -> None:
+        self.pairs: Dict[int, Tuple[int, int]] = {}
+        if match_ids:
+            rows = db.query(Match.id, Match.user1_id, Match.user2_id).filter(Match.id.in_(match_ids))
+            for match_id, user1_id, user2_id in rows:
+                self.pairs[match_id] = (user1_id, user2_id)
+                user_ids |= {user1_id, user2_id}
+
+        self.roles: Dict[int, UserRole] = {}
+        if user_ids:
+            self.roles = dict(db.query(User.id, User.role).filter(User.id.in_(user_ids)))
+
+        tutors = [uid for uid, role in self.roles.items() if role == UserRole.tutor]
+        self.segments: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+        if tutors:
+            subjects = (
+                db.query(user_subject.c.user_id, Subject.name)
+                .join(Subject, Subject.id == user_subject.c.subject_id)
+                .filter(user_subject.c.user_id.in_(tutors))
+            )
+            for user_id, name in subjects:
+                self.segments[user_id].append(("subject", name))
+            cities = db.query(UserPreference.user_id, UserPreference.city).filter(
+                UserPreference.user_id.in_(tutors), UserPreference.city.isnot(None)
+            )
+            for user_id, city in cities:
+                self.segments[user_id].append(("city", city))
+
+    def exists(self, user_id: int) -> bool:
+        return user_id in self.roles
+
+    def tutor_of(self, *user_ids: int) -> Optional[int]:
+        for user_id in user_ids:
+            if self.roles.get(user_id) == UserRole.tutor:
+                return user_id
+        return None
+
+    def segments_of(self, *user_ids: int) -> List[Tuple[str, str]]:
+        tutor_id = self.tutor_of(*user_ids)
+        return self.segments.get(tutor_id, []) if tutor_id is not None else []
+
+
+def _collect_ids(events: List[Tuple[OutboxEvent, dict]]) -> Tuple[Set[int], Set[int]]:
+    user_ids: Set[int] = set()
+    match_ids: Set[int] = set()
+    for event, payload in events:
+        if event.topic == "swipe":
+            user_ids |= {payload["from_user_id"], payload["to_user_id"]}
+        elif event.topic == "match":
+            match_ids.add(event.aggregate_id)
+        elif event.topic == "message":
+            match_ids.add(payload["match_id"])
+    return user_ids, match_ids
+
+
+def compute_deltas(db: Session, batch: List[OutboxEvent]) -> _Deltas:
+    events = [(event, event_payload(event)) for event in batch]
+    lookup = _Lookup(db, *_collect_ids(events))
+    deltas = _Deltas()
+
+    for event, payload in events:
+        day = event.created_at.date()
+
+        if event.event_type in ("swipe.created", "swipe.updated"):
+            from_id, to_id = payload["from_user_id"], payload["to_user_id"]
+            if payload["like"]:
+                deltas.user(from_id, day, "likes_given")
+                deltas.user(to_id, day, "likes_received")
+                field = "tutor_likes" if lookup.tutor_of(from_id) == from_id else "student_likes"
+                deltas.segment(day, lookup.segments_of(from_id, to_id), field)
+            else:
+                deltas.user(from_id, day, "dislikes_given")
+
+        elif event.event_type == "match.created":
+            pair = lookup.pairs.get(event.aggregate_id)
+            if pair is None:  # матч успели удалить
+                continue
+            for user_id in pair:
+                deltas.user(user_id, day, "matches")
+            deltas.segment(day, lookup.segments_of(*pair), "matches")
+
+        elif event.event_type == "message.created":
+            pair = lookup.pairs.get(payload["match_id"])
+            if pair is None:
+                continue
+            sender_id = payload["sender_id"]
+            recipient_id = pair[1] if pair[0] == sender_id else pair[0]
+            deltas.user(sender_id, day, "messages_sent")
+            deltas.user(recipient_id, day, "messages_received")
+            deltas.segment(day, lookup.segments_of(*pair), "messages")
+
+    # строки удалённых пользователей не создаём (FK на users)
+    for user_id, day in list(deltas.users):
+        if not lookup.exists(user_id):
+            del deltas.users[(user_id, day)]
+    return deltas
+
+
+def _apply(db: Session, model, key_columns, deltas: Dict[tuple, Dict[str, int]]) -> None:
+    if not deltas:
+        return
+    # подтягиваем существующие строки одним запросом по каждой колонке ключа
+    q = db.query(model)
+    for idx, column in enumerate(key_columns):
+        q = q.filter(column.in_({key[idx] for key in deltas}))
+    existing = {tuple(getattr(row, c.key) for c in key_columns): row for row in q}
+
+    for key, counters in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            row = model(**{c.key: value for c, value in zip(key_columns, key)})
+            for field in counters:
+                setattr(row, field, 0)
+            db.add(row)
+        for field, value in counters.items():
+            setattr(row, field, (getattr(row, field) or 0) + value)
+
+
+def apply_batch(db: Session, batch: List[OutboxEvent]) -> None:
+    """Handler потребителя: добавляет приращения пачки к роллапам (без commit)."""
+    deltas = compute_deltas(db, batch)
+    _apply(db, UserDailyStats, (UserDailyStats.user_id, UserDailyStats.day), deltas.users)
+    _apply(
+        db,
+        SegmentDailyStats,
+        (SegmentDailyStats.day, SegmentDailyStats.dimension, SegmentDailyStats.key),
+        deltas.segments,
+    )
+
+
+consumer = Consumer(CONSUMER, apply_batch, topics=["swipe", "match", "message"], batch_size=BATCH_SIZE)
+worker = BackgroundWorker("analytics", consumer.drain, interval=INTERVAL)
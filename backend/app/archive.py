@@ -0,0 +1,200 @@
+# app/archive.py
+"""
+Архивация холодных данных из горячих таблиц messages и swipes.
+
+- Переписка активного матча уезжает в messages_archive целиком, когда
+  в нём не было сообщений дольше ARCHIVE_MESSAGES_AFTER_DAYS. У матча
+  проставляется archived_at — по нему list_messages понимает, что старую
+  историю надо дочитать из архива. Переписку разорванных матчей не
+  архивируем: её удаляет purger (см. app.blocks).
+- Дизлайки старше ARCHIVE_DISLIKES_AFTER_DAYS уезжают в swipes_archive.
+  Лайки не трогаем: по ним ищется встречный лайк при свайпе.
+
+Перенос идёт пачками: DELETE ... RETURNING из горячей таблицы и INSERT
+ровно этих строк в архив в одной транзакции, так что строка всегда лежит
+ровно в одном месте — даже если между запросами пришли новые.
+Архив лежит в том же шарде, что и горячая таблица (app.shards).
+Всё в архиве старше любой горячей строки того же матча, поэтому при
+чтении достаточно склеить архив и горячую часть.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.db import SessionLocal
+from app.models import Match, Message, MessageArchive, Swipe, SwipeArchive
+from app.shards import ShardSessions
+from app.workers import BackgroundWorker
+
+MESSAGES_AFTER = timedelta(days=int(os.getenv("ARCHIVE_MESSAGES_AFTER_DAYS", "90")))
+DISLIKES_AFTER = timedelta(days=int(os.getenv("ARCHIVE_DISLIKES_AFTER_DAYS", "180")))
+BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", str(6 * 3600)))
+
+_MESSAGE_COLUMNS = ("id", "match_id", "sender_id", "body", "created_at")
+_SWIPE_COLUMNS = ("id", "from_user_id", "to_user_id", "created_at")
+
+
+def _move(db: Session, src, dst, columns: Sequence[str], where) -> int:
+    """
+    Переносит строки src -> dst. В архив вставляются именно удалённые
+    строки (RETURNING), а не повторная выборка по where: строка, пришедшая
+    между двумя запросами, иначе удалилась бы, не попав в архив.
+    """
+    rows = db.execute(
+        delete(src)
+        .where(where)
+        .returning(*[getattr(src, c) for c in columns])
+        .execution_options(synchronize_session=False)
+    ).all()
+    if rows:
+        db.execute(insert(dst), [dict(zip(columns, row)) for row in rows])
+    return len(rows)
+
+
+def _idle_active_matches(db: Session, shard: Session, cutoff: datetime, batch_size: int) -> List[int]:
+    """
+    До batch_size активных матчей шарда без сообщений с cutoff. Сообщения
+    и матчи могут лежать в разных БД (app.shards), поэтому без JOIN:
+    кандидаты из шарда по возрастанию match_id, активность — из основной.
+    """
+    found: List[int] = []
+    after = None
+    while len(found) < batch_size:
+        stmt = (
+            select(Message.match_id)
+            .group_by(Message.match_id)
+            .having(func.max(Message.created_at) < cutoff)
+            .order_by(Message.match_id)
+            .limit(batch_size)
+        )
+        if after is not None:
+            stmt = stmt.where(Message.match_id > after)
+        candidates = list(shard.execute(stmt).scalars())
+        if not candidates:
+            break
+        after = candidates[-1]
+        found += db.execute(
+            select(Match.id).where(Match.id.in_(candidates), Match.is_active == True)  # noqa: E712
+        ).scalars()
+    return found[:batch_size]
+
+
+def archive_messages(
+    db: Session,
+    *,
+    older_than: timedelta = MESSAGES_AFTER,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """По пачке матчей из каждого шарда: их сообщения — в архив. Возвращает число матчей."""
+    cutoff = datetime.utcnow() - older_than
+    total = 0
+    with ShardSessions(db) as shards:
+        for _, shard in shards.each():
+            match_ids = _idle_active_matches(db, shard, cutoff, batch_size)
+            if not match_ids:
+                continue
+            # сначала archived_at: если перенос не завершится, list_messages
+            # просто заглянет в пустой архив и дочитает горячую таблицу
+            db.execute(
+                update(Match)
+                .where(Match.id.in_(match_ids))
+                .values(archived_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            _move(shard, Message, MessageArchive, _MESSAGE_COLUMNS, Message.match_id.in_(match_ids))
+            shard.commit()
+            total += len(match_ids)
+    return total
+
+
+def archive_dislikes(
+    db: Session,
+    *,
+    older_than: timedelta = DISLIKES_AFTER,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """По пачке старых дизлайков из каждого шарда — в архив. Возвращает число строк."""
+    cutoff = datetime.utcnow() - older_than
+    moved = 0
+    with ShardSessions(db) as shards:
+        for _, shard in shards.each():
+            ids = list(
+                shard.execute(
+                    select(Swipe.id)
+                    .where(Swipe.like == False, Swipe.created_at < cutoff)  # noqa: E712
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not ids:
+                continue
+            # условие целиком: свайп, перевёрнутый в лайк после SELECT, остаётся на месте
+            moved += _move(
+                shard,
+                Swipe,
+                SwipeArchive,
+                _SWIPE_COLUMNS,
+                and_(Swipe.id.in_(ids), Swipe.like == False, Swipe.created_at < cutoff),  # noqa: E712
+            )
+            shard.commit()
+    return moved
+
+
+def load_messages(db: Session, match: Match, limit: int) -> list:
+    """
+    Первые limit сообщений матча по времени: сначала архив (если матч
+    архивировался), затем горячая таблица. Для горячих чатов архив не читаем.
+    db — сессия шарда матча (app.shards).
+    """
+    rows: list = []
+    if match.archived_at is not None:
+        rows = (
+            db.query(MessageArchive)
+            .filter(MessageArchive.match_id == match.id)
+            .order_by(MessageArchive.created_at.asc(), MessageArchive.id.asc())
+            .limit(limit)
+            .all()
+        )
+    if len(rows) < limit:
+        rows += (
+            db.query(Message)
+            .filter(Message.match_id == match.id)
+            .order_by(Message.created_at.asc())
+            .limit(limit - len(rows))
+            .all()
+        )
+    return rows
+
+
+def message_statements(match: Match) -> List[Select]:
+    """То же, что load_messages, но запросами — для потоковой выдачи без лимита."""
+    statements: List[Select] = []
+    if match.archived_at is not None:
+        statements.append(
+            select(MessageArchive)
+            .where(MessageArchive.match_id == match.id)
+            .order_by(MessageArchive.created_at.asc(), MessageArchive.id.asc())
+        )
+    statements.append(
+        select(Message)
+        .where(Message.match_id == match.id)
+        .order_by(Message.created_at.asc(), Message.id.asc())
+    )
+    return statements
+
+
+def _job() -> Optional[bool]:
+    with SessionLocal() as db:
+        matches = archive_messages(db)
+        dislikes = archive_dislikes(db)
+    # полная пачка — скорее всего, есть ещё: следующий проход сразу
+    return matches >= BATCH_SIZE or dislikes >= BATCH_SIZE
+
+
+worker = BackgroundWorker("archive", _job, interval=INTERVAL)
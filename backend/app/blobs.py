@@ -0,0 +1,184 @@
+# app/blobs.py
+"""
+Локальное content-addressed хранилище фотографий объявлений.
+
+Файл лежит под именем sha256 своего содержимого:
+``BLOB_DIR/ab/abcdef….jpg``; одинаковые загрузки дедуплицируются — второй
+раз байты на диск не пишутся и превью не пересчитываются. Содержимое по
+адресу никогда не меняется, поэтому отдаём его с Cache-Control immutable.
+
+Загрузка идёт потоком: тело запроса пишется во временный файл кусками
+с одновременным подсчётом хэша, целиком в память не читается.
+
+Превью (THUMB_SIZES) строятся в пуле процессов (app.thumbnails), чтобы
+ресайз не занимал GIL и event loop API. Нужен Pillow (есть в
+requirements.txt); без него превью не строятся и отдаётся оригинал.
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.thumbnails import make_thumbnails, pillow_available
+
+log = logging.getLogger(__name__)
+
+BLOB_DIR = Path(os.getenv("BLOB_DIR", "./blobs"))
+MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+THUMB_WORKERS = int(os.getenv("THUMB_WORKERS", "2"))
+
+# варианты превью: имя -> максимальная сторона, px
+THUMB_SIZES: Dict[str, int] = {"s": 240, "m": 640}
+
+# сигнатуры поддерживаемых форматов
+CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+class UnsupportedImage(Exception):
+    pass
+
+
+def sniff_ext(head: bytes) -> Optional[str]:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def is_digest(value: str) -> bool:
+    return bool(_DIGEST_RE.match(value))
+
+
+def blob_path(digest: str, ext: str) -> Path:
+    return BLOB_DIR / digest[:2] / f"{digest}.{ext}"
+
+
+def thumb_path(digest: str, variant: str) -> Path:
+    return BLOB_DIR / digest[:2] / f"{digest}_{variant}.jpg"
+
+
+# сколько байт копим в памяти перед записью на диск (запись — в пуле потоков)
+WRITE_BUFFER = 256 * 1024
+
+
+def _open_upload() -> Tuple[int, str]:
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    return tempfile.mkstemp(dir=BLOB_DIR, prefix=".upload-")
+
+
+def _place(tmp: str, digest: str, ext: str) -> bool:
+    """Переносит загруженный файл по адресу. False — такие байты уже были."""
+    path = blob_path(digest, ext)
+    if path.exists():
+        # такие байты уже есть — дедупликация
+        os.unlink(tmp)
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, path)
+    return True
+
+
+def _discard(tmp: str) -> None:
+    if os.path.exists(tmp):
+        os.unlink(tmp)
+
+
+async def store_stream(chunks: AsyncIterator[bytes], max_bytes: int = MAX_BYTES) -> Tuple[str, str, int, bool]:
+    """
+    Пишет поток в хранилище. Возвращает (sha256, ext, размер, новый ли файл).
+    Бросает BlobTooLarge / UnsupportedImage; временный файл при этом удаляется.
+    Файловые операции идут в пуле потоков, event loop их не ждёт.
+    """
+    sha = hashlib.sha256()
+    size = 0
+    head = b""
+    buffer = bytearray()
+    fd, tmp = await run_in_threadpool(_open_upload)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BlobTooLarge()
+                if len(head) < 12:
+                    head += chunk[: 12 - len(head)]
+                sha.update(chunk)
+                buffer += chunk
+                if len(buffer) >= WRITE_BUFFER:
+                    await run_in_threadpool(out.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(out.write, bytes(buffer))
+
+        ext = sniff_ext(head)
+        if ext is None:
+            raise UnsupportedImage()
+
+        digest = sha.hexdigest()
+        return digest, ext, size, await run_in_threadpool(_place, tmp, digest, ext)
+    except BaseException:
+        # синхронно: при отмене запроса await здесь уже не выполнится
+        _discard(tmp)
+        raise
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, а не fork: форк процесса с потоками (uvicorn, воркеры) небезопасен
+            _pool = ProcessPoolExecutor(
+                max_workers=THUMB_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def ensure_thumbnails(digest: str, ext: str) -> Dict[str, Path]:
+    """Строит недостающие превью в пуле процессов. Возвращает готовые."""
+    if not pillow_available():
+        return {}
+    missing = {
+        variant: (str(thumb_path(digest, variant)), size)
+        for variant, size in THUMB_SIZES.items()
+        if not thumb_path(digest, variant).exists()
+    }
+    if missing:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(_get_pool(), make_thumbnails, str(blob_path(digest, ext)), missing)
+        except Exception:  # noqa: BLE001 — битая картинка не должна ронять загрузку
+            log.exception("Thumbnail generation failed for %s", digest)
+    return {v: thumb_path(digest, v) for v in THUMB_SIZES if thumb_path(digest, v).exists()}
@@ -0,0 +1,145 @@
+# app/blocks.py
+"""
+Unmatch и блокировки.
+
+Разрыв отношений — это смена флагов, а не удаление строк: матч получает
+is_active = False и deactivated_at, блокировка — строку в blocks.
+Лента, свайпы и сообщения учитывают блокировки анти-джойнами
+(not_blocked) по первичному ключу / индексу blocks.
+
+Переписку деактивированных матчей удаляет фоновый purger пачками
+(DELETE ... WHERE id IN (...)), спустя PURGE_AFTER_DAYS — без загрузки
+объектов и ORM-каскадов.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import and_, delete, exists, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.events import emit
+from app.models import Block, Match, Message, MessageArchive
+from app.outbox import record
+from app.shards import ShardSessions, group_by_shard
+from app.workers import BackgroundWorker
+
+PURGE_AFTER = timedelta(days=int(os.getenv("PURGE_AFTER_DAYS", "30")))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+PURGE_INTERVAL = float(os.getenv("PURGE_INTERVAL", "3600"))
+
+
+def not_blocked(viewer_id: int, other_id_col):
+    """Условие «между viewer и other нет блокировки ни в одну сторону»."""
+    return and_(
+        ~exists().where(Block.blocker_id == viewer_id, Block.blocked_id == other_id_col),
+        ~exists().where(Block.blocker_id == other_id_col, Block.blocked_id == viewer_id),
+    )
+
+
+def is_blocked(db: Session, user_id: int, other_id: int) -> bool:
+    return (
+        db.query(Block.blocker_id)
+        .filter(
+            or_(
+                and_(Block.blocker_id == user_id, Block.blocked_id == other_id),
+                and_(Block.blocker_id == other_id, Block.blocked_id == user_id),
+            )
+        )
+        .first()
+        is not None
+    )
+
+
+def deactivate_match(db: Session, match: Match, *, by_user_id: int, reason: str) -> None:
+    """Выключает матч (без commit). reason: "unmatch" | "block" | "undo"."""
+    if not match.is_active:
+        return
+    match.is_active = False
+    match.deactivated_at = datetime.utcnow()
+    record(db, "match.deactivated", match.id, by_user_id=by_user_id, reason=reason)
+
+
+def block_user(db: Session, blocker_id: int, blocked_id: int) -> None:
+    """Блокирует пользователя и гасит матч с ним, если был (без commit)."""
+    if db.get(Block, (blocker_id, blocked_id)) is None:
+        db.add(Block(blocker_id=blocker_id, blocked_id=blocked_id))
+        emit(db, "blocks.changed", blocker_id=blocker_id, blocked_id=blocked_id)
+    user1_id, user2_id = sorted([blocker_id, blocked_id])
+    match = (
+        db.query(Match)
+        .filter(Match.user1_id == user1_id, Match.user2_id == user2_id)
+        .first()
+    )
+    if match is not None:
+        deactivate_match(db, match, by_user_id=blocker_id, reason="block")
+
+
+def _purge(shard: Session, model, match_ids: List[int], limit: int) -> int:
+    ids = list(shard.execute(select(model.id).where(model.match_id.in_(match_ids)).limit(limit)).scalars())
+    if not ids:
+        return 0
+    return shard.execute(
+        delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def purge_messages(
+    db: Session,
+    *,
+    older_than: timedelta = PURGE_AFTER,
+    batch_size: int = PURGE_BATCH_SIZE,
+) -> int:
+    """
+    Одна пачка: удаляет переписку давно деактивированных матчей. Матчи
+    и сообщения могут быть в разных БД (app.shards), поэтому id матчей
+    читаются из основной страницами, а DELETE идёт в их шарды. Матчи,
+    переписка которых удалена целиком, получают purged_at и больше не
+    просматриваются (деактивированный матч не оживает).
+    """
+    cutoff = datetime.utcnow() - older_than
+    deleted = 0
+    after = 0
+    with ShardSessions(db) as shards:
+        while deleted < batch_size:
+            match_ids = list(
+                db.execute(
+                    select(Match.id)
+                    .where(
+                        Match.is_active == False,  # noqa: E712
+                        Match.purged_at.is_(None),
+                        Match.deactivated_at < cutoff,
+                        Match.id > after,
+                    )
+                    .order_by(Match.id)
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not match_ids:
+                break
+            after = match_ids[-1]
+            for index, ids in group_by_shard(match_ids).items():
+                for model in (Message, MessageArchive):
+                    # limit 0, когда пачка уже набрана, — запрос ничего не вернёт
+                    deleted += _purge(shards.get(index), model, ids, batch_size - deleted)
+            if deleted >= batch_size:
+                # пачка набрана посреди страницы — часть матчей дочистит следующий проход
+                break
+            db.execute(
+                update(Match)
+                .where(Match.id.in_(match_ids))
+                .values(purged_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        shards.commit()  # шарды, затем основная БД
+    return deleted
+
+
+def _purge_job() -> bool:
+    with SessionLocal() as db:
+        return purge_messages(db) >= PURGE_BATCH_SIZE
+
+
+purger = BackgroundWorker("purge", _purge_job, interval=PURGE_INTERVAL)
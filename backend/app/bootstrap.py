@@ -0,0 +1,137 @@
+# app/bootstrap.py
+"""
+Одноразовая подготовка схемы БД.
+
+В single-process режиме вызывается на старте приложения. При запуске через
+``python -m app.serve`` схема готовится один раз в мастер-процессе до форка,
+а воркеры видят SCHEMA_READY_ENV и пропускают create_all — новые воркеры
+при scale-out поднимаются без DDL-запросов.
+"""
+
+import os
+
+from sqlalchemy import inspect, select, update
+
+from app.db import Base, SessionLocal, engine
+
+SCHEMA_READY_ENV = "KORFINDER_SCHEMA_READY"
+
+
+def init_schema() -> None:
+    # импорт моделей регистрирует все таблицы в Base.metadata
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _create_missing_indexes()
+    _install_shards()
+    _backfill_geo()
+    _migrate_lesson_types()
+    _backfill_student_cards()
+    _backfill_incoming_likes()
+
+    from app import search
+
+    search.install(engine)
+
+
+def init_schema_once() -> None:
+    """Готовит схему, если этого ещё не сделал мастер-процесс."""
+    if os.getenv(SCHEMA_READY_ENV) == "1":
+        return
+    init_schema()
+
+
+def _add_missing_columns(bind=engine, tables=None) -> None:
+    # Лёгкая «миграция» для nullable-колонок, добавленных в модели после того,
+    # как таблица уже была создана (create_all существующие таблицы не трогает).
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in tables or Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"
+                )
+
+
+def _create_missing_indexes(bind=engine, tables=None) -> None:
+    # create_all создаёт индексы только вместе с новыми таблицами;
+    # индексы, добавленные в модели позже, докатываем на существующие таблицы.
+    with bind.begin() as conn:
+        for table in tables or Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def _install_shards() -> None:
+    # шардированные таблицы (app.shards) — до бэкфиллов, которые их читают
+    from app import shards
+
+    for shard_engine in shards.install_schema():
+        _add_missing_columns(shard_engine, shards.SHARD_TABLES)
+        _create_missing_indexes(shard_engine, shards.SHARD_TABLES)
+    _backfill_swipe_updated_at()
+
+
+def _backfill_swipe_updated_at() -> None:
+    # свайпы до появления updated_at: последнее действие — само создание
+    from app.models import Swipe
+    from app.shards import ShardSessions
+
+    with SessionLocal() as db, ShardSessions(db) as shards:
+        for _, shard in shards.each():
+            shard.execute(
+                update(Swipe).where(Swipe.updated_at.is_(None)).values(updated_at=Swipe.created_at)
+            )
+            shard.commit()
+
+
+def _backfill_geo() -> None:
+    # Строки, записанные до появления координат: геокодим по каждому городу
+    # одним UPDATE, а не построчно через ORM.
+    from app.geo import cell_of, geocode_city
+    from app.models import Listing, UserPreference
+
+    with engine.begin() as conn:
+        for model in (Listing, UserPreference):
+            cities = conn.execute(
+                select(model.city)
+                .where(model.city.isnot(None), model.lat.is_(None))
+                .distinct()
+            ).scalars()
+            for city in list(cities):
+                point = geocode_city(city)
+                if point is None:
+                    continue
+                conn.execute(
+                    update(model)
+                    .where(model.city == city, model.lat.is_(None))
+                    .values(lat=point.lat, lon=point.lon, geo_cell=cell_of(point.lat, point.lon))
+                )
+
+
+def _migrate_lesson_types() -> None:
+    from app.lesson_types import migrate_legacy_types
+
+    with SessionLocal() as db:
+        migrate_legacy_types(db)
+
+
+def _backfill_student_cards() -> None:
+    from app.student_cards import backfill_student_cards
+
+    with SessionLocal() as db:
+        backfill_student_cards(db)
+
+
+def _backfill_incoming_likes() -> None:
+    from app.likes import backfill
+
+    with SessionLocal() as db:
+        backfill(db)
@@ -0,0 +1,233 @@
+# app/browse.py
+"""
+Фасетный просмотр объявлений репетиторов (/listings/browse).
+
+Фасеты считаются одним запросом: UNION ALL нескольких GROUP BY по
+отфильтрованной выборке. Для каждого фасета применяются все фильтры,
+кроме его собственного («дизъюнктивные» фасеты) — так при выбранном
+предмете клиент всё равно видит, сколько объявлений у соседних предметов.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import String, and_, case, cast, func, literal, literal_column, null, or_, select, union_all
+from sqlalchemy.orm import Session, contains_eager, joinedload
+
+from app.blocks import not_blocked
+from app.geo import KM_PER_DEG_LAT, GeoPoint, cell_ranges, geocode_city
+from app.lesson_types import has_any_type
+from app.models import Listing, Subject, User, UserRole
+from app.schemas import FacetCount, ListingFacets, PriceBucket
+
+MAX_RADIUS_KM = 200.0
+
+# границы ценовых корзин (zł/h); последняя корзина — «от 200 и выше»
+PRICE_EDGES: Tuple[float, ...] = (50.0, 80.0, 120.0, 200.0)
+
+SORTS = {
+    "newest": (Listing.created_at.desc(), Listing.id.desc()),
+    "price_asc": (Listing.hourly_rate.asc(), Listing.id.desc()),
+    "price_desc": (Listing.hourly_rate.desc(), Listing.id.desc()),
+}
+
+
+@dataclass
+class BrowseFilters:
+    subject_ids: Optional[List[int]] = None
+    city: Optional[str] = None
+    online: Optional[bool] = None
+    offline: Optional[bool] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    exclude_owner_id: Optional[int] = None
+    near: Optional[GeoPoint] = None
+    radius_km: Optional[float] = None
+    lesson_types: Optional[List[str]] = None
+
+    def conditions(self, skip: str = "") -> list:
+        """SQL-условия; skip — имя фасета, чей фильтр не применяем."""
+        conds = [
+            Listing.is_published == True,  # noqa: E712
+            User.role == UserRole.tutor,
+        ]
+        if self.exclude_owner_id is not None:
+            # exclude_owner_id — это смотрящий: скрываем его самого и блокировки
+            conds.append(Listing.owner_id != self.exclude_owner_id)
+            conds.append(not_blocked(self.exclude_owner_id, Listing.owner_id))
+        if self.subject_ids and skip != "subject":
+            conds.append(Listing.subject_id.in_(self.subject_ids))
+        if self.city and skip != "city":
+            conds.append(Listing.city == self.city)
+        if skip != "mode":
+            if self.online is not None:
+                conds.append(Listing.is_online == self.online)
+            if self.offline is not None:
+                conds.append(Listing.is_offline == self.offline)
+        if skip != "price":
+            if self.min_price is not None:
+                conds.append(Listing.hourly_rate >= self.min_price)
+            if self.max_price is not None:
+                conds.append(Listing.hourly_rate <= self.max_price)
+        if self.lesson_types:
+            conds.append(has_any_type(Listing.owner_id, self.lesson_types))
+        if self.near is not None and self.radius_km:
+            conds.extend(geo_conditions(self.near, self.radius_km))
+        return conds
+
+
+def resolve_center(
+    current_user: User,
+    *,
+    near_city: Optional[str] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+) -> GeoPoint:
+    """Точка отсчёта: явные координаты, город из запроса или город из анкеты."""
+    if lat is not None and lon is not None:
+        return GeoPoint(lat, lon)
+    if near_city:
+        point = geocode_city(near_city)
+    else:
+        pref = current_user.preferences
+        point = GeoPoint(pref.lat, pref.lon) if pref and pref.lat is not None else None
+    if point is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown location",
+        )
+    return point
+
+
+def distance_sq_expr(center: GeoPoint):
+    """
+    Квадрат расстояния в «градусах широты» (равнопромежуточная проекция).
+    На радиусах до пары сотен км погрешность мала, а выражение — чистая
+    арифметика, которую умеет и SQLite, и Postgres.
+    """
+    k = math.cos(math.radians(center.lat))
+    dlat = Listing.lat - center.lat
+    dlon = (Listing.lon - center.lon) * k
+    return dlat * dlat + dlon * dlon
+
+
+def geo_conditions(center: GeoPoint, radius_km: float) -> list:
+    radius_km = min(radius_km, MAX_RADIUS_KM)
+    # грубый отбор по ячейкам идёт по индексу, точный круг — по выражению
+    cells = or_(*[Listing.geo_cell.between(lo, hi) for lo, hi in cell_ranges(center, radius_km)])
+    return [cells, distance_sq_expr(center) <= (radius_km / KM_PER_DEG_LAT) ** 2]
+
+
+def _price_bucket_expr():
+    # константы инлайним, а не биндим: иначе в Postgres выражение в GROUP BY
+    # не совпадёт с выражением в SELECT (у них будут разные параметры)
+    whens = [
+        (Listing.hourly_rate < literal_column(repr(edge)), literal_column(str(idx)))
+        for idx, edge in enumerate(PRICE_EDGES)
+    ]
+    return case(*whens, else_=literal_column(str(len(PRICE_EDGES))))
+
+
+def _facet_select(facet: str, key, label, filters: BrowseFilters, *, group_by=(), extra=(), joins=()):
+    stmt = select(
+        literal(facet).label("facet"),
+        cast(key, String).label("key"),
+        cast(label, String).label("label"),
+        func.count(Listing.id).label("cnt"),
+    ).select_from(Listing).join(User, Listing.owner_id == User.id)
+    for target, onclause in joins:
+        stmt = stmt.join(target, onclause)
+    stmt = stmt.where(and_(*filters.conditions(skip=facet), *extra))
+    if group_by:
+        stmt = stmt.group_by(*group_by)
+    return stmt
+
+
+def compute_facets(db: Session, filters: BrowseFilters) -> Tuple[int, ListingFacets]:
+    bucket = _price_bucket_expr()
+    stmt = union_all(
+        _facet_select("total", literal(""), null(), filters),
+        _facet_select(
+            "subject",
+            Listing.subject_id,
+            Subject.name,
+            filters,
+            joins=[(Subject, Listing.subject_id == Subject.id)],
+            group_by=(Listing.subject_id, Subject.name),
+        ),
+        _facet_select(
+            "city",
+            Listing.city,
+            null(),
+            filters,
+            extra=(Listing.city.isnot(None),),
+            group_by=(Listing.city,),
+        ),
+        _facet_select(
+            "mode", literal("online"), null(), filters, extra=(Listing.is_online == True,)  # noqa: E712
+        ),
+        _facet_select(
+            "mode", literal("offline"), null(), filters, extra=(Listing.is_offline == True,)  # noqa: E712
+        ),
+        _facet_select(
+            "price",
+            bucket,
+            null(),
+            filters,
+            extra=(Listing.hourly_rate.isnot(None),),
+            group_by=(bucket,),
+        ),
+    )
+
+    total = 0
+    facets = ListingFacets()
+    for facet, key, label, count in db.execute(stmt):
+        if facet == "total":
+            total = count
+        elif facet == "subject":
+            facets.subjects.append(FacetCount(value=label, id=int(key), count=count))
+        elif facet == "city":
+            facets.cities.append(FacetCount(value=key, count=count))
+        elif facet == "mode":
+            facets.modes.append(FacetCount(value=key, count=count))
+        elif facet == "price":
+            idx = int(key)
+            facets.price.append(
+                PriceBucket(
+                    min=PRICE_EDGES[idx - 1] if idx > 0 else None,
+                    max=PRICE_EDGES[idx] if idx < len(PRICE_EDGES) else None,
+                    count=count,
+                )
+            )
+
+    facets.subjects.sort(key=lambda f: (-f.count, f.value))
+    facets.cities.sort(key=lambda f: (-f.count, f.value))
+    facets.price.sort(key=lambda b: b.min or 0.0)
+    return total, facets
+
+
+def browse_listings(
+    db: Session,
+    filters: BrowseFilters,
+    *,
+    sort: str,
+    limit: int,
+    offset: int,
+) -> List[Listing]:
+    if sort == "distance" and filters.near is not None:
+        # без координат (город не геокодирован) — в конец, а не впереди ближайших
+        order_by = (distance_sq_expr(filters.near).asc().nulls_last(), Listing.id.desc())
+    else:
+        order_by = SORTS.get(sort, SORTS["newest"])
+    return (
+        db.query(Listing)
+        .join(User, Listing.owner_id == User.id)
+        .options(contains_eager(Listing.owner), joinedload(Listing.subject))
+        .filter(*filters.conditions())
+        .order_by(*order_by)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
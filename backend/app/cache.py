@@ -0,0 +1,274 @@
+# app/cache.py
+"""
+Кэш для роутеров с подключаемым бэкендом и межпроцессной инвалидацией.
+
+    subjects_cache = Cache("subjects", ttl=300)
+    data = subjects_cache.get_or_load("all", lambda: load_from_db())
+    subjects_cache.invalidate()          # весь namespace
+    feed_cache.invalidate("u42")         # один ключ
+
+Бэкенд выбирается через CACHE_BACKEND:
+- memory (по умолчанию) — LRU + TTL в памяти процесса (CACHE_MAX_ENTRIES);
+- sqlite — общий для всех воркеров файл CACHE_SQLITE_PATH (локальная
+  замена Redis/memcached: одна копия данных на все процессы).
+
+При бэкенде memory у каждого uvicorn-воркера своя копия, поэтому
+invalidate() ещё и пишет сообщение в таблицу cache_invalidations основной
+БД. Каждый процесс раз в CACHE_BUS_POLL секунд дочитывает чужие сообщения
+и выбрасывает у себя те же ключи — устаревание ограничено этим интервалом
+(и TTL). С общим бэкендом удаление сразу видно всем, шина не нужна.
+
+Значения для sqlite сериализуются pickle — класть можно dict/list/pydantic
+и PrecompressedBody, но не ORM-объекты.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional, Protocol, Tuple
+
+from sqlalchemy import delete, func, insert, select
+
+from app.db import engine
+from app.models import CacheInvalidation
+from app.workers import BackgroundWorker
+
+log = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+BUS_POLL = float(os.getenv("CACHE_BUS_POLL", "1"))
+BUS_RETENTION = timedelta(hours=1)
+
+_MISSING = object()
+
+
+class Backend(Protocol):
+    shared: bool
+
+    def get(self, key: str) -> Any:
+        """Значение или _MISSING."""
+        ...
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+    def delete_prefix(self, prefix: str) -> None:
+        ...
+
+
+class LocalBackend:
+    """LRU + TTL в памяти процесса."""
+
+    shared = False
+
+    def __init__(self, max_entries: int = MAX_ENTRIES) -> None:
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def get(self, key: str) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires, value = item
+            if expires < now:
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class SqliteBackend:
+    """Общий кэш для нескольких процессов поверх одного SQLite-файла."""
+
+    shared = True
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Any:
+        # time.time(), а не monotonic: часы должны совпадать между процессами
+        row = self._connect().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return _MISSING if row is None else pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._connect().execute(
+            "INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time() + ttl),
+        )
+
+    def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix: str) -> None:
+        # substr, а не LIKE: в ключах могут быть % и _
+        self._connect().execute(
+            "DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+
+
+_backend: Optional[Backend] = None
+
+
+def _make_backend() -> Backend:
+    if os.getenv("CACHE_BACKEND", "memory") == "sqlite":
+        return SqliteBackend(os.getenv("CACHE_SQLITE_PATH", "./cache.db"))
+    return LocalBackend()
+
+
+def get_backend() -> Backend:
+    global _backend
+    if _backend is None:
+        _backend = _make_backend()
+    return _backend
+
+
+def set_backend(backend: Optional[Backend]) -> None:
+    global _backend
+    _backend = backend
+
+
+class Cache:
+    """Namespace в кэше со своим TTL."""
+
+    def __init__(self, namespace: str, ttl: float) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = get_backend().get(self._key(key))
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any) -> None:
+        get_backend().set(self._key(key), value, self.ttl)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        value = get_backend().get(self._key(key))
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Выбрасывает ключ (или весь namespace) во всех процессах."""
+        _drop(self.namespace, key)
+        if not get_backend().shared:
+            _publish(self.namespace, key)
+
+
+def _drop(namespace: str, key: Optional[str]) -> None:
+    backend = get_backend()
+    if key is None:
+        backend.delete_prefix(f"{namespace}:")
+    else:
+        backend.delete(f"{namespace}:{key}")
+
+
+# --- Шина инвалидации между процессами ------------------------------------
+
+_ORIGIN = uuid.uuid4().hex[:16]
+_last_seen: Optional[int] = None
+_bus_lock = threading.Lock()
+
+
+def _bus_enabled() -> bool:
+    return os.getenv("CACHE_BUS", "1") != "0"
+
+
+def _publish(namespace: str, key: Optional[str]) -> None:
+    if not _bus_enabled():
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(CacheInvalidation).values(namespace=namespace, key=key, origin=_ORIGIN))
+    except Exception:  # noqa: BLE001 — шина не должна ломать запрос; спасёт TTL
+        log.exception("Cache invalidation publish failed")
+
+
+def poll_invalidations() -> int:
+    """Применяет чужие инвалидации, пришедшие с прошлого вызова."""
+    global _last_seen
+    with _bus_lock, engine.connect() as conn:
+        if _last_seen is None:
+            # старт процесса: локальный кэш пуст, старые сообщения не нужны
+            _last_seen = conn.execute(select(func.max(CacheInvalidation.id))).scalar() or 0
+            return 0
+        rows = conn.execute(
+            select(CacheInvalidation.id, CacheInvalidation.namespace, CacheInvalidation.key)
+            .where(CacheInvalidation.id > _last_seen, CacheInvalidation.origin != _ORIGIN)
+            .order_by(CacheInvalidation.id)
+        ).all()
+        for _, namespace, key in rows:
+            _drop(namespace, key)
+        if rows:
+            _last_seen = rows[-1].id
+        return len(rows)
+
+
+def prune_invalidations() -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            delete(CacheInvalidation).where(CacheInvalidation.created_at < datetime.utcnow() - BUS_RETENTION)
+        )
+
+
+_next_prune = 0.0
+
+
+def _bus_job() -> None:
+    global _next_prune
+    if not _bus_enabled() or get_backend().shared:
+        return
+    poll_invalidations()
+    if time.monotonic() >= _next_prune:
+        _next_prune = time.monotonic() + BUS_RETENTION.total_seconds()
+        prune_invalidations()
+
+
+bus_worker = BackgroundWorker("cache-bus", _bus_job, interval=BUS_POLL)
@@ -0,0 +1,227 @@
+# app/compression.py
+"""
+Сжатие ответов: brotli (пакет ``brotli`` из requirements.txt) или gzip.
+
+CompressionMiddleware сжимает ответы от COMPRESS_MIN_SIZE байт и больше,
+если клиент прислал подходящий Accept-Encoding. Потоковые ответы (NDJSON)
+сжимаются на лету: каждая пачка сбрасывается в сокет сразу (flush), чтобы
+не терять time-to-first-byte.
+
+Ответ, у которого уже есть Content-Encoding, middleware не трогает. Этим
+пользуется PrecompressedBody: для кэшируемых ответов (список предметов и
+т.п.) сжатые байты считаются один раз, при создании, и хранятся в кэше
+вместе с телом.
+"""
+
+import gzip
+import json
+import os
+import threading
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # опциональная зависимость
+    import brotli
+except ImportError:  # pragma: no cover — без brotli работаем только с gzip
+    brotli = None
+
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+
+# кодировки, которые мы умеем отдавать
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# уже сжатые форматы жать бессмысленно
+_SKIP_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    result: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            result[name.strip().lower()] = q
+    return result
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Лучшая поддерживаемая кодировка из Accept-Encoding или None."""
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """Инкрементальное сжатие для потоковых ответов."""
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 — формат gzip (заголовок + crc)
+            self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._z.flush(zlib.Z_FINISH)
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return not content_type.startswith(_SKIP_TYPES)
+
+
+def _with_encoding(start: Message, encoding: str, length: Optional[int]) -> Message:
+    headers = MutableHeaders(raw=list(start["headers"]))
+    headers["Content-Encoding"] = encoding
+    headers.add_vary_header("Accept-Encoding")
+    if length is None:
+        del headers["Content-Length"]
+    else:
+        headers["Content-Length"] = str(length)
+    return {**start, "headers": headers.raw}
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = MIN_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+        compressor: Optional[_StreamCompressor] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if compressor is None:
+                # первый кусок тела: решаем, сжимать ли ответ
+                headers = Headers(raw=start["headers"])
+                if not _compressible(headers) or (not more and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                if not more:
+                    # ответ целиком — сжимаем одним куском
+                    passthrough = True
+                    data = compress(body, encoding)
+                    await send(_with_encoding(start, encoding, len(data)))
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                compressor = _StreamCompressor(encoding)
+                await send(_with_encoding(start, encoding, None))
+
+            data = compressor.chunk(body)
+            if not more:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class PrecompressedBody:
+    """
+    Готовое тело ответа, сжатое не больше одного раза на кодировку.
+    Хранится рядом с кэшированными данными и отдаётся через response().
+    """
+
+    @classmethod
+    def from_json(cls, content: Any) -> "PrecompressedBody":
+        # те же параметры, что у JSONResponse — байты совпадают с обычным ответом
+        raw = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        body = cls(raw)
+        # сжимаем сразу: в общем кэше (CACHE_BACKEND=sqlite) каждое попадание —
+        # свежая копия из pickle, и ленивое сжатие повторялось бы на каждом
+        if len(raw) >= MIN_SIZE:
+            for encoding in ENCODINGS:
+                body.encoded(encoding)
+        return body
+
+    def __init__(self, raw: bytes, media_type: str = "application/json") -> None:
+        self.raw = raw
+        self.media_type = media_type
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    # для общего кэша (pickle): lock не сериализуется, сжатые байты — да
+    def __getstate__(self) -> dict:
+        return {"raw": self.raw, "media_type": self.media_type, "encoded": dict(self._encoded)}
+
+    def __setstate__(self, state: dict) -> None:
+        self.raw = state["raw"]
+        self.media_type = state["media_type"]
+        self._encoded = state["encoded"]
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                data = self._encoded[encoding] = compress(self.raw, encoding)
+        return data
+
+    def body_for(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        encoding = negotiate(accept_encoding) if len(self.raw) >= MIN_SIZE else None
+        if encoding is None:
+            return self.raw, None
+        return self.encoded(encoding), encoding
+
+    def response(self, request: Request) -> Response:
+        body, encoding = self.body_for(request.headers.get("accept-encoding", ""))
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=self.media_type, headers=headers)
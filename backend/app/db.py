@@ -1,24 +1,140 @@
 from pathlib import Path
-from dotenv import load_dotenv
+import hashlib
+import hmac
+import math
 import os
+import time
+from typing import Callable, Optional
+
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+
+
+def _load_env() -> None:
+    # Подгружаем .env и из текущей папки запуска, и из корня репо.
+    # Файлы ищем сами (без find_dotenv по стеку) и только если они есть —
+    # тогда python-dotenv даже не импортируется.
+    candidates = [Path.cwd() / ".env", Path(__file__).resolve().parents[1] / ".env"]
+    existing = list(dict.fromkeys(p for p in candidates if p.is_file()))
+    if not existing:
+        return
+    from dotenv import load_dotenv
+
+    for path in existing:
+        load_dotenv(dotenv_path=path)
+
 
-# Подгружаем .env и из текущей папки запуска, и из корня репо
-load_dotenv()
-load_dotenv(dotenv_path=Path(__file__).resolve().parents[1] / ".env")
+_load_env()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./korfinder.db")
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+
+
+def connect_args_for(url: str) -> dict:
+    return {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+
+connect_args = connect_args_for(DATABASE_URL)
 
 engine = create_engine(DATABASE_URL, echo=False, future=True, connect_args=connect_args)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+# Реплика для чтения. Без REPLICA_DATABASE_URL всё идёт в основную БД.
+# Локально вместо настоящей реплики можно указать второй SQLite-файл —
+# его догоняет app.replica (копия основной БД раз в REPLICA_SYNC_INTERVAL).
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL") or None
+# сколько секунд после своей записи клиент читает из основной БД
+# (read-your-writes: реплика могла ещё не догнать)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+replica_engine = (
+    create_engine(
+        REPLICA_DATABASE_URL, echo=False, future=True, connect_args=connect_args_for(REPLICA_DATABASE_URL)
+    )
+    if REPLICA_DATABASE_URL
+    else engine
+)
+ReplicaSessionLocal = sessionmaker(bind=replica_engine, autoflush=False, autocommit=False, future=True)
+
+_READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
 class Base(DeclarativeBase):
     pass
 
-def get_db():
-    db = SessionLocal()
+
+# Метка read-your-writes живёт у клиента в подписанной cookie, а не в
+# памяти воркера: следующий GET может прийти в любой процесс или на
+# любую машину. iOS (URLSession) хранит и отправляет cookie сам.
+STICKY_COOKIE = "kf_primary_until"
+
+
+def _sign(until: str) -> str:
+    from app.security import SECRET
+
+    return hmac.new(SECRET.encode(), f"{STICKY_COOKIE}:{until}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def sticky_cookie_header() -> bytes:
+    """Set-Cookie: читать основную БД ближайшие REPLICA_STICKY_SECONDS."""
+    seconds = max(1, math.ceil(REPLICA_STICKY_SECONDS))
+    until = str(int(time.time()) + seconds)
+    return (
+        f"{STICKY_COOKIE}={until}.{_sign(until)}; Max-Age={seconds}; Path=/; HttpOnly; SameSite=Lax"
+    ).encode()
+
+
+def _is_sticky(request: Request) -> bool:
+    until, _, signature = request.cookies.get(STICKY_COOKIE, "").partition(".")
+    if not until.isdigit() or not hmac.compare_digest(signature, _sign(until)):
+        return False
+    return int(until) >= time.time()
+
+
+def _use_replica(request: Request) -> bool:
+    if replica_engine is engine or request.method not in _READ_METHODS:
+        return False
+    return not _is_sticky(request)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Ответ на любой пишущий запрос (не GET/HEAD/OPTIONS) ставит cookie
+    STICKY_COOKIE: пока она жива, get_db читает этого клиента из основной
+    БД. Окно отсчитывается от ответа, то есть от конца записи.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] in _READ_METHODS or replica_engine is engine:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", [])) + [(b"set-cookie", sticky_cookie_header())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def session_factory_for(db: Session) -> Callable[[], Session]:
+    """Фабрика сессий той же БД, что и db (для потоковых ответов)."""
+    return ReplicaSessionLocal if db.info.get("replica") else SessionLocal
+
+
+def get_db(request: Request):
+    """
+    Сессия на запрос. GET/HEAD читают с реплики, остальные методы пишут в
+    основную БД; после записи клиент REPLICA_STICKY_SECONDS читает основную
+    (ReadYourWritesMiddleware).
+    """
+    replica = _use_replica(request)
+    db = (ReplicaSessionLocal if replica else SessionLocal)()
+    db.info["replica"] = replica
     try:
         yield db
     finally:
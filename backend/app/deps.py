@@ -1,11 +1,12 @@
+import os
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.models import User
-from app.security import ALGO, SECRET
+from app.security import InvalidToken, decode_access_token
 
 auth_scheme = HTTPBearer()
 
@@ -16,9 +17,9 @@ def get_current_user(
 ) -> User:
     token = creds.credentials
     try:
-        payload = jwt.decode(token, SECRET, algorithms=[ALGO])
+        payload = decode_access_token(token)
         email = payload.get("sub")
-    except JWTError as exc:
+    except InvalidToken as exc:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
@@ -31,3 +32,17 @@ def get_current_user(
             detail="User not found",
         )
     return user
+
+
+def _staff_emails() -> set:
+    return {e.strip().lower() for e in os.getenv("STAFF_EMAILS", "").split(",") if e.strip()}
+
+
+def require_staff(current: User = Depends(get_current_user)) -> User:
+    """Только для сотрудников: email из STAFF_EMAILS (через запятую)."""
+    if current.email.lower() not in _staff_emails():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Staff only",
+        )
+    return current
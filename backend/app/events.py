@@ -0,0 +1,59 @@
+# app/events.py
+"""
+Простые in-process события об изменениях данных.
+
+Роутер вызывает emit(db, "profile.updated", user_id=...) внутри транзакции;
+подписчики получают событие только после успешного commit этой сессии
+(при rollback события выбрасываются). Подписчики — кэши, которым нужно
+инвалидироваться, и т.п.; ошибки подписчиков не ломают запрос.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Callable, DefaultDict, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[str, Dict[str, Any]], None]
+
+_subscribers: DefaultDict[str, List[Handler]] = defaultdict(list)
+
+_PENDING_KEY = "pending_events"
+
+
+def subscribe(topic: str, handler: Handler) -> None:
+    if handler not in _subscribers[topic]:
+        _subscribers[topic].append(handler)
+
+
+def unsubscribe(topic: str, handler: Handler) -> None:
+    if handler in _subscribers[topic]:
+        _subscribers[topic].remove(handler)
+
+
+def publish(topic: str, payload: Dict[str, Any]) -> None:
+    for handler in list(_subscribers.get(topic, ())) + list(_subscribers.get("*", ())):
+        try:
+            handler(topic, payload)
+        except Exception:  # noqa: BLE001
+            log.exception("Event handler failed for %s", topic)
+
+
+def emit(db: Session, topic: str, **payload: Any) -> None:
+    """Ставит событие в очередь сессии; доставится после commit."""
+    db.info.setdefault(_PENDING_KEY, []).append((topic, payload))
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    for topic, payload in pending or ():
+        publish(topic, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,83 @@
+# app/geo.py
+"""
+Геокодинг городов и сеточный пространственный индекс.
+
+Координаты берём из встроенной таблицы городов (app/data/pl_cities.csv) —
+без внешних геокодеров. Для индекса Земля режется на ячейки CELL_DEG x CELL_DEG
+градусов; номер ячейки (geo_cell) — обычная индексируемая int-колонка.
+Ячейки одной широтной полосы идут подряд, поэтому круг радиуса R
+покрывается несколькими диапазонами ``geo_cell BETWEEN lo AND hi`` —
+по одному на полосу, и запрос «в радиусе 10 км» идёт по индексу.
+"""
+
+import csv
+import math
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.textutil import fold_polish
+
+CELL_DEG = 0.1  # ~11 км по широте, ~7 км по долготе в Польше
+_LON_CELLS = int(round(360 / CELL_DEG)) + 1
+KM_PER_DEG_LAT = 111.32
+EARTH_RADIUS_KM = 6371.0
+
+_CITIES_CSV = Path(__file__).resolve().parent / "data" / "pl_cities.csv"
+
+
+class GeoPoint(NamedTuple):
+    lat: float
+    lon: float
+
+
+def _city_key(name: str) -> str:
+    return " ".join(fold_polish(name).replace("-", " ").split())
+
+
+@lru_cache(maxsize=1)
+def _city_table() -> Dict[str, GeoPoint]:
+    with _CITIES_CSV.open(encoding="utf-8") as fh:
+        return {
+            _city_key(row["name"]): GeoPoint(float(row["lat"]), float(row["lon"]))
+            for row in csv.DictReader(fh)
+        }
+
+
+def geocode_city(city: Optional[str]) -> Optional[GeoPoint]:
+    """Координаты города из встроенной таблицы (регистр и диакритика не важны)."""
+    if not city:
+        return None
+    return _city_table().get(_city_key(city))
+
+
+def cell_of(lat: float, lon: float) -> int:
+    row = int(math.floor((lat + 90.0) / CELL_DEG))
+    col = int(math.floor((lon + 180.0) / CELL_DEG))
+    return row * _LON_CELLS + col
+
+
+def cell_ranges(center: GeoPoint, radius_km: float) -> List[Tuple[int, int]]:
+    """Диапазоны geo_cell, покрывающие bounding box круга вокруг center."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    cos_lat = max(math.cos(math.radians(center.lat)), 0.01)
+    dlon = min(radius_km / (KM_PER_DEG_LAT * cos_lat), 180.0)
+
+    lo_cell = cell_of(max(center.lat - dlat, -90.0), max(center.lon - dlon, -180.0))
+    hi_cell = cell_of(min(center.lat + dlat, 90.0), min(center.lon + dlon, 180.0))
+    row_lo, col_lo = divmod(lo_cell, _LON_CELLS)
+    row_hi, col_hi = divmod(hi_cell, _LON_CELLS)
+    return [
+        (row * _LON_CELLS + col_lo, row * _LON_CELLS + col_hi)
+        for row in range(row_lo, row_hi + 1)
+    ]
+
+
+def distance_km(a: GeoPoint, b: GeoPoint) -> float:
+    """Расстояние по большому кругу (haversine)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a.lat, a.lon, b.lat, b.lon))
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
@@ -0,0 +1,201 @@
+# app/idempotency.py
+"""
+Idempotency-Key для POST /swipes, /messages, /listings.
+
+Клиент шлёт один и тот же ключ при повторе запроса (обрыв сети и т.п.).
+Первый запрос с ключом «занимает» его — короткой отдельной транзакцией
+вставляет строку в idempotency_keys — и в своей основной транзакции
+записывает туда ответ. Повтор с тем же ключом:
+
+- ответ уже сохранён — отдаём его же (с заголовком Idempotent-Replayed),
+  без записей в БД, outbox и уведомлений;
+- первый запрос ещё выполняется — 409 с Retry-After;
+- ключ тот же, а тело запроса другое — 422.
+
+Если обработчик упал, ключ освобождается, и повтор выполнится заново.
+Ключ, оставшийся занятым после падения процесса, перехватывается через
+CLAIM_TIMEOUT; если первый запрос всё же жив, его finish() увидит, что
+ключ уже чужой, и запрос откатится без записи. Ключи живут IDEMPOTENCY_TTL_HOURS, потом их удаляет воркер.
+
+В обработчике:
+
+    replay = idem.start(current.id, payload)
+    if replay is not None:
+        return replay
+    ...
+    idem.finish(db, out, status_code=201)   # до db.commit()
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal, engine
+from app.models import IdempotencyKey
+from app.workers import BackgroundWorker
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+# с большим запасом сверх таймаута запроса: раньше ключ перехватывается,
+# только если первый запрос точно умер, а не просто медленный
+CLAIM_TIMEOUT = timedelta(seconds=float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", "600")))
+
+
+def _dumps(content: Any, sort_keys: bool = False) -> str:
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":")
+    )
+
+
+def fingerprint(scope: str, payload: Any) -> str:
+    """Отпечаток тела запроса: тот же ключ с другим телом — ошибка клиента."""
+    return hashlib.sha256(f"{scope}:{_dumps(payload, sort_keys=True)}".encode()).hexdigest()
+
+
+class Idempotency:
+    """Ключ текущего запроса. Без заголовка start() и finish() ничего не делают."""
+
+    def __init__(self, scope: str, key: Optional[str]) -> None:
+        self.scope = scope
+        self.key = key
+        self._user_id: Optional[int] = None
+        self._claimed_at: Optional[datetime] = None
+
+    def _where(self, user_id: int):
+        return (IdempotencyKey.user_id == user_id, IdempotencyKey.key == self.key)
+
+    def start(self, user_id: int, payload: Any) -> Optional[JSONResponse]:
+        """Занимает ключ. Для повтора возвращает сохранённый ответ."""
+        if self.key is None:
+            return None
+        digest = fingerprint(self.scope, payload)
+        while True:
+            now = datetime.utcnow()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        insert(IdempotencyKey).values(
+                            user_id=user_id,
+                            key=self.key,
+                            scope=self.scope,
+                            fingerprint=digest,
+                            created_at=now,
+                        )
+                    )
+                break
+            except IntegrityError:
+                pass
+            with engine.begin() as conn:
+                row = conn.execute(select(IdempotencyKey).where(*self._where(user_id))).one_or_none()
+                if row is None:
+                    continue  # ключ успели освободить или удалить — занимаем заново
+                if row.fingerprint != digest:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Idempotency-Key was used with a different request",
+                    )
+                if row.response is not None:
+                    return JSONResponse(
+                        content=json.loads(row.response),
+                        status_code=row.status_code,
+                        headers={"Idempotent-Replayed": "true"},
+                    )
+                # первый запрос ещё идёт — или его процесс умер, тогда ключ наш
+                taken = row.created_at < now - CLAIM_TIMEOUT and conn.execute(
+                    update(IdempotencyKey)
+                    .where(
+                        *self._where(user_id),
+                        IdempotencyKey.created_at == row.created_at,
+                        IdempotencyKey.response.is_(None),
+                    )
+                    .values(created_at=now)
+                ).rowcount
+            if taken:
+                break
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Request with this Idempotency-Key is in progress",
+                headers={"Retry-After": "1"},
+            )
+        self._user_id = user_id
+        self._claimed_at = now
+        return None
+
+    def finish(self, db: Session, content: Any, status_code: int = 200) -> None:
+        """
+        Сохраняет ответ в транзакции db (commit — за обработчиком), вместе
+        с самой записью. Если ключ успел перехватить повтор, бросает 409:
+        обработчик не доходит до commit, и записывает только один из двух.
+        """
+        if self._claimed_at is None:
+            return
+        saved = db.execute(
+            update(IdempotencyKey)
+            .where(
+                *self._where(self._user_id),
+                IdempotencyKey.created_at == self._claimed_at,
+                IdempotencyKey.response.is_(None),
+            )
+            .values(status_code=status_code, response=_dumps(content))
+        ).rowcount
+        if not saved:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Idempotency-Key was taken over by a retry",
+            )
+
+    def release(self) -> None:
+        """Освобождает ключ, если ответ так и не сохранился (ошибка в обработчике)."""
+        if self._claimed_at is None:
+            return
+        with engine.begin() as conn:
+            conn.execute(
+                delete(IdempotencyKey).where(
+                    *self._where(self._user_id),
+                    IdempotencyKey.created_at == self._claimed_at,
+                    IdempotencyKey.response.is_(None),
+                )
+            )
+
+
+def idempotency(scope: str) -> Callable[[Request], Iterator[Idempotency]]:
+    """Зависимость для ручки: читает заголовок Idempotency-Key."""
+
+    def dependency(request: Request) -> Iterator[Idempotency]:
+        key = request.headers.get(HEADER)
+        if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Idempotency-Key")
+        idem = Idempotency(scope, key)
+        try:
+            yield idem
+        finally:
+            idem.release()
+
+    return dependency
+
+
+def prune(db: Session, ttl: timedelta = TTL) -> int:
+    """Удаляет ключи старше ttl. Возвращает число строк."""
+    deleted = db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - ttl)
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+def _job() -> None:
+    with SessionLocal() as db:
+        prune(db)
+
+
+worker = BackgroundWorker("idempotency-prune", _job, interval=3600)
@@ -1,5 +1,6 @@
 from app.db import SessionLocal, engine, Base
 from app.models import Subject
+from app.routers.subjects import invalidate_subjects_cache
 
 # гарантируем, что таблицы есть
 Base.metadata.create_all(bind=engine)
@@ -10,6 +11,8 @@ with SessionLocal() as db:
     if db.query(Subject).count() == 0:
         db.add_all([Subject(name=n) for n in names])
         db.commit()
+        # запущенные воркеры перечитают список (шина инвалидации app.cache)
+        invalidate_subjects_cache()
         print(f"Seeded {len(names)} subjects")
     else:
         print("Subjects already present — skip")
@@ -0,0 +1,100 @@
+# app/lesson_types.py
+"""Работа с типами занятий анкеты (lesson_types + user_preference_types)."""
+
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, exists, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import LessonType, UserPreference, user_preference_types
+
+
+def clean_names(names: Optional[Iterable[str]]) -> List[str]:
+    """Обрезает пробелы, выкидывает пустые и дубли, сохраняя порядок."""
+    result: List[str] = []
+    for raw in names or []:
+        name = raw.strip()[:80]
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def split_legacy(raw: Optional[str]) -> List[str]:
+    """Старый формат: "matura,egzamin,szkoła podstawowa"."""
+    return clean_names((raw or "").split(","))
+
+
+def get_or_create(db: Session, names: List[str]) -> List[LessonType]:
+    """
+    Типы по именам одним SELECT ... IN; недостающие создаются. Каждый новый
+    тип вставляется в своём SAVEPOINT: если параллельный онбординг успел
+    создать то же имя (lesson_types.name UNIQUE), перечитываем его строку.
+    """
+    if not names:
+        return []
+    found = {t.name: t for t in db.query(LessonType).filter(LessonType.name.in_(names))}
+    for name in names:
+        if name in found:
+            continue
+        lesson_type = LessonType(name=name)
+        try:
+            with db.begin_nested():
+                db.add(lesson_type)
+        except IntegrityError:
+            lesson_type = db.query(LessonType).filter(LessonType.name == name).one()
+        found[name] = lesson_type
+    return [found[n] for n in names]
+
+
+def replace_lesson_types(
+    db: Session, pref: UserPreference, names: Optional[Iterable[str]]
+) -> List[LessonType]:
+    """Заменяет набор типов анкеты: один DELETE + один bulk INSERT. Без commit."""
+    db.flush()  # анкета могла быть только что создана — нужна строка для FK
+    types = get_or_create(db, clean_names(names))
+    db.execute(
+        delete(user_preference_types).where(user_preference_types.c.user_id == pref.user_id)
+    )
+    if types:
+        db.execute(
+            insert(user_preference_types),
+            [
+                {"user_id": pref.user_id, "lesson_type_id": t.id, "position": pos}
+                for pos, t in enumerate(types)
+            ],
+        )
+    # viewonly-коллекция могла быть уже загружена — перечитаем при обращении
+    db.expire(pref, ["lesson_types"])
+    return types
+
+
+def has_any_type(user_id_col, names: List[str]):
+    """EXISTS-условие «у анкеты пользователя есть хотя бы один из типов» (по индексу)."""
+    return exists().where(
+        user_preference_types.c.user_id == user_id_col,
+        user_preference_types.c.lesson_type_id == LessonType.id,
+        LessonType.name.in_(names),
+    )
+
+
+def migrate_legacy_types(db: Session, batch_size: int = 500) -> int:
+    """
+    Переносит CSV из user_preferences.types в user_preference_types.
+    Идемпотентно: обработанные строки обнуляются. Возвращает число анкет.
+    """
+    migrated = 0
+    while True:
+        prefs = (
+            db.query(UserPreference)
+            .filter(UserPreference.legacy_types.isnot(None))
+            .limit(batch_size)
+            .all()
+        )
+        if not prefs:
+            return migrated
+        for pref in prefs:
+            replace_lesson_types(db, pref, split_legacy(pref.legacy_types))
+            pref.legacy_types = None
+        db.commit()
+        migrated += len(prefs)
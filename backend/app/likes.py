@@ -0,0 +1,198 @@
+# app/likes.py
+"""
+Проекция входящих лайков (incoming_likes) для «кто меня лайкнул» и
+режима ленты likes_first.
+
+Сырые swipes шардированы по автору (app.shards), а «кто лайкнул меня»
+— запрос по получателю, который пришлось бы делать во всех шардах.
+Поэтому держим отдельную таблицу в основной БД с индексом
+(to_user_id, answered, liked_at): и эндпоинт, и сортировка ленты — это
+один индексный проход и анти-джойн прямо в основном запросе.
+
+Проекцию ведёт потребитель outbox "incoming-likes" по событиям swipe.*:
+- лайк A -> B — строка (B, A); дизлайк или отмена свайпа — строки нет;
+- любой свайп A -> B помечает строку (A, B) как answered: A уже ответил
+  на лайк B, показывать его в «ждут ответа» не нужно.
+
+Воркер будится сразу после commit свайпа, так что лаг — доли секунды.
+Лайки, сделанные до появления проекции, переносит backfill() при старте.
+"""
+
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, exists, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app import outbox
+from app.events import subscribe
+from app.models import IncomingLike, OutboxCursor, Swipe, SwipeArchive
+from app.outbox import Consumer, event_payload
+from app.shards import ShardSessions, group_by_shard
+from app.workers import BackgroundWorker
+
+CONSUMER = "incoming-likes"
+BATCH_SIZE = int(os.getenv("INCOMING_LIKES_BATCH_SIZE", "500"))
+INTERVAL = float(os.getenv("INCOMING_LIKES_INTERVAL", "5"))
+
+Pair = Tuple[int, int]  # (to_user_id, from_user_id)
+
+
+def liked_by(viewer_id: int, other_id_col):
+    """Условие «other лайкнул viewer и ещё ждёт ответа» — для сортировки ленты."""
+    return exists().where(
+        IncomingLike.to_user_id == viewer_id,
+        IncomingLike.from_user_id == other_id_col,
+        IncomingLike.answered == False,  # noqa: E712
+    )
+
+
+def _answered(shards: ShardSessions, pairs: Iterable[Pair]) -> Set[Pair]:
+    """Какие из пар (to, from) уже имеют ответный свайп to -> from (в шардах to)."""
+    wanted: Dict[int, Set[int]] = defaultdict(set)
+    for to_user_id, from_user_id in pairs:
+        wanted[to_user_id].add(from_user_id)
+    found: Set[Pair] = set()
+    for index, user_ids in group_by_shard(wanted).items():
+        shard = shards.get(index)
+        for model in (Swipe, SwipeArchive):
+            rows = shard.execute(
+                select(model.from_user_id, model.to_user_id).where(
+                    model.from_user_id.in_(user_ids),
+                    tuple_(model.from_user_id, model.to_user_id).in_(
+                        [(u, f) for u in user_ids for f in wanted[u]]
+                    ),
+                )
+            )
+            found |= {(u, f) for u, f in rows}
+    return found
+
+
+def _insert_missing(db: Session):
+    """
+    INSERT, пропускающий уже существующие пары: backfill на старте и
+    потребитель в другом процессе могут вставлять одну и ту же строку.
+    """
+    dialect = db.get_bind().dialect.name
+    # диалектные insert импортируем по месту: postgresql тянет десятки
+    # модулей, а на SQLite он не нужен (см. app.bench_startup)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        return sqlite_insert(IncomingLike).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        return pg_insert(IncomingLike).on_conflict_do_nothing()
+    return insert(IncomingLike)
+
+
+def _upsert_likes(db: Session, likes: Dict[Pair, datetime], answered: Dict[Pair, bool]) -> None:
+    if not likes:
+        return
+    existing = set(
+        db.execute(
+            select(IncomingLike.to_user_id, IncomingLike.from_user_id).where(
+                tuple_(IncomingLike.to_user_id, IncomingLike.from_user_id).in_(list(likes))
+            )
+        ).all()
+    )
+    new = [pair for pair in likes if pair not in existing]
+    unknown = [pair for pair in new if pair not in answered]
+    with ShardSessions(db) as shards:
+        replied = _answered(shards, unknown) if unknown else set()
+    if new:
+        db.execute(
+            _insert_missing(db),
+            [
+                dict(
+                    to_user_id=to_user_id,
+                    from_user_id=from_user_id,
+                    liked_at=likes[(to_user_id, from_user_id)],
+                    answered=answered.get((to_user_id, from_user_id), (to_user_id, from_user_id) in replied),
+                )
+                for to_user_id, from_user_id in new
+            ],
+        )
+    for pair in existing:
+        db.execute(
+            update(IncomingLike)
+            .where(IncomingLike.to_user_id == pair[0], IncomingLike.from_user_id == pair[1])
+            .values(liked_at=likes[pair])
+        )
+
+
+def apply_batch(db: Session, events: List) -> None:
+    # сворачиваем пачку до итогового состояния каждой пары
+    likes: Dict[Pair, Optional[datetime]] = {}  # None — лайка больше нет
+    answered: Dict[Pair, bool] = {}
+    for event in events:
+        payload = event_payload(event)
+        author, target = payload["from_user_id"], payload["to_user_id"]
+        if event.event_type == "swipe.deleted":
+            likes[(target, author)] = None
+            answered[(author, target)] = False
+        elif event.event_type in ("swipe.created", "swipe.updated"):
+            likes[(target, author)] = event.created_at if payload["like"] else None
+            answered[(author, target)] = True
+
+    removed = [pair for pair, liked_at in likes.items() if liked_at is None]
+    if removed:
+        db.execute(
+            delete(IncomingLike)
+            .where(tuple_(IncomingLike.to_user_id, IncomingLike.from_user_id).in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+    _upsert_likes(db, {pair: at for pair, at in likes.items() if at is not None}, answered)
+    for value in (True, False):
+        pairs = [pair for pair, flag in answered.items() if flag is value]
+        if pairs:
+            db.execute(
+                update(IncomingLike)
+                .where(tuple_(IncomingLike.to_user_id, IncomingLike.from_user_id).in_(pairs))
+                .values(answered=value)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def backfill(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Переносит в проекцию лайки, сделанные до её появления. Выполняется один
+    раз — пока у потребителя нет курсора; события после этого он дочитает сам.
+    """
+    if db.get(OutboxCursor, CONSUMER) is not None:
+        return 0
+    added = 0
+    with ShardSessions(db) as shards:
+        for _, shard in shards.each():
+            after = 0
+            while True:
+                rows = shard.execute(
+                    select(Swipe.id, Swipe.to_user_id, Swipe.from_user_id, Swipe.created_at)
+                    .where(Swipe.like == True, Swipe.id > after)  # noqa: E712
+                    .order_by(Swipe.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                after = rows[-1].id
+                _upsert_likes(
+                    db, {(r.to_user_id, r.from_user_id): r.created_at or datetime.utcnow() for r in rows}, {}
+                )
+                db.commit()
+                added += len(rows)
+    return added
+
+
+consumer = Consumer(CONSUMER, apply_batch, topics=["swipe"], batch_size=BATCH_SIZE)
+worker = BackgroundWorker("incoming-likes", consumer.drain, interval=INTERVAL)
+
+
+def _on_appended(topic: str, payload: dict) -> None:
+    if payload.get("stream") == "swipe":
+        worker.wake()
+
+
+subscribe(outbox.APPENDED, _on_appended)
@@ -1,8 +1,14 @@
 # app/main.py
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.db import Base, engine
+from app import bootstrap, replica, warmup, workers
+from app.blobs import shutdown_pool
+from app.compression import CompressionMiddleware
+from app.db import ReadYourWritesMiddleware
 from app.routers import (
     auth,
     onboarding,
@@ -12,6 +18,11 @@ from app.routers import (
     matches,
     messages,
     listings,
+    analytics,
+    blocks,
+    account,
+    blobs,
+    likes,
 )
 
 API_PREFIX = "/api/v1"
@@ -27,18 +38,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# после записи клиент какое-то время читает основную БД, а не реплику (см. app.db)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# gzip / brotli для ответов от COMPRESS_MIN_SIZE байт (см. app.compression)
+app.add_middleware(CompressionMiddleware)
+
 
 @app.on_event("startup")
 def on_startup() -> None:
-    # создаём все таблицы по моделям
-    Base.metadata.create_all(bind=engine)
+    # создаём все таблицы по моделям (если мастер app.serve ещё не сделал этого)
+    bootstrap.init_schema_once()
+    # локальная реплика-заглушка (второй SQLite-файл) должна иметь схему до первых GET
+    replica.sync_standin()
+    # прогреваем пул, кэш предметов и горячие запросы до первого трафика
+    warmup.warm_up()
+    # фоновые воркеры (уведомления и т.п.); BACKGROUND_WORKERS=0 — не запускать
+    if os.getenv("BACKGROUND_WORKERS", "1") != "0":
+        workers.start_all()
+
 
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    workers.stop_all()
+    shutdown_pool()
 
+
+# --- Health ----------------------------------------------------------------
+
+# liveness: процесс жив и обрабатывает запросы (БД не трогаем)
 @app.get(f"{API_PREFIX}/health")
+@app.get(f"{API_PREFIX}/health/live")
 def health() -> dict:
     return {"ok": True}
 
 
+# readiness: воркер прогрет и БД доступна — можно слать трафик
+@app.get(f"{API_PREFIX}/health/ready")
+def ready():
+    if not warmup.is_ready():
+        # прогрев на старте не удался (например, БД лежала) — пробуем ещё раз
+        warmup.warm_up()
+    db_ok = warmup.is_ready() and warmup.check_db()
+    body = {"ok": db_ok, "db": "ok" if db_ok else "unavailable"}
+    return JSONResponse(body, status_code=200 if db_ok else 503)
+
+
 # --- Routers ---------------------------------------------------------------
 
 # auth: /api/v1/auth/register, /api/v1/auth/login, /api/v1/auth/me
@@ -66,3 +111,18 @@ app.include_router(messages.router, prefix=API_PREFIX, tags=["messages"])
 
 # listings CRUD: /api/v1/listings/...
 app.include_router(listings.router, prefix=API_PREFIX, tags=["listings"])
+
+# likes (кто меня лайкнул): /api/v1/likes/incoming
+app.include_router(likes.router, prefix=API_PREFIX, tags=["likes"])
+
+# blocks: /api/v1/blocks
+app.include_router(blocks.router, prefix=API_PREFIX, tags=["blocks"])
+
+# blobs (фото и превью): /api/v1/blobs/{sha256}[/{variant}]
+app.include_router(blobs.router, prefix=API_PREFIX, tags=["blobs"])
+
+# account: /api/v1/account (удаление, GDPR-выгрузка)
+app.include_router(account.router, prefix=API_PREFIX, tags=["account"])
+
+# analytics (дневные роллапы): /api/v1/analytics/...
+app.include_router(analytics.router, prefix=API_PREFIX, tags=["analytics"])
@@ -4,18 +4,23 @@ import enum
 from sqlalchemy import (
     Boolean,
     Column,
+    Date,
     DateTime,
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
+    Text,
     UniqueConstraint,
+    event,
 )
 from sqlalchemy.orm import relationship
 
 from app.db import Base
+from app.geo import cell_of, geocode_city
 
 
 class UserRole(str, enum.Enum):
@@ -32,6 +37,27 @@ user_subject = Table(
 )
 
 
+# ассоциация анкета–тип занятий (matura, egzamin, ...); position хранит порядок из анкеты
+user_preference_types = Table(
+    "user_preference_types",
+    Base.metadata,
+    Column(
+        "user_id",
+        Integer,
+        ForeignKey("user_preferences.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "lesson_type_id",
+        Integer,
+        ForeignKey("lesson_types.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    ),
+    Column("position", Integer, nullable=False, default=0),
+)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -43,6 +69,8 @@ class User(Base):
     role = Column(Enum(UserRole, name="user_role"), nullable=False, default=UserRole.student)
     onboarding_done = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # аккаунт ждёт удаления фоновым воркером (app.accounts)
+    deleted_at = Column(DateTime, nullable=True, index=True)
 
     # отношения
     preferences = relationship(
@@ -103,10 +131,59 @@ class UserPreference(Base):
     group_classes = Column(Boolean, default=False)
     city = Column(String(80), nullable=True)
     hourly_rate = Column(Float, nullable=True)
-    # строка с перечислением типов: "matura,egzamin,szkoła podstawowa"
-    types = Column(String(200), nullable=True)
+    # устаревшая CSV-строка типов ("matura,egzamin"); данные переносятся
+    # в user_preference_types при старте (bootstrap), новые записи её не пишут
+    legacy_types = Column("types", String(200), nullable=True)
+    # координаты города (геокодятся из city автоматически, см. _sync_geo)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    geo_cell = Column(Integer, nullable=True, index=True)
 
     user = relationship("User", back_populates="preferences")
+    # пишется через app.lesson_types.replace_lesson_types (с сохранением порядка)
+    lesson_types = relationship(
+        "LessonType",
+        secondary=user_preference_types,
+        order_by=user_preference_types.c.position,
+        viewonly=True,
+    )
+
+    @property
+    def type_names(self) -> list[str]:
+        return [t.name for t in self.lesson_types]
+
+
+class StudentCard(Base):
+    """
+    Готовая карточка ученика для feed репетитора.
+
+    Пересобирается при сохранении анкеты (app.student_cards), поэтому
+    feed читает строку как есть, без сборки текста на каждый запрос.
+    """
+
+    __tablename__ = "student_cards"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    title = Column(String(200), nullable=False)
+    description = Column(String(2000), nullable=False)
+    level = Column(String(200), nullable=True)
+    subject = Column(String(120), nullable=True)
+    hourly_rate = Column(Float, nullable=True)
+    city = Column(String(80), nullable=True)
+    # копия users.created_at — по ней сортируется feed
+    created_at = Column(DateTime, nullable=True, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LessonType(Base):
+    __tablename__ = "lesson_types"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(80), unique=True, index=True, nullable=False)
 
 
 class Subject(Base):
@@ -160,15 +237,54 @@ class Listing(Base):
 
     hourly_rate = Column(Float, nullable=True)
 
+    # координаты города (геокодятся из city автоматически, см. _sync_geo)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    geo_cell = Column(Integer, nullable=True)
+
     is_published = Column(Boolean, default=True, index=True)
     photo_url = Column(String(500), nullable=True)
+    # загруженное фото в локальном хранилище (app.blobs); превью — по нему
+    photo_hash = Column(String(64), nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # индексы под фильтры/фасеты в /listings/browse
+    __table_args__ = (
+        Index("ix_listings_published_subject", "is_published", "subject_id"),
+        Index("ix_listings_published_city", "is_published", "city"),
+        Index("ix_listings_published_rate", "is_published", "hourly_rate"),
+        Index("ix_listings_published_created", "is_published", "created_at"),
+        Index("ix_listings_published_geo_cell", "is_published", "geo_cell"),
+    )
+
     owner = relationship("User", back_populates="listings")
     subject = relationship("Subject", back_populates="listings")
 
 
+@event.listens_for(UserPreference, "before_insert")
+@event.listens_for(UserPreference, "before_update")
+@event.listens_for(Listing, "before_insert")
+@event.listens_for(Listing, "before_update")
+def _sync_geo(mapper, connection, target) -> None:
+    # координаты всегда следуют за city — кто бы ни писал строку
+    point = geocode_city(target.city)
+    target.lat = point.lat if point else None
+    target.lon = point.lon if point else None
+    target.geo_cell = cell_of(point.lat, point.lon) if point else None
+
+
+class Blob(Base):
+    """Файл в content-addressed хранилище (app.blobs); ключ — sha256 содержимого."""
+
+    __tablename__ = "blobs"
+
+    digest = Column(String(64), primary_key=True)
+    content_type = Column(String(40), nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Swipe(Base):
     """
     Оценка другого пользователя (лайк / дизлайк).
@@ -192,9 +308,20 @@ class Swipe(Base):
     )
     like = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # последнее действие (свайп или пересвайп) и что было до пересвайпа —
+    # по ним /swipes/undo отменяет действия в порядке их совершения
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    previous_like = Column(Boolean, nullable=True)
+    previous_at = Column(DateTime, nullable=True)
 
     __table_args__ = (
         UniqueConstraint("from_user_id", "to_user_id", name="uq_swipe_from_to"),
+        # отбор старых дизлайков в архив (app.archive)
+        Index("ix_swipes_like_created", "like", "created_at"),
+        # история свайпов пользователя: keyset по id
+        Index("ix_swipes_from_id", "from_user_id", "id"),
+        # отмена: последние действия пользователя
+        Index("ix_swipes_from_updated", "from_user_id", "updated_at"),
     )
 
     from_user = relationship(
@@ -228,9 +355,17 @@ class Match(Base):
     )
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True, nullable=False)
+    # когда переписка последний раз уезжала в messages_archive (app.archive)
+    archived_at = Column(DateTime, nullable=True)
+    # unmatch / блокировка; по нему purger удаляет переписку (app.blocks)
+    deactivated_at = Column(DateTime, nullable=True)
+    # переписка удалена purger'ом целиком — матч больше не просматривается
+    purged_at = Column(DateTime, nullable=True)
 
     __table_args__ = (
         UniqueConstraint("user1_id", "user2_id", name="uq_match_pair"),
+        # очередь purger'а: неактивные, ещё не вычищенные
+        Index("ix_matches_purge_pending", "is_active", "purged_at", "id"),
     )
 
     user1 = relationship(
@@ -271,5 +406,210 @@ class Message(Base):
     body = Column(String(2000), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_messages_match_created", "match_id", "created_at"),)
+
     match = relationship("Match", back_populates="messages")
     sender = relationship("User")
+
+
+class Block(Base):
+    """
+    Блокировка: blocker больше не видит blocked (и наоборот) в ленте,
+    не может свайпать и писать ему. Проверки — анти-джойны, см. app.blocks.
+    """
+
+    __tablename__ = "blocks"
+
+    blocker_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    blocked_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class MessageArchive(Base):
+    """
+    Сообщения неактивных матчей, вынесенные из горячей таблицы messages
+    (см. app.archive). id сохраняется исходный.
+    """
+
+    __tablename__ = "messages_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    match_id = Column(Integer, nullable=False, index=True)
+    sender_id = Column(Integer, nullable=False)
+    body = Column(String(2000), nullable=False)
+    created_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SwipeArchive(Base):
+    """Старые дизлайки, вынесенные из swipes (см. app.archive)."""
+
+    __tablename__ = "swipes_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    from_user_id = Column(Integer, nullable=False, index=True)
+    to_user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class NotificationOutbox(Base):
+    """
+    Очередь push-уведомлений. Строка пишется в той же транзакции, что и
+    Match/Message, а доставляет её фоновый воркер (app.notifications).
+    """
+
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True)
+    recipient_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    kind = Column(String(20), nullable=False)  # "match" | "message"
+    match_id = Column(Integer, nullable=True)
+    payload = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # воркер «забирает» пачку строк, проставляя свой токен
+    claim_token = Column(String(32), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True, index=True)
+
+
+class OutboxEvent(Base):
+    """
+    Доменное событие (swipe/match/message/listing), записанное в той же
+    транзакции, что и изменение. Читается потребителями по возрастанию id
+    (см. app.outbox).
+    """
+
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(40), nullable=False)  # swipe | match | message | listing
+    event_type = Column(String(60), nullable=False)  # например "swipe.created"
+    aggregate_id = Column(Integer, nullable=True)
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_outbox_events_topic_id", "topic", "id"),
+        Index("ix_outbox_events_created_at", "created_at"),
+    )
+
+
+class OutboxCursor(Base):
+    """Позиция потребителя в потоке outbox_events."""
+
+    __tablename__ = "outbox_cursors"
+
+    consumer = Column(String(80), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UserDailyStats(Base):
+    """
+    Дневной роллап активности пользователя. Обновляется инкрементально
+    агрегатором из outbox (app.analytics) — сырые swipes/messages не сканируем.
+    """
+
+    __tablename__ = "user_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    likes_given = Column(Integer, nullable=False, default=0)
+    dislikes_given = Column(Integer, nullable=False, default=0)
+    likes_received = Column(Integer, nullable=False, default=0)
+    matches = Column(Integer, nullable=False, default=0)
+    messages_sent = Column(Integer, nullable=False, default=0)
+    messages_received = Column(Integer, nullable=False, default=0)
+
+
+class SegmentDailyStats(Base):
+    """
+    Дневной роллап по сегменту рынка (предмет / город репетитора в паре).
+    match rate сегмента = matches / student_likes.
+    """
+
+    __tablename__ = "segment_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    dimension = Column(String(20), primary_key=True)  # subject | city
+    key = Column(String(120), primary_key=True)
+    student_likes = Column(Integer, nullable=False, default=0)
+    tutor_likes = Column(Integer, nullable=False, default=0)
+    matches = Column(Integer, nullable=False, default=0)
+    messages = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_segment_daily_stats_dimension_day", "dimension", "day"),)
+
+
+class CacheInvalidation(Base):
+    """
+    Сообщение «выбросить ключ из кэша» для остальных процессов API
+    (см. app.cache). key = NULL — весь namespace.
+    """
+
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True)
+    namespace = Column(String(60), nullable=False)
+    key = Column(String(255), nullable=True)
+    origin = Column(String(16), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class IdBlock(Base):
+    """
+    Счётчик id таблицы, разнесённой по шардам (см. app.shards). Лежит
+    в каждом шарде и увеличивается короткой отдельной транзакцией, не
+    дожидаясь конца запроса со вставкой.
+    """
+
+    __tablename__ = "id_blocks"
+
+    name = Column(String(60), primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+
+class IncomingLike(Base):
+    """
+    Проекция «кто меня лайкнул»: строка на каждый действующий лайк
+    from_user_id -> to_user_id. Ведётся потребителем outbox (app.likes),
+    лежит в основной БД независимо от шардов swipes.
+    answered — получатель уже свайпнул лайкнувшего в ответ.
+    """
+
+    __tablename__ = "incoming_likes"
+
+    to_user_id = Column(Integer, primary_key=True)
+    from_user_id = Column(Integer, primary_key=True)
+    liked_at = Column(DateTime, nullable=False)
+    answered = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ix_incoming_likes_pending", "to_user_id", "answered", "liked_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """
+    Ответ на POST с заголовком Idempotency-Key (см. app.idempotency).
+    response = NULL — запрос с этим ключом ещё выполняется.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    scope = Column(String(40), nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,207 @@
+# app/notifications.py
+"""
+Push-уведомления о матчах и сообщениях.
+
+Запись: enqueue() добавляет строку в notification_outbox в той же
+транзакции, что и Match/Message, — на пути записи это один INSERT.
+После commit воркер будится событием и доставляет очередь:
+
+- забирает пачку строк (claim_token), чтобы несколько процессов API
+  не отправили одно и то же дважды;
+- склеивает уведомления по получателю: «3 nowe wiadomości» вместо трёх пушей;
+- отдаёт их sender'у пачкой и помечает строки доставленными.
+
+Sender подключается через NOTIFY_SENDER="module:attr" (объект с методом
+send(list[Notification])). По умолчанию — LogSender, который пишет в лог.
+"""
+
+import importlib
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Protocol
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.events import emit, subscribe
+from app.models import NotificationOutbox
+from app.workers import BackgroundWorker
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "200"))
+POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "5"))
+# строки, «забранные» упавшим процессом, снова становятся доступны через это время
+CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv("NOTIFY_CLAIM_TIMEOUT", "120")))
+KEEP_DELIVERED = timedelta(days=1)
+
+ENQUEUED = "notifications.enqueued"
+
+
+@dataclass
+class Notification:
+    recipient_id: int
+    title: str
+    body: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+class Sender(Protocol):
+    def send(self, notifications: List[Notification]) -> None:
+        ...
+
+
+class LogSender:
+    def send(self, notifications: List[Notification]) -> None:
+        for n in notifications:
+            log.info("push -> user %s: %s — %s", n.recipient_id, n.title, n.body)
+
+
+class MemorySender:
+    """Локальная заглушка: складывает уведомления в список (для тестов и отладки)."""
+
+    def __init__(self) -> None:
+        self.sent: List[Notification] = []
+
+    def send(self, notifications: List[Notification]) -> None:
+        self.sent.extend(notifications)
+
+
+_sender: Optional[Sender] = None
+
+
+def get_sender() -> Sender:
+    global _sender
+    if _sender is None:
+        path = os.getenv("NOTIFY_SENDER")
+        if path:
+            module, _, attr = path.partition(":")
+            target = getattr(importlib.import_module(module), attr)
+            _sender = target() if isinstance(target, type) else target
+        else:
+            _sender = LogSender()
+    return _sender
+
+
+def set_sender(sender: Optional[Sender]) -> None:
+    global _sender
+    _sender = sender
+
+
+def enqueue(db: Session, *, recipient_id: int, kind: str, match_id: Optional[int], **payload: Any) -> None:
+    """Ставит уведомление в очередь в текущей транзакции (без commit)."""
+    db.add(
+        NotificationOutbox(
+            recipient_id=recipient_id,
+            kind=kind,
+            match_id=match_id,
+            payload=json.dumps(payload, ensure_ascii=False, default=str),
+        )
+    )
+    emit(db, ENQUEUED)
+
+
+def _plural_messages(n: int) -> str:
+    if n == 1:
+        return "Nowa wiadomość"
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return f"{n} nowe wiadomości"
+    return f"{n} nowych wiadomości"
+
+
+def coalesce(rows: List[NotificationOutbox]) -> List[Notification]:
+    """Одно уведомление на получателя, сколько бы событий ни накопилось."""
+    by_recipient: Dict[int, List[NotificationOutbox]] = defaultdict(list)
+    for row in rows:
+        by_recipient[row.recipient_id].append(row)
+
+    result: List[Notification] = []
+    for recipient_id, items in by_recipient.items():
+        matches = [r for r in items if r.kind == "match"]
+        messages = [r for r in items if r.kind == "message"]
+        data = {
+            "match_ids": sorted({r.match_id for r in items if r.match_id is not None}),
+            "matches": len(matches),
+            "messages": len(messages),
+        }
+        if matches and not messages:
+            title = "Nowe dopasowanie!" if len(matches) == 1 else f"Nowe dopasowania: {len(matches)}"
+            body = "Ktoś odwzajemnił Twoje polubienie."
+        elif messages and not matches:
+            title = _plural_messages(len(messages))
+            last = json.loads(messages[-1].payload or "{}")
+            body = (last.get("preview") or "")[:120]
+        else:
+            title = "Masz nowe powiadomienia"
+            body = f"Dopasowania: {len(matches)}, wiadomości: {len(messages)}."
+        result.append(Notification(recipient_id=recipient_id, title=title, body=body, data=data))
+    return result
+
+
+def deliver_pending(batch_size: int = BATCH_SIZE) -> bool:
+    """Доставляет одну пачку. True — пачка была полной (возможно, есть ещё)."""
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        free = and_(
+            NotificationOutbox.delivered_at.is_(None),
+            or_(
+                NotificationOutbox.claim_token.is_(None),
+                NotificationOutbox.claimed_at < now - CLAIM_TIMEOUT,
+            ),
+        )
+        claimable = (
+            select(NotificationOutbox.id)
+            .where(free)
+            .order_by(NotificationOutbox.id)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        # условие повторяется во внешнем UPDATE: в Postgres (READ COMMITTED)
+        # второй воркер, дождавшись блокировки строки, перепроверит его на
+        # свежей версии и пропустит уже забранные строки
+        db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(claimable), free)
+            .values(claim_token=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        rows = (
+            db.query(NotificationOutbox)
+            .filter(NotificationOutbox.claim_token == token)
+            .order_by(NotificationOutbox.id)
+            .all()
+        )
+        if not rows:
+            return False
+
+        # если sender упадёт — строки останутся забранными и вернутся в очередь
+        # по CLAIM_TIMEOUT
+        get_sender().send(coalesce(rows))
+
+        db.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.claim_token == token)
+            .values(delivered_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(NotificationOutbox).where(
+                NotificationOutbox.delivered_at < now - KEEP_DELIVERED
+            )
+        )
+        db.commit()
+        return len(rows) >= batch_size
+
+
+worker = BackgroundWorker("notifications", deliver_pending, POLL_INTERVAL)
+
+subscribe(ENQUEUED, lambda topic, payload: worker.wake())
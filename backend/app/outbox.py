@@ -0,0 +1,188 @@
+# app/outbox.py
+"""
+Transactional outbox: поток изменений swipes / matches / messages / listings.
+
+Запись. Роутер вызывает record(db, "swipe.created", swipe.id, ...) до своего
+commit — событие сохраняется атомарно вместе с изменением.
+
+Чтение. Потребитель (инвалидация кэшей, уведомления, аналитика) читает
+события пачками по возрастанию id от своего курсора:
+
+    consumer = Consumer("analytics", handle_batch, topics=["swipe", "match"])
+    consumer.poll()            # одна пачка: handler + сдвиг курсора в одном commit
+
+Если handler пишет в ту же БД через переданную сессию, его запись и сдвиг
+курсора коммитятся вместе — повторной обработки не будет. Курсор сдвигается
+через compare-and-set, так что одноимённые потребители в нескольких
+процессах API не обработают одну пачку дважды. Внешние побочные
+эффекты при падении между handler и commit могут повториться (at-least-once).
+
+В Postgres id выдаются до commit, и транзакция с меньшим id может
+закоммититься позже большей. Поэтому там читаем только события старше
+OUTBOX_VISIBILITY_LAG секунд. SQLite пишет последовательно, ему лаг не нужен.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.events import emit
+from app.models import OutboxCursor, OutboxEvent
+from app.workers import BackgroundWorker
+
+APPENDED = "outbox.appended"
+
+VISIBILITY_LAG = timedelta(seconds=float(os.getenv("OUTBOX_VISIBILITY_LAG", "1")))
+RETENTION = timedelta(days=int(os.getenv("OUTBOX_RETENTION_DAYS", "7")))
+
+
+def record(db: Session, event_type: str, aggregate_id: Optional[int], **payload: Any) -> None:
+    """Добавляет событие в текущую транзакцию (без commit)."""
+    topic = event_type.split(".", 1)[0]
+    db.add(
+        OutboxEvent(
+            topic=topic,
+            event_type=event_type,
+            aggregate_id=aggregate_id,
+            payload=json.dumps(payload, ensure_ascii=False, default=str),
+        )
+    )
+    emit(db, APPENDED, stream=topic)
+
+
+def event_payload(event: OutboxEvent) -> Dict[str, Any]:
+    return json.loads(event.payload)
+
+
+def read_batch(
+    db: Session,
+    after_id: int,
+    *,
+    limit: int = 500,
+    topics: Optional[Sequence[str]] = None,
+) -> List[OutboxEvent]:
+    """События с id > after_id по возрастанию id (keyset, по индексу)."""
+    q = db.query(OutboxEvent).filter(OutboxEvent.id > after_id)
+    if topics:
+        q = q.filter(OutboxEvent.topic.in_(list(topics)))
+    if db.bind.dialect.name != "sqlite":
+        q = q.filter(OutboxEvent.created_at <= datetime.utcnow() - VISIBILITY_LAG)
+    return q.order_by(OutboxEvent.id).limit(limit).all()
+
+
+def iter_batches(
+    db: Session,
+    after_id: int = 0,
+    *,
+    batch_size: int = 500,
+    topics: Optional[Sequence[str]] = None,
+) -> Iterator[List[OutboxEvent]]:
+    """Стрим пачек событий от after_id до текущего конца потока."""
+    while True:
+        batch = read_batch(db, after_id, limit=batch_size, topics=topics)
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1].id
+
+
+def get_cursor(db: Session, consumer: str) -> int:
+    cursor = db.get(OutboxCursor, consumer)
+    return cursor.last_id if cursor else 0
+
+
+def set_cursor(db: Session, consumer: str, last_id: int) -> None:
+    cursor = db.get(OutboxCursor, consumer)
+    if cursor is None:
+        db.add(OutboxCursor(consumer=consumer, last_id=last_id))
+    else:
+        cursor.last_id = last_id
+
+
+def advance_cursor(db: Session, consumer: str, from_id: int, to_id: int) -> bool:
+    """
+    Сдвигает курсор from_id -> to_id, только если его никто не сдвинул раньше
+    (compare-and-set). False — пачку уже обработал другой процесс.
+    """
+    if from_id == 0 and db.get(OutboxCursor, consumer) is None:
+        try:
+            with db.begin_nested():
+                db.add(OutboxCursor(consumer=consumer, last_id=to_id))
+            return True
+        except IntegrityError:
+            return False
+    moved = db.execute(
+        update(OutboxCursor)
+        .where(OutboxCursor.consumer == consumer, OutboxCursor.last_id == from_id)
+        .values(last_id=to_id, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return moved == 1
+
+
+Handler = Callable[[Session, List[OutboxEvent]], None]
+
+
+class Consumer:
+    """Именованный потребитель с курсором в outbox_cursors."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Handler,
+        *,
+        topics: Optional[Sequence[str]] = None,
+        batch_size: int = 500,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.topics = list(topics) if topics else None
+        self.batch_size = batch_size
+
+    def poll(self) -> int:
+        """Обрабатывает одну пачку. Возвращает число событий в ней."""
+        with SessionLocal() as db:
+            after_id = get_cursor(db, self.name)
+            batch = read_batch(db, after_id, limit=self.batch_size, topics=self.topics)
+            if not batch:
+                return 0
+            self.handler(db, batch)
+            # если воркер в другом процессе успел раньше — откатываем и свою работу
+            if not advance_cursor(db, self.name, after_id, batch[-1].id):
+                db.rollback()
+                return 0
+            db.commit()
+            return len(batch)
+
+    def drain(self) -> bool:
+        """Для BackgroundWorker: True, если пачка была полной."""
+        return self.poll() >= self.batch_size
+
+
+def prune(db: Session, retention: timedelta = RETENTION) -> int:
+    """
+    Удаляет старые события, которые уже прочитали все потребители.
+    Без потребителей чистит просто по возрасту.
+    """
+    min_cursor = db.execute(select(func.min(OutboxCursor.last_id))).scalar()
+    stmt = delete(OutboxEvent).where(OutboxEvent.created_at < datetime.utcnow() - retention)
+    if min_cursor is not None:
+        stmt = stmt.where(OutboxEvent.id <= min_cursor)
+    deleted = db.execute(stmt).rowcount
+    db.commit()
+    return deleted
+
+
+def _prune_job() -> bool:
+    with SessionLocal() as db:
+        prune(db)
+    return False
+
+
+pruner = BackgroundWorker("outbox-prune", _prune_job, interval=3600)
@@ -0,0 +1,210 @@
+# app/ratelimit.py
+"""
+Token-bucket rate limiting для «дорогих» ручек (swipes, messages, login).
+
+Правило задаётся строкой "<ёмкость>/<период в секундах>", например "30/60" —
+30 запросов подряд, дальше пополнение 30 токенов в минуту.
+Дефолты ниже можно переопределить через env: RATE_LIMIT_<ИМЯ>=10/60.
+
+Бэкенд выбирается через RATE_LIMIT_BACKEND:
+- memory (по умолчанию) — бакеты в памяти процесса;
+- sqlite — общий для всех воркеров файл RATE_LIMIT_SQLITE_PATH
+  (локальная замена Redis и т.п.; нужен общий диск).
+
+Своё хранилище подключается через set_backend(): достаточно метода take().
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Protocol, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.deps import get_current_user
+from app.models import User
+
+DEFAULT_RULES = {
+    "swipes": "120/60",
+    "swipe_undo": "10/60",
+    "messages": "30/60",
+    "login": "10/60",
+}
+
+
+@dataclass(frozen=True)
+class Rule:
+    capacity: float
+    period: float
+
+    @property
+    def refill_per_sec(self) -> float:
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, raw: str) -> "Rule":
+        capacity, _, period = raw.partition("/")
+        rule = cls(capacity=float(capacity), period=float(period or 60))
+        # иначе деление на ноль в refill_per_sec / _retry_after уже на запросе
+        if not (rule.capacity > 0 and rule.period > 0):
+            raise ValueError(f"Invalid rate limit rule {raw!r}: capacity and period must be positive")
+        return rule
+
+
+def get_rule(name: str) -> Rule:
+    raw = os.getenv(f"RATE_LIMIT_{name.upper()}", DEFAULT_RULES[name])
+    return Rule.parse(raw)
+
+
+# кривое правило в env должно ронять старт, а не первый запрос
+for _name in DEFAULT_RULES:
+    get_rule(_name)
+
+
+def _refill(tokens: float, updated: float, now: float, rule: Rule) -> float:
+    return min(rule.capacity, tokens + (now - updated) * rule.refill_per_sec)
+
+
+def _retry_after(tokens: float, cost: float, rule: Rule) -> float:
+    return (cost - tokens) / rule.refill_per_sec
+
+
+class Backend(Protocol):
+    def take(self, key: str, rule: Rule, cost: float = 1.0) -> Tuple[bool, float]:
+        """Списывает cost токенов. Возвращает (разрешено, через сколько секунд повторить)."""
+        ...
+
+
+class InMemoryBackend:
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def take(self, key: str, rule: Rule, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rule.capacity, now))
+            tokens = _refill(tokens, updated, now, rule)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            # самые давно не трогавшиеся бакеты выкидываем — они всё равно полные
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else _retry_after(tokens, cost, rule)
+
+
+class SqliteBackend:
+    """Общий бэкенд для нескольких процессов поверх одного SQLite-файла."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rule: Rule, cost: float = 1.0) -> Tuple[bool, float]:
+        conn = self._connect()
+        # time.time(), а не monotonic: часы должны совпадать между процессами
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = rule.capacity if row is None else _refill(row[0], row[1], now, rule)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, 0.0 if allowed else _retry_after(tokens, cost, rule)
+
+
+_backend: Optional[Backend] = None
+
+
+def _make_backend() -> Backend:
+    kind = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    if kind == "sqlite":
+        return SqliteBackend(os.getenv("RATE_LIMIT_SQLITE_PATH", "./ratelimit.db"))
+    return InMemoryBackend()
+
+
+def get_backend() -> Backend:
+    global _backend
+    if _backend is None:
+        _backend = _make_backend()
+    return _backend
+
+
+def set_backend(backend: Optional[Backend]) -> None:
+    global _backend
+    _backend = backend
+
+
+def _enabled() -> bool:
+    return os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+
+
+def client_ip(request: Request) -> str:
+    if os.getenv("RATE_LIMIT_TRUST_PROXY") == "1":
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def check(name: str, identity: str) -> None:
+    """Списывает токен из бакета name:identity или бросает 429 с Retry-After."""
+    if not _enabled():
+        return
+    allowed, retry_after = get_backend().take(f"{name}:{identity}", get_rule(name))
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def limit_per_user(name: str):
+    """Dependency: лимит на аутентифицированного пользователя."""
+
+    def dependency(current: User = Depends(get_current_user)) -> None:
+        check(name, f"u{current.id}")
+
+    return dependency
+
+
+def limit_per_ip(name: str):
+    """Dependency: лимит на IP клиента (для ручек без авторизации, например login)."""
+
+    def dependency(request: Request) -> None:
+        check(name, f"ip{client_ip(request)}")
+
+    return dependency
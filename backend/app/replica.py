@@ -0,0 +1,59 @@
+# app/replica.py
+"""
+Локальная замена реплики для разработки и тестов.
+
+Если и DATABASE_URL, и REPLICA_DATABASE_URL — SQLite-файлы, воркер
+"replica-sync" раз в REPLICA_SYNC_INTERVAL секунд копирует основную БД
+в файл реплики (sqlite3 backup API). Получается реплика с настоящим
+лагом: видно, что read-your-writes в app.db действительно нужен.
+
+С настоящей репликой (Postgres и т.п.) модуль ничего не делает —
+репликацию ведёт сама СУБД.
+"""
+
+import os
+import sqlite3
+from typing import Optional
+
+from sqlalchemy.engine import make_url
+
+from app.db import DATABASE_URL, REPLICA_DATABASE_URL
+from app.workers import BackgroundWorker
+
+SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL", "1"))
+
+
+def _sqlite_path(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    return parsed.database
+
+
+def is_standin() -> bool:
+    primary, replica = _sqlite_path(DATABASE_URL), _sqlite_path(REPLICA_DATABASE_URL)
+    return primary is not None and replica is not None and primary != replica
+
+
+def sync_standin() -> bool:
+    """Копирует основную SQLite-БД в файл реплики. False — замена не настроена."""
+    if not is_standin():
+        return False
+    src = sqlite3.connect(_sqlite_path(DATABASE_URL))
+    dst = sqlite3.connect(_sqlite_path(REPLICA_DATABASE_URL), timeout=5)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return True
+
+
+def _sync_job() -> None:
+    if is_standin():
+        sync_standin()
+
+
+worker = BackgroundWorker("replica-sync", _sync_job, interval=SYNC_INTERVAL)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.accounts import export_user_data, request_deletion, worker
+from app.db import get_db
+from app.deps import get_current_user
+from app.models import User
+
+router = APIRouter()
+
+
+@router.get("/account/export")
+def export_account(current: User = Depends(get_current_user)):
+    """Все данные пользователя в NDJSON (одна JSON-запись на строку), потоком."""
+    return StreamingResponse(
+        export_user_data(current.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="korfinder-{current.id}.ndjson"'},
+    )
+
+
+@router.delete("/account", status_code=status.HTTP_202_ACCEPTED)
+def delete_account(
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Удалить аккаунт. Доступ пропадает сразу, данные удаляет фоновый воркер.
+    """
+    request_deletion(db, current)
+    db.commit()
+    worker.wake()
+    return Response(status_code=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.analytics import worker  # noqa: F401 — регистрирует фоновый агрегатор
+from app.db import get_db
+from app.deps import get_current_user, require_staff
+from app.models import SegmentDailyStats, User, UserDailyStats
+from app.schemas import SegmentStatsOut, UserAnalyticsOut, UserDayStatsOut, UserStatsCounts
+
+router = APIRouter()
+
+_USER_COUNTERS = (
+    "likes_given",
+    "dislikes_given",
+    "likes_received",
+    "matches",
+    "messages_sent",
+    "messages_received",
+)
+
+
+def _counts(row) -> dict:
+    return {f: getattr(row, f) for f in _USER_COUNTERS}
+
+
+def _ratio(num: int, den: int) -> Optional[float]:
+    return round(num / den, 4) if den else None
+
+
+def _since(days: int) -> date:
+    return date.today() - timedelta(days=days - 1)
+
+
+@router.get("/analytics/me", response_model=UserAnalyticsOut)
+def my_analytics(
+    days: int = Query(default=30, ge=1, le=365),
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Дневные счётчики текущего пользователя за последние days дней (из роллапов)."""
+    rows = (
+        db.query(UserDailyStats)
+        .filter(UserDailyStats.user_id == current.id, UserDailyStats.day >= _since(days))
+        .order_by(UserDailyStats.day.desc())
+        .all()
+    )
+    totals = UserStatsCounts(**{f: sum(getattr(r, f) for r in rows) for f in _USER_COUNTERS})
+    return UserAnalyticsOut(
+        totals=totals,
+        match_rate=_ratio(totals.matches, totals.likes_given),
+        messages_per_match=_ratio(totals.messages_sent + totals.messages_received, totals.matches),
+        days=[UserDayStatsOut(day=r.day, **_counts(r)) for r in rows],
+    )
+
+
+@router.get("/analytics/segments", response_model=List[SegmentStatsOut])
+def segment_analytics(
+    dimension: Literal["subject", "city"] = "subject",
+    days: int = Query(default=30, ge=1, le=365),
+    limit: int = Query(default=50, ge=1, le=500),
+    current: User = Depends(require_staff),
+    db: Session = Depends(get_db),
+):
+    """
+    Лайки, матчи и сообщения по предметам / городам репетиторов (из роллапов).
+    Данные по всей платформе — только для сотрудников (STAFF_EMAILS).
+    """
+    matches = func.sum(SegmentDailyStats.matches)
+    rows = (
+        db.query(
+            SegmentDailyStats.key,
+            func.sum(SegmentDailyStats.student_likes),
+            func.sum(SegmentDailyStats.tutor_likes),
+            matches,
+            func.sum(SegmentDailyStats.messages),
+        )
+        .filter(SegmentDailyStats.dimension == dimension, SegmentDailyStats.day >= _since(days))
+        .group_by(SegmentDailyStats.key)
+        .order_by(matches.desc(), SegmentDailyStats.key)
+        .limit(limit)
+        .all()
+    )
+    return [
+        SegmentStatsOut(
+            dimension=dimension,
+            key=key,
+            student_likes=student_likes,
+            tutor_likes=tutor_likes,
+            matches=match_count,
+            messages=messages,
+            match_rate=_ratio(match_count, student_likes),
+            messages_per_match=_ratio(messages, match_count),
+        )
+        for key, student_likes, tutor_likes, match_count, messages in rows
+    ]
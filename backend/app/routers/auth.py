@@ -5,6 +5,7 @@ from app.models import User, UserRole
 from app.schemas import RegisterIn, LoginIn, AuthOut, UserOut
 from app.security import validate_email, validate_password_strength, hash_password, verify_password, create_access_token
 from app.deps import get_current_user
+from app.ratelimit import limit_per_ip
 
 router = APIRouter()
 
@@ -21,9 +22,11 @@ def register(payload: RegisterIn, db: Session = Depends(get_db)):
                 role=UserRole(payload.role),
                 onboarding_done=False)
     db.add(user); db.commit(); db.refresh(user)
-    return AuthOut(token=create_access_token(user.email), new_user=True)
+    token = create_access_token(user.email)
+    return AuthOut(token=token, new_user=True)
 
-@router.post("/login", response_model=AuthOut)
+# лимит по IP проверяется до bcrypt — перебор паролей не съедает CPU
+@router.post("/login", response_model=AuthOut, dependencies=[Depends(limit_per_ip("login"))])
 def login(payload: LoginIn, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == payload.email.lower()).first()
     if not user or not verify_password(payload.password, user.hashed_password):
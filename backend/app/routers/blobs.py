@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.orm import Session
+
+from app import blobs
+from app.db import get_db
+from app.models import Blob
+
+router = APIRouter()
+
+# содержимое по адресу-хэшу не меняется никогда
+_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+def _serve(request: Request, db: Session, digest: str, variant: str = "") -> Response:
+    if not blobs.is_digest(digest) or (variant and variant not in blobs.THUMB_SIZES):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    blob = db.get(Blob, digest)
+    if blob is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    path, media_type = None, blob.content_type
+    if variant:
+        thumb = blobs.thumb_path(digest, variant)
+        if thumb.exists():
+            path, media_type = thumb, "image/jpeg"
+    if path is None:
+        # превью нет (например, без Pillow) — отдаём оригинал
+        ext = next(e for e, t in blobs.CONTENT_TYPES.items() if t == blob.content_type)
+        path = blobs.blob_path(digest, ext)
+    if not path.exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    etag = f'"{digest}{"-" + variant if variant else ""}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**_CACHE_HEADERS, "ETag": etag})
+    # FileResponse сам обрабатывает Range / If-Range (206 Partial Content)
+    return FileResponse(path, media_type=media_type, headers={**_CACHE_HEADERS, "ETag": etag})
+
+
+@router.get("/blobs/{digest}", name="get_blob")
+def get_blob(digest: str, request: Request, db: Session = Depends(get_db)):
+    return _serve(request, db, digest)
+
+
+@router.get("/blobs/{digest}/{variant}")
+def get_blob_variant(digest: str, variant: str, request: Request, db: Session = Depends(get_db)):
+    return _serve(request, db, digest, variant)
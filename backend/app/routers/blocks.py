@@ -0,0 +1,58 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
+
+from app.blocks import block_user
+from app.db import get_db
+from app.deps import get_current_user
+from app.events import emit
+from app.models import Block, User
+from app.schemas import BlockIn, BlockOut
+
+router = APIRouter()
+
+
+@router.get("/blocks", response_model=List[BlockOut])
+def list_blocks(
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    rows = (
+        db.query(Block)
+        .filter(Block.blocker_id == current.id)
+        .order_by(Block.created_at.desc())
+        .all()
+    )
+    return [BlockOut(user_id=b.blocked_id, created_at=b.created_at) for b in rows]
+
+
+@router.post("/blocks", status_code=status.HTTP_204_NO_CONTENT)
+def block(
+    payload: BlockIn,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Заблокировать пользователя (идемпотентно). Матч с ним, если был, гасится."""
+    if payload.user_id == current.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot block yourself")
+    if db.get(User, payload.user_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    block_user(db, current.id, payload.user_id)
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.delete("/blocks/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+def unblock(
+    user_id: int,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Снять блокировку. Разорванный матч не восстанавливается."""
+    db.query(Block).filter(Block.blocker_id == current.id, Block.blocked_id == user_id).delete(
+        synchronize_session=False
+    )
+    emit(db, "blocks.changed", blocker_id=current.id, blocked_id=user_id)
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
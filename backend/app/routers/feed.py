@@ -1,23 +1,65 @@
+import hashlib
+import os
 from typing import List, Optional, Sequence
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, exists, or_, select
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
 
+from app import outbox
+from app.blocks import not_blocked
+from app.browse import distance_sq_expr, geo_conditions, resolve_center
+from app.cache import Cache
+from app.compression import PrecompressedBody
 from app.db import get_db
 from app.deps import get_current_user
-from app.models import User, UserRole, Listing
+from app.events import subscribe
+from app.geo import GeoPoint
+from app.lesson_types import clean_names, has_any_type
+from app.likes import liked_by
+from app.models import User, UserRole, Listing, StudentCard, user_subject
 from app.schemas import ListingOut
 from app.routers.listings import serialize_listing
+from app.student_cards import card_to_listing
 
 router = APIRouter()
 
+# Страница ленты кэшируется на FEED_CACHE_TTL секунд по (пользователь, параметры):
+# клиент часто перезапрашивает ту же страницу (pull-to-refresh, возврат на экран).
+# Любое изменение объявлений, анкет или блокировок сбрасывает весь namespace
+# во всех воркерах (app.cache). Новые входящие лайки (likes_first) ленту не
+# сбрасывают — подхватываются по TTL.
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "30"))
+
+_cache = Cache("feed", FEED_CACHE_TTL)
+
+
+def _cache_key(user: User, *parts: object) -> str:
+    # exclude_ids может быть длинным — в ключе держим только хэш параметров
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f"{user.id}:{digest}"
+
+
+def invalidate_feed_cache(topic: str = "", payload: Optional[dict] = None) -> None:
+    if topic == outbox.APPENDED and (payload or {}).get("stream") != "listing":
+        return
+    _cache.invalidate()
+
+
+for _topic in (outbox.APPENDED, "profile.updated", "blocks.changed", "account.deleted"):
+    subscribe(_topic, invalidate_feed_cache)
+
 
 @router.get("/feed", response_model=List[ListingOut])
 def feed(
+    request: Request,
     current_user: User = Depends(get_current_user),
     exclude_ids: Optional[str] = Query(default=None, description="1,2,3"),
     limit: int = 20,
+    radius_km: Optional[float] = Query(default=None, gt=0, description="tylko korepetytorzy w promieniu"),
+    near_city: Optional[str] = None,
+    types: Optional[List[str]] = Query(default=None, description="typy zajęć, np. matura"),
+    likes_first: bool = Query(default=False, description="najpierw osoby, które polubiły mnie"),
     db: Session = Depends(get_db),
 ):
     parsed_exclude: set[int] = set()
@@ -27,20 +69,62 @@ def feed(
         }
 
     safe_limit = max(1, min(limit, 100))
+    type_names = clean_names(types)
+
+    key = _cache_key(
+        current_user,
+        current_user.role.value,
+        sorted(parsed_exclude),
+        safe_limit,
+        radius_km,
+        near_city,
+        sorted(type_names),
+        likes_first,
+    )
+    body = _cache.get(key)
+    if body is None:
+        body = PrecompressedBody.from_json(
+            _build_feed(
+                current_user, parsed_exclude, safe_limit, radius_km, near_city, type_names, likes_first, db
+            )
+        )
+        _cache.set(key, body)
+    return body.response(request)
+
 
+def _build_feed(
+    current_user: User,
+    parsed_exclude: set[int],
+    safe_limit: int,
+    radius_km: Optional[float],
+    near_city: Optional[str],
+    type_names: Sequence[str],
+    likes_first: bool,
+    db: Session,
+) -> List[ListingOut]:
     if current_user.role == UserRole.tutor:
         return _student_profiles_feed(
             current_user=current_user,
             limit=safe_limit,
             exclude_ids=parsed_exclude,
             db=db,
+            types=type_names,
+            likes_first=likes_first,
         )
 
+    center = None
+    if radius_km is not None:
+        center = resolve_center(current_user, near_city=near_city)
+
     listings = _tutor_listings_feed(
         current_user=current_user,
         limit=safe_limit,
         exclude_ids=parsed_exclude,
         db=db,
+        center=center,
+        radius_km=radius_km,
+        types=type_names,
+        likes_first=likes_first,
     )
     return listings
 
@@ -51,15 +135,29 @@ def _tutor_listings_feed(
     limit: int,
     exclude_ids: set[int],
     db: Session,
+    center: Optional[GeoPoint] = None,
+    radius_km: Optional[float] = None,
+    types: Sequence[str] = (),
+    likes_first: bool = False,
 ) -> List[ListingOut]:
+    geo_filter = []
+    if center is not None and radius_km:
+        # гео-режим: только стационарные занятия в радиусе, ближайшие первыми
+        geo_filter = [Listing.is_offline == True, *geo_conditions(center, radius_km)]  # noqa: E712
+
     base_q = (
         db.query(Listing)
         .join(User, Listing.owner_id == User.id)
         .filter(Listing.is_published == True)  # noqa: E712
         .filter(Listing.owner_id != current_user.id)
         .filter(User.role == UserRole.tutor)
+        .filter(not_blocked(current_user.id, Listing.owner_id))
+        .filter(*geo_filter)
     )
 
+    if types:
+        base_q = base_q.filter(has_any_type(Listing.owner_id, list(types)))
+
     if exclude_ids:
         base_q = base_q.filter(~Listing.id.in_(exclude_ids))
 
@@ -81,11 +179,16 @@ def _tutor_listings_feed(
                 Listing.created_at == subq.c.max_created_at,
             ),
         )
-        .order_by(Listing.created_at.desc())
+        .filter(*geo_filter)
+        .order_by(
+            # likes_first: сначала репетиторы, которые уже лайкнули (см. app.likes)
+            *([liked_by(current_user.id, Listing.owner_id).desc()] if likes_first else []),
+            distance_sq_expr(center).asc() if geo_filter else Listing.created_at.desc(),
+        )
         .limit(limit)
     )
 
-    listings = [serialize_listing(item) for item in q.all()]
+    listings = [serialize_listing(item, center) for item in q.all()]
     return listings
 
 
@@ -95,73 +198,49 @@ def _student_profiles_feed(
     limit: int,
     exclude_ids: set[int],
     db: Session,
+    types: Sequence[str] = (),
+    likes_first: bool = False,
 ) -> List[ListingOut]:
-    candidates: Sequence[User] = (
-        db.query(User)
-        .options(
-            joinedload(User.preferences),
-            joinedload(User.subjects),
-        )
+    # карточки учеников имеют id = -user.id, см. card_to_listing
+    excluded_users = {-item for item in exclude_ids if item < 0}
+
+    # ученик подходит, если у него есть общий предмет с репетитором
+    # (репетитор без предметов видит всех)
+    tutor_subj = user_subject.alias("tutor_subj")
+    student_subj = user_subject.alias("student_subj")
+    tutor_subject_ids = select(tutor_subj.c.subject_id).where(
+        tutor_subj.c.user_id == current_user.id
+    )
+    subject_match = or_(
+        ~exists(tutor_subject_ids),
+        exists().where(
+            student_subj.c.user_id == User.id,
+            student_subj.c.subject_id.in_(tutor_subject_ids),
+        ),
+    )
+
+    q = (
+        db.query(StudentCard)
+        .join(User, StudentCard.user_id == User.id)
         .filter(User.role == UserRole.student)
         .filter(User.onboarding_done == True)  # noqa: E712
         .filter(User.id != current_user.id)
-        .order_by(User.created_at.desc())
-        .limit(limit * 3)
-        .all()
+        .filter(not_blocked(current_user.id, User.id))
+        .filter(subject_match)
     )
+    if excluded_users:
+        q = q.filter(User.id.notin_(excluded_users))
+    if types:
+        q = q.filter(has_any_type(User.id, list(types)))
 
-    feed_items: List[ListingOut] = []
-    for student in candidates:
-        listing = _serialize_student_profile(student)
-        if listing.id in exclude_ids:
-            continue
-        feed_items.append(listing)
-        if len(feed_items) >= limit:
-            break
-    return feed_items
-
-
-def _serialize_student_profile(user: User) -> ListingOut:
-    pref = user.preferences
-    subject_name = user.subjects[0].name if user.subjects else None
-
-    def _split_types(raw: Optional[str]) -> List[str]:
-        if not raw:
-            return []
-        return [piece.strip() for piece in raw.split(",") if piece.strip()]
-
-    types = _split_types(pref.types if pref else None)
-    level = ", ".join(types) if types else None
+    order = [StudentCard.created_at.desc(), StudentCard.user_id.desc()]
+    if likes_first:
+        order.insert(0, liked_by(current_user.id, User.id).desc())
 
-    desc_parts: List[str] = []
-    if types:
-        desc_parts.append("Potrzebuje wsparcia w: " + ", ".join(types) + ".")
-    if pref:
-        if pref.online and pref.offline:
-            desc_parts.append("Zajęcia online lub stacjonarnie.")
-        elif pref.online:
-            desc_parts.append("Preferuje zajęcia online.")
-        elif pref.offline:
-            desc_parts.append("Preferuje zajęcia stacjonarne.")
-        if pref.city:
-            desc_parts.append(f"Miasto: {pref.city}.")
-    description = " ".join(desc_parts) or "Aktywny uczeń szuka korepetycji."
-
-    title_subject = f" z {subject_name}" if subject_name else ""
-    title = f"{user.first_name} szuka korepetytora{title_subject}"
-
-    return ListingOut(
-        id=-user.id,
-        owner_id=user.id,
-        tutor_id=user.id,
-        title=title,
-        description=description,
-        subject=subject_name,
-        level=level,
-        price_per_hour=pref.hourly_rate if pref else None,
-        city=pref.city if pref else None,
-        is_published=True,
-        created_at=user.created_at,
-        photo_url=None,
-        role=user.role.value,
+    # карточки уже собраны при сохранении анкеты — просто читаем строки
+    cards: Sequence[StudentCard] = (
+        q.order_by(*order)
+        .limit(limit)
+        .all()
     )
+    return [card_to_listing(card) for card in cards]
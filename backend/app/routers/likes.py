@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from app.blocks import not_blocked
+from app.db import get_db
+from app.deps import get_current_user
+from app.models import IncomingLike, Listing, StudentCard, User
+from app.routers.listings import serialize_listing
+from app.schemas import IncomingLikeOut, ListingOut
+from app.student_cards import card_to_listing
+
+router = APIRouter()
+
+
+def _cards(db: Session, user_ids: List[int]) -> Dict[int, ListingOut]:
+    """Карточки лайкнувших: последнее опубликованное объявление репетитора или карточка ученика."""
+    if not user_ids:
+        return {}
+    cards = {
+        card.user_id: card_to_listing(card)
+        for card in db.query(StudentCard).filter(StudentCard.user_id.in_(user_ids))
+    }
+    latest = (
+        db.query(Listing.owner_id, func.max(Listing.id).label("listing_id"))
+        .filter(Listing.owner_id.in_(user_ids), Listing.is_published == True)  # noqa: E712
+        .group_by(Listing.owner_id)
+        .subquery()
+    )
+    for listing in db.query(Listing).join(latest, Listing.id == latest.c.listing_id):
+        cards.setdefault(listing.owner_id, serialize_listing(listing))
+    return cards
+
+
+@router.get("/likes/incoming", response_model=List[IncomingLikeOut])
+def incoming_likes(
+    limit: int = 20,
+    before: Optional[datetime] = None,
+    before_user_id: Optional[int] = None,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Кто лайкнул меня и ещё ждёт ответа — новые первыми.
+    Следующая страница: before = liked_at и before_user_id = user_id
+    последнего элемента (лайки с одинаковым liked_at не теряются).
+    """
+    q = (
+        db.query(IncomingLike)
+        .join(User, User.id == IncomingLike.from_user_id)
+        .filter(IncomingLike.to_user_id == current.id)
+        .filter(IncomingLike.answered == False)  # noqa: E712
+        .filter(User.deleted_at.is_(None))
+        .filter(not_blocked(current.id, IncomingLike.from_user_id))
+    )
+    if before is not None and before_user_id is not None:
+        q = q.filter(tuple_(IncomingLike.liked_at, IncomingLike.from_user_id) < tuple_(before, before_user_id))
+    elif before is not None:
+        q = q.filter(IncomingLike.liked_at < before)
+    rows = (
+        q.order_by(IncomingLike.liked_at.desc(), IncomingLike.from_user_id.desc())
+        .limit(max(1, min(limit, 100)))
+        .all()
+    )
+    cards = _cards(db, [row.from_user_id for row in rows])
+    return [
+        IncomingLikeOut(user_id=row.from_user_id, liked_at=row.liked_at, card=cards.get(row.from_user_id))
+        for row in rows
+    ]
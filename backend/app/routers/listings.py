@@ -1,20 +1,48 @@
-from typing import List
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
 
-from app.db import get_db
+from app import blobs
+from app.db import get_db, session_factory_for
 from app.deps import get_current_user
-from app.models import Listing, Subject, User, UserRole
-from app.schemas import ListingCreate, ListingOut, ListingUpdate
+from app.browse import BrowseFilters, browse_listings, compute_facets, resolve_center
+from app.geo import GeoPoint, distance_km
+from app.idempotency import Idempotency, idempotency
+from app.lesson_types import clean_names
+from app.outbox import record
+from app.models import Blob, Listing, Subject, User, UserRole
+from app.search import search_listing_ids
+from app.schemas import ListingBrowseOut, ListingCreate, ListingOut, ListingUpdate
+from app.streaming import ndjson_response, wants_ndjson
 
 router = APIRouter(prefix="/listings")
 
+# какой вариант превью отдаём в thumb_url карточки (см. app.blobs.THUMB_SIZES)
+CARD_THUMB = "m"
 
-def serialize_listing(listing: Listing) -> ListingOut:
+
+def record_listing_event(db: Session, event_type: str, listing: Listing) -> None:
+    record(
+        db,
+        event_type,
+        listing.id,
+        owner_id=listing.owner_id,
+        subject_id=listing.subject_id,
+        city=listing.city,
+        is_published=listing.is_published,
+    )
+
+
+def serialize_listing(listing: Listing, center: Optional[GeoPoint] = None) -> ListingOut:
     owner = listing.owner
     subject = listing.subject
     owner_id = owner.id if owner else None
+    distance = None
+    if center is not None and listing.lat is not None:
+        distance = round(distance_km(center, GeoPoint(listing.lat, listing.lon)), 1)
     return ListingOut(
         id=listing.id,
         owner_id=owner_id,
@@ -28,7 +56,9 @@ def serialize_listing(listing: Listing) -> ListingOut:
         is_published=listing.is_published,
         created_at=listing.created_at,
         photo_url=listing.photo_url,
+        thumb_url=f"{listing.photo_url}/{CARD_THUMB}" if listing.photo_hash and listing.photo_url else None,
         role=owner.role.value if owner and owner.role else None,
+        distance_km=distance,
     )
 
 
@@ -37,7 +67,12 @@ def create_listing(
     payload: ListingCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    idem: Idempotency = Depends(idempotency("listings")),
 ):
+    replay = idem.start(current_user.id, payload)
+    if replay is not None:
+        return replay
+
     if current_user.role != UserRole.tutor:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -53,16 +88,110 @@ def create_listing(
 
     listing = Listing(owner_id=current_user.id, **payload.dict())
     db.add(listing)
-    db.commit()
+    db.flush()
+    record_listing_event(db, "listing.created", listing)
     db.refresh(listing)
-    return serialize_listing(listing)
+    out = serialize_listing(listing)
+    idem.finish(db, out, status_code=status.HTTP_201_CREATED)
+    db.commit()
+    return out
+
+
+@router.get("/search", response_model=List[ListingOut])
+def search_listings(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = 20,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Полнотекстовый поиск по опубликованным объявлениям, по релевантности."""
+    ranked = search_listing_ids(
+        db, q, limit=max(1, min(limit, 100)), offset=max(0, offset)
+    )
+    if not ranked:
+        return []
+
+    ids = [listing_id for listing_id, _ in ranked]
+    by_id = {
+        item.id: item
+        for item in db.query(Listing)
+        .options(joinedload(Listing.owner), joinedload(Listing.subject))
+        .filter(Listing.id.in_(ids))
+    }
+    return [serialize_listing(by_id[i]) for i in ids if i in by_id]
+
+
+@router.get("/browse", response_model=ListingBrowseOut)
+def browse(
+    subject_id: Optional[List[int]] = Query(default=None),
+    city: Optional[str] = None,
+    online: Optional[bool] = None,
+    offline: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    types: Optional[List[str]] = Query(default=None),
+    radius_km: Optional[float] = Query(default=None, gt=0),
+    near_city: Optional[str] = None,
+    lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    lon: Optional[float] = Query(default=None, ge=-180, le=180),
+    sort: Literal["newest", "price_asc", "price_desc", "distance"] = "newest",
+    limit: int = 20,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Объявления репетиторов с фильтрами + счётчики по фасетам.
+    С radius_km (или sort=distance) — гео-режим: центр из lat/lon, near_city
+    или города в анкете пользователя.
+    """
+    center = None
+    if radius_km is not None or sort == "distance":
+        center = resolve_center(current_user, near_city=near_city, lat=lat, lon=lon)
+    filters = BrowseFilters(
+        subject_ids=subject_id,
+        city=city.strip() if city else None,
+        online=online,
+        offline=offline,
+        min_price=min_price,
+        max_price=max_price,
+        exclude_owner_id=current_user.id,
+        near=center,
+        radius_km=radius_km,
+        lesson_types=clean_names(types),
+    )
+    items = browse_listings(
+        db,
+        filters,
+        sort=sort,
+        limit=max(1, min(limit, 100)),
+        offset=max(0, offset),
+    )
+    total, facets = compute_facets(db, filters)
+    return ListingBrowseOut(
+        items=[serialize_listing(item, center) for item in items],
+        total=total,
+        facets=facets,
+    )
 
 
 @router.get("/me", response_model=List[ListingOut])
 def my_listings(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    if wants_ndjson(request):
+        # владелец и предмет — many-to-one, joinedload совместим с yield_per
+        stmt = (
+            select(Listing)
+            .options(joinedload(Listing.owner), joinedload(Listing.subject))
+            .where(Listing.owner_id == current_user.id)
+            .order_by(Listing.created_at.desc(), Listing.id.desc())
+        )
+        return ndjson_response([stmt], serialize_listing, session_factory=session_factory_for(db))
+
     listings = (
         db.query(Listing)
         .filter(Listing.owner_id == current_user.id)
@@ -111,13 +240,70 @@ def update_listing(
 
     for key, value in data.items():
         setattr(listing, key, value)
+    if "photo_url" in data:
+        # внешняя ссылка заменяет загруженное фото
+        listing.photo_hash = None
 
     db.add(listing)
+    record_listing_event(db, "listing.updated", listing)
     db.commit()
     db.refresh(listing)
     return serialize_listing(listing)
 
 
+def _owned_listing(db: Session, listing_id: int, current_user: User) -> Listing:
+    listing = db.query(Listing).get(listing_id)
+    if not listing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if listing.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return listing
+
+
+def _attach_photo(db: Session, listing_id: int, digest: str, ext: str, size: int, url: str) -> ListingOut:
+    if db.get(Blob, digest) is None:
+        db.add(Blob(digest=digest, content_type=blobs.CONTENT_TYPES[ext], size=size))
+    listing = db.query(Listing).get(listing_id)
+    listing.photo_hash = digest
+    listing.photo_url = url
+    record_listing_event(db, "listing.updated", listing)
+    db.commit()
+    db.refresh(listing)
+    return serialize_listing(listing)
+
+
+@router.put("/{listing_id}/photo", response_model=ListingOut)
+async def upload_photo(
+    listing_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Загрузка фото объявления: тело запроса — сами байты картинки
+    (Content-Type: image/jpeg | image/png | image/webp), без multipart.
+    """
+    await run_in_threadpool(_owned_listing, db, listing_id, current_user)
+
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > blobs.MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    try:
+        digest, ext, size, _ = await blobs.store_stream(request.stream())
+    except blobs.BlobTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    except blobs.UnsupportedImage:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Only JPEG, PNG or WEBP images are supported",
+        )
+
+    # превью строятся в пуле процессов; для уже известного файла — мгновенно
+    await blobs.ensure_thumbnails(digest, ext)
+    url = str(request.url_for("get_blob", digest=digest))
+    return await run_in_threadpool(_attach_photo, db, listing_id, digest, ext, size, url)
+
+
 @router.delete("/{listing_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_listing(
     listing_id: int,
@@ -130,6 +316,7 @@ def delete_listing(
     if listing.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
+    record_listing_event(db, "listing.deleted", listing)
     db.delete(listing)
     db.commit()
     return None
@@ -1,9 +1,10 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
+from app.blocks import deactivate_match
 from app.db import get_db
 from app.deps import get_current_user
 from app.models import User, Match
@@ -37,3 +38,18 @@ def list_matches(
             )
         )
     return result
+
+
+@router.post("/matches/{match_id}/unmatch", status_code=status.HTTP_204_NO_CONTENT)
+def unmatch(
+    match_id: int,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Разорвать матч: чат пропадает у обоих, переписку позже удалит purger."""
+    match = db.get(Match, match_id)
+    if match is None or current.id not in (match.user1_id, match.user2_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found")
+    deactivate_match(db, match, by_user_id=current.id, reason="unmatch")
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,12 +1,20 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
+from app.archive import load_messages, message_statements
+from app.blocks import is_blocked
 from app.db import get_db
 from app.deps import get_current_user
+from app.idempotency import Idempotency, idempotency
 from app.models import User, Match, Message
+from app.notifications import enqueue
+from app.outbox import record
+from app.ratelimit import limit_per_user
 from app.schemas import MessageOut, MessageCreate
+from app.shards import ShardSessions, get_shards, session_factory, shard_of
+from app.streaming import ndjson_response, wants_ndjson
 
 router = APIRouter()
 
@@ -22,36 +30,62 @@ def _get_match_for_user(match_id: int, current: User, db: Session) -> Match:
 
     if current.id not in (match.user1_id, match.user2_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not your match")
+
+    # блокировка гасит матч сама, но проверяем и напрямую — на случай гонки
+    other_id = match.user2_id if match.user1_id == current.id else match.user1_id
+    if is_blocked(db, current.id, other_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found")
     return match
 
 
+def _message_out(msg) -> MessageOut:
+    # Message и MessageArchive — оба с нужными атрибутами
+    return MessageOut.model_validate(msg, from_attributes=True)
+
+
 @router.get("/messages", response_model=List[MessageOut])
 def list_messages(
+    request: Request,
     match_id: int,
-    limit: int = 100,
+    limit: Optional[int] = None,
     db: Session = Depends(get_db),
+    shards: ShardSessions = Depends(get_shards),
     current: User = Depends(get_current_user),
 ):
-    """Сообщения внутри чата (матча), по умолчанию до 100 шт."""
+    """
+    Сообщения внутри чата (матча), по умолчанию до 100 шт.
+    С Accept: application/x-ndjson — потоком, по умолчанию вся история.
+    """
     match = _get_match_for_user(match_id, current, db)
-
-    q = (
-        db.query(Message)
-        .filter(Message.match_id == match.id)
-        .order_by(Message.created_at.asc())
-        .limit(max(1, min(limit, 500)))
-    )
-
-    return q.all()
+    if wants_ndjson(request):
+        return ndjson_response(
+            message_statements(match),
+            _message_out,
+            limit=max(1, limit) if limit is not None else None,
+            session_factory=session_factory(shard_of(match.id), db),
+        )
+    # старая история могла уехать в messages_archive — дочитываем оттуда
+    return load_messages(shards.for_match(match.id), match, max(1, min(limit or 100, 500)))
 
 
-@router.post("/messages", response_model=MessageOut, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/messages",
+    response_model=MessageOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_per_user("messages"))],
+)
 def send_message(
     payload: MessageCreate,
     db: Session = Depends(get_db),
+    shards: ShardSessions = Depends(get_shards),
     current: User = Depends(get_current_user),
+    idem: Idempotency = Depends(idempotency("messages")),
 ):
-    """Отправить сообщение в матч (чат)."""
+    """Отправить сообщение в матч (чат). Повтор с тем же Idempotency-Key не создаёт второе."""
+    replay = idem.start(current.id, payload)
+    if replay is not None:
+        return replay
+
     match = _get_match_for_user(payload.match_id, current, db)
 
     msg = Message(
@@ -59,7 +93,19 @@ def send_message(
         sender_id=current.id,
         body=payload.body,
     )
-    db.add(msg)
-    db.commit()
-    db.refresh(msg)
-    return msg
+    # сообщение — в шард матча; outbox и уведомление — в основную БД
+    shard = shards.add(msg)
+    shard.flush()
+    record(db, "message.created", msg.id, match_id=match.id, sender_id=current.id)
+    enqueue(
+        db,
+        recipient_id=match.user2_id if match.user1_id == current.id else match.user1_id,
+        kind="message",
+        match_id=match.id,
+        message_id=msg.id,
+        preview=msg.body[:120],
+    )
+    out = _message_out(msg)
+    idem.finish(db, out, status_code=status.HTTP_201_CREATED)
+    shards.commit()  # шарды, затем основная БД
+    return out
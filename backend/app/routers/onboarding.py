@@ -1,16 +1,23 @@
 from fastapi import APIRouter, Depends
+from sqlalchemy import delete, insert
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.db import get_db
 from app.deps import get_current_user
+from app.events import emit
+from app.lesson_types import replace_lesson_types
 from app.models import (
     User,
     UserRole,
     UserPreference,
     Subject,
     Listing,
+    user_subject,
 )
+from app.routers.listings import record_listing_event
 from app.schemas import OnboardingIn
+from app.student_cards import refresh_student_card
 
 router = APIRouter()
 
@@ -19,6 +26,7 @@ def _upsert_listing_from_profile(user: User, db: Session) -> None:
     """
     Для репетитора гарантирует, что есть ровно одно объявление,
     и его поля синхронизированы с профилем/преференциями.
+    Commit делает вызывающий код.
     """
     if user.role != UserRole.tutor:
         return
@@ -58,9 +66,26 @@ def _upsert_listing_from_profile(user: User, db: Session) -> None:
     listing.is_published = True
     # photo_url оставляем как есть — позже добавим загрузку аватарки
 
+    created = listing.id is None
     db.add(listing)
-    db.commit()
-    db.refresh(listing)
+    db.flush()
+    record_listing_event(db, "listing.created" if created else "listing.updated", listing)
+
+
+def _replace_subjects(user: User, subject_ids: list[int], db: Session) -> None:
+    """user_subject заменяем одним DELETE + bulk INSERT, без загрузки старой коллекции."""
+    found = {s.id: s for s in db.query(Subject).filter(Subject.id.in_(subject_ids))}
+    # порядок из анкеты: первый предмет — основной (заголовок объявления/карточки)
+    subjects = [found[i] for i in dict.fromkeys(subject_ids) if i in found]
+
+    db.execute(delete(user_subject).where(user_subject.c.user_id == user.id))
+    if subjects:
+        db.execute(
+            insert(user_subject),
+            [{"user_id": user.id, "subject_id": s.id} for s in subjects],
+        )
+    # коллекция в памяти уже соответствует БД — не даём ORM писать её повторно
+    set_committed_value(user, "subjects", subjects)
 
 
 @router.post("/onboarding")
@@ -69,27 +94,35 @@ def save_onboarding(
     current: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    # Всё сохранение анкеты — одна транзакция и один commit:
+    # preferences, типы занятий, предметы, карточка ученика / объявление репетитора.
+
     # preferences
-    pref = current.preferences or UserPreference(user_id=current.id)
+    pref = current.preferences
+    if pref is None:
+        pref = UserPreference(user_id=current.id)
+        current.preferences = pref
     pref.online = data.online
     pref.offline = data.offline
     pref.group_classes = data.group_classes
     pref.city = data.city
     pref.hourly_rate = data.hourly_rate
-    pref.types = ",".join(data.types) if data.types else None
     db.add(pref)
+    replace_lesson_types(db, pref, data.types)
 
     # subjects
     if data.subjects:
-        subjects = db.query(Subject).filter(Subject.id.in_(data.subjects)).all()
-        current.subjects = subjects
+        _replace_subjects(current, data.subjects, db)
 
     current.onboarding_done = True
     db.add(current)
-    db.commit()
-    db.refresh(current)
 
+    # карточка ученика для feed репетиторов пересобирается вместе с анкетой
+    refresh_student_card(db, current)
     # 🔁 каждый раз после обновления анкеты — синхронизируем объявление
     _upsert_listing_from_profile(current, db)
 
+    emit(db, "profile.updated", user_id=current.id, role=current.role.value)
+    db.commit()
+
     return {"ok": True}
@@ -1,20 +1,61 @@
 # app/routers/subjects.py
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Tuple
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 
+from app.cache import Cache
+from app.compression import PrecompressedBody
 from app.db import get_db
 from app.models import Subject
 
 router = APIRouter()
 
+# Список предметов почти не меняется (только сид-скриптами),
+# поэтому держим его в кэше (app.cache) и перечитываем раз в TTL.
+SUBJECTS_CACHE_TTL = float(os.getenv("SUBJECTS_CACHE_TTL", "300"))
 
-@router.get("/subjects")
-def list_subjects(db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
+# значение: (список dict'ов, то же самое уже в JSON и сжатое по требованию)
+_cache = Cache("subjects", SUBJECTS_CACHE_TTL)
+_KEY = "all"
+
+
+def _read(db: Session) -> Tuple[List[Dict[str, Any]], PrecompressedBody]:
+    subjects = db.query(Subject).order_by(Subject.name).all()
+    data = [{"id": s.id, "name": s.name} for s in subjects]
+    return data, PrecompressedBody.from_json(data)
+
+
+def _load(db: Session, refresh: bool) -> Tuple[List[Dict[str, Any]], PrecompressedBody]:
+    value = None if refresh else _cache.get(_KEY)
+    if value is None:
+        value = _read(db)
+        # пустой список не кэшируем: прогрев мог пройти до сид-скриптов
+        if value[0]:
+            _cache.set(_KEY, value)
+    return value
+
+
+def load_subjects(db: Session, *, refresh: bool = False) -> List[Dict[str, Any]]:
+    return _load(db, refresh)[0]
+
+
+def load_subjects_body(db: Session) -> PrecompressedBody:
+    return _load(db, False)[1]
+
+
+def invalidate_subjects_cache() -> None:
+    """Сбрасывает список во всех воркерах (после сид-скриптов и т.п.)."""
+    _cache.invalidate()
+
+
+@router.get("/subjects", response_model=List[Dict[str, Any]])
+def list_subjects(request: Request, db: Session = Depends(get_db)) -> Response:
     """
     Простой список предметов для онбординга.
     Возвращаем голые dict'ы {id, name}, чтобы точно совпало с iOS-моделью.
+    Тело берём из кэша уже сериализованным (и сжатым), без повторной работы.
     """
-    subjects = db.query(Subject).order_by(Subject.name).all()
-    return [{"id": s.id, "name": s.name} for s in subjects]
+    return load_subjects_body(db).response(request)
@@ -1,26 +1,53 @@
-from fastapi import APIRouter, Depends
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import exists, select
 from sqlalchemy.orm import Session
 
+from app.blocks import deactivate_match, is_blocked
 from app.db import get_db
 from app.deps import get_current_user
-from app.models import User, Swipe, Match
-from app.schemas import SwipeIn, SwipeOut
+from app.idempotency import Idempotency, idempotency
+from app.models import User, Swipe, Match, Message, MessageArchive
+from app.notifications import enqueue
+from app.outbox import record
+from app.ratelimit import limit_per_user
+from app.schemas import SwipeHistoryOut, SwipeIn, SwipeOut, SwipeUndoIn, SwipeUndoOut
+from app.shards import ShardSessions, get_shards
 
 router = APIRouter()
 
+# сколько последних свайпов можно отменить за раз
+UNDO_MAX = int(os.getenv("SWIPE_UNDO_MAX", "10"))
+
 
-@router.post("/swipes", response_model=SwipeOut)
+@router.post("/swipes", response_model=SwipeOut, dependencies=[Depends(limit_per_user("swipes"))])
 def swipe(
     payload: SwipeIn,
     current: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    shards: ShardSessions = Depends(get_shards),
+    idem: Idempotency = Depends(idempotency("swipes")),
 ):
+    # повтор запроса с тем же Idempotency-Key — прежний ответ без записи
+    replay = idem.start(current.id, payload)
+    if replay is not None:
+        return replay
+
     current_user_id = current.id
     target_user_id = payload.target_user_id
 
+    if is_blocked(db, current_user_id, target_user_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User blocked")
+
+    # свайпы лежат в шарде автора (from_user_id); матчи и outbox — в основной БД
+    shard = shards.for_user(current_user_id)
+
     # найдём или создадим запись свайпа
     swipe = (
-        db.query(Swipe)
+        shard.query(Swipe)
         .filter(Swipe.from_user_id == current_user_id, Swipe.to_user_id == target_user_id)
         .first()
     )
@@ -30,16 +57,41 @@ def swipe(
             to_user_id=target_user_id,
             like=payload.like,
         )
-        db.add(swipe)
+        shards.add(swipe)
+        shard.flush()
+        record(
+            db,
+            "swipe.created",
+            swipe.id,
+            from_user_id=current_user_id,
+            to_user_id=target_user_id,
+            like=payload.like,
+        )
     else:
-        swipe.like = payload.like
+        previous = swipe.like
+        if previous != payload.like:
+            # пересвайп — отдельное действие: запоминаем, к чему вернёт undo
+            swipe.previous_like = previous
+            swipe.previous_at = swipe.updated_at
+            swipe.like = payload.like
+            swipe.updated_at = datetime.utcnow()
+            record(
+                db,
+                "swipe.updated",
+                swipe.id,
+                from_user_id=current_user_id,
+                to_user_id=target_user_id,
+                like=payload.like,
+                previous_like=previous,
+            )
 
     is_match = False
 
     if payload.like:
-        # есть ли обратный лайк?
+        # есть ли обратный лайк? Он в шарде второго пользователя
         reverse = (
-            db.query(Swipe)
+            shards.for_user(target_user_id)
+            .query(Swipe)
             .filter(
                 Swipe.from_user_id == target_user_id,
                 Swipe.to_user_id == current_user_id,
@@ -58,7 +110,127 @@ def swipe(
             if match is None:
                 match = Match(user1_id=user1_id, user2_id=user2_id)
                 db.add(match)
-            is_match = True
+                db.flush()
+                record(db, "match.created", match.id, user1_id=user1_id, user2_id=user2_id)
+                # свайпнувший узнаёт о матче из ответа, второму — пуш
+                enqueue(db, recipient_id=target_user_id, kind="match", match_id=match.id)
+            # разорванный матч повторным лайком не восстанавливается
+            is_match = match.is_active
+
+    out = SwipeOut(match=is_match)
+    idem.finish(db, out)
+    shards.commit()  # шарды, затем основная БД
+    return out
+
+
+def _history_out(swipe: Swipe) -> SwipeHistoryOut:
+    return SwipeHistoryOut(
+        id=swipe.id, target_user_id=swipe.to_user_id, like=swipe.like, created_at=swipe.created_at
+    )
+
+
+@router.get("/swipes/history", response_model=List[SwipeHistoryOut])
+def swipe_history(
+    limit: int = 50,
+    before_id: Optional[int] = None,
+    current: User = Depends(get_current_user),
+    shards: ShardSessions = Depends(get_shards),
+):
+    """
+    Мои свайпы, новые первыми (keyset по id, индекс from_user_id + id).
+    Следующая страница: before_id = id последнего элемента. Старые дизлайки,
+    уехавшие в архив (app.archive), здесь не показываются.
+    """
+    q = shards.for_user(current.id).query(Swipe).filter(Swipe.from_user_id == current.id)
+    if before_id is not None:
+        q = q.filter(Swipe.id < before_id)
+    rows = q.order_by(Swipe.id.desc()).limit(max(1, min(limit, 100))).all()
+    return [_history_out(item) for item in rows]
+
+
+def _reverse_match(db: Session, shards: ShardSessions, match: Match, user_id: int) -> None:
+    """
+    Откатывает матч, который держался на отменённом лайке. Без переписки
+    матч удаляется — повторный лайк создаст его заново; с перепиской
+    гасится как при unmatch, и чат удалит purger.
+    """
+    shard = shards.for_match(match.id)
+    has_messages = any(
+        shard.execute(select(exists().where(model.match_id == match.id))).scalar()
+        for model in (Message, MessageArchive)
+    )
+    if has_messages:
+        deactivate_match(db, match, by_user_id=user_id, reason="undo")
+        return
+    record(db, "match.deleted", match.id, user1_id=match.user1_id, user2_id=match.user2_id)
+    db.delete(match)
+
+
+@router.post(
+    "/swipes/undo",
+    response_model=SwipeUndoOut,
+    dependencies=[Depends(limit_per_user("swipe_undo"))],
+)
+def undo_swipes(
+    payload: SwipeUndoIn,
+    current: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    shards: ShardSessions = Depends(get_shards),
+):
+    """
+    Отменить последние count действий (не больше SWIPE_UNDO_MAX) и матчи на них.
+    Действия идут по updated_at: новый свайп отменяется удалением, пересвайп —
+    возвратом прежней оценки (помнится одна, более ранние пересвайпы той же
+    пары отменяются вместе с самим свайпом).
+    """
+    shard = shards.for_user(current.id)
+    undone: List[SwipeHistoryOut] = []
+    unmatched: List[int] = []
+    for _ in range(max(1, min(payload.count, UNDO_MAX))):
+        swipe = (
+            shard.query(Swipe)
+            .filter(Swipe.from_user_id == current.id)
+            .order_by(Swipe.updated_at.desc(), Swipe.id.desc())
+            .first()
+        )
+        if swipe is None:
+            break
+        undone.append(_history_out(swipe))
+        if swipe.like:
+            user1_id, user2_id = sorted([current.id, swipe.to_user_id])
+            match = (
+                db.query(Match)
+                .filter(Match.user1_id == user1_id, Match.user2_id == user2_id)
+                .first()
+            )
+            if match is not None and match.is_active:
+                unmatched.append(match.id)
+                _reverse_match(db, shards, match, current.id)
+        if swipe.previous_like is None:
+            record(
+                db,
+                "swipe.deleted",
+                swipe.id,
+                from_user_id=current.id,
+                to_user_id=swipe.to_user_id,
+                like=swipe.like,
+            )
+            shard.delete(swipe)
+        else:
+            record(
+                db,
+                "swipe.updated",
+                swipe.id,
+                from_user_id=current.id,
+                to_user_id=swipe.to_user_id,
+                like=swipe.previous_like,
+                previous_like=swipe.like,
+            )
+            swipe.like, swipe.updated_at = swipe.previous_like, swipe.previous_at
+            swipe.previous_like = swipe.previous_at = None
+        # следующий запрос должен видеть отменённое (autoflush выключен)
+        shard.flush()
+        db.flush()
 
-    db.commit()
-    return SwipeOut(match=is_match)
+    shards.commit()  # шарды, затем основная БД
+    return SwipeUndoOut(undone=undone, unmatched_ids=unmatched)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional, Literal
 
 from pydantic import BaseModel, EmailStr, AnyUrl
@@ -88,7 +88,36 @@ class ListingOut(ORMBase):
     created_at: Optional[datetime] = None
 
     photo_url: Optional[AnyUrl] = None
+    # превью загруженного фото для карточки (если фото загружено через /photo)
+    thumb_url: Optional[AnyUrl] = None
     role: Optional[str] = None
+    # только в гео-режиме feed/browse: расстояние до точки поиска, км
+    distance_km: Optional[float] = None
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+    id: Optional[int] = None
+
+
+class PriceBucket(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+
+class ListingFacets(BaseModel):
+    subjects: List[FacetCount] = []
+    cities: List[FacetCount] = []
+    modes: List[FacetCount] = []
+    price: List[PriceBucket] = []
+
+
+class ListingBrowseOut(BaseModel):
+    items: List[ListingOut]
+    total: int
+    facets: ListingFacets
 
 
 class ListingCreate(BaseModel):
@@ -132,12 +161,39 @@ class SwipeIn(BaseModel):
 class SwipeOut(BaseModel):
     match: bool
 
+
+class SwipeHistoryOut(BaseModel):
+    id: int
+    target_user_id: int
+    like: bool
+    created_at: Optional[datetime] = None
+
+
+class SwipeUndoIn(BaseModel):
+    count: int = 1
+
+
+class SwipeUndoOut(BaseModel):
+    undone: List[SwipeHistoryOut]
+    # матчи, которые держались на отменённых лайках
+    unmatched_ids: List[int] = []
+
 class MatchOut(ORMBase):
     id: int
     user_id: int
     target_user_id: int
     created_at: datetime
 
+
+class BlockIn(BaseModel):
+    user_id: int
+
+
+class BlockOut(BaseModel):
+    user_id: int
+    created_at: datetime
+
+
 class MessageOut(ORMBase):
     id: int
     match_id: int
@@ -150,3 +206,46 @@ class MessageCreate(BaseModel):
     match_id: int
     body: str
 
+
+# ---------- Analytics ----------
+
+
+class UserStatsCounts(ORMBase):
+    likes_given: int = 0
+    dislikes_given: int = 0
+    likes_received: int = 0
+    matches: int = 0
+    messages_sent: int = 0
+    messages_received: int = 0
+
+
+class UserDayStatsOut(UserStatsCounts):
+    day: date
+
+
+class UserAnalyticsOut(BaseModel):
+    totals: UserStatsCounts
+    match_rate: Optional[float] = None  # matches / likes_given
+    messages_per_match: Optional[float] = None
+    days: List[UserDayStatsOut] = []
+
+
+class SegmentStatsOut(BaseModel):
+    dimension: str
+    key: str
+    student_likes: int
+    tutor_likes: int
+    matches: int
+    messages: int
+    match_rate: Optional[float] = None  # matches / student_likes
+    messages_per_match: Optional[float] = None
+
+
+# ---------- Likes ----------
+
+
+class IncomingLikeOut(BaseModel):
+    user_id: int
+    liked_at: datetime
+    # карточка лайкнувшего: объявление репетитора или карточка ученика
+    card: Optional[ListingOut] = None
@@ -0,0 +1,178 @@
+# app/search.py
+"""
+Полнотекстовый поиск по объявлениям.
+
+Индекс покрывает title, description, level, название предмета и city.
+Синхронизация с таблицей listings — триггерами в самой БД, поэтому любые
+записи (роутеры, онбординг, сид-скрипты) сразу попадают в индекс.
+
+- SQLite: виртуальная таблица FTS5 ``listings_fts`` (rowid = listings.id),
+  ранжирование bm25;
+- Postgres: колонка ``listings.search_tsv`` (tsvector) + GIN-индекс,
+  ранжирование ts_rank.
+"""
+
+import re
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.textutil import PL_FROM, PL_TO, fold_polish
+
+# веса колонок для bm25: title, description, level, subject, city
+_BM25_WEIGHTS = "10.0, 1.0, 3.0, 8.0, 3.0"
+
+# Польские буквы сводим к латинице и в индексе, и в запросе, чтобы «lodz»
+# находил «Łódź». unicode61 remove_diacritics не трогает «ł» (это отдельная
+# буква, а не диакритика), в Postgres 'simple' не снимает диакритику вообще.
+def _sqlite_fold(expr: str) -> str:
+    return f"replace(replace({expr}, 'ł', 'l'), 'Ł', 'L')"
+
+
+def _pg_fold(expr: str) -> str:
+    return f"translate(coalesce({expr}, ''), '{PL_FROM}', '{PL_TO}')"
+
+
+_SQLITE_FTS_ROW = ", ".join(
+    _sqlite_fold(expr)
+    for expr in (
+        "{row}.title",
+        "{row}.description",
+        "{row}.level",
+        "(SELECT name FROM subjects WHERE subjects.id = {row}.subject_id)",
+        "{row}.city",
+    )
+)
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5("
+    "title, description, level, subject, city, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN "
+    "INSERT INTO listings_fts (rowid, title, description, level, subject, city) "
+    f"VALUES (new.id, {_SQLITE_FTS_ROW.format(row='new')}); END",
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE ON listings BEGIN "
+    "DELETE FROM listings_fts WHERE rowid = old.id; "
+    "INSERT INTO listings_fts (rowid, title, description, level, subject, city) "
+    f"VALUES (new.id, {_SQLITE_FTS_ROW.format(row='new')}); END",
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN "
+    "DELETE FROM listings_fts WHERE rowid = old.id; END",
+    # переименование предмета меняет текст всех его объявлений
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_subject_au AFTER UPDATE OF name ON subjects BEGIN "
+    "DELETE FROM listings_fts WHERE rowid IN (SELECT id FROM listings WHERE subject_id = new.id); "
+    "INSERT INTO listings_fts (rowid, title, description, level, subject, city) "
+    f"SELECT l.id, {_SQLITE_FTS_ROW.format(row='l')} FROM listings AS l WHERE l.subject_id = new.id; END",
+]
+
+_POSTGRES_DDL = [
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS search_tsv tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_listings_search_tsv ON listings USING GIN (search_tsv)",
+    """
+    CREATE OR REPLACE FUNCTION listings_search_tsv_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_tsv :=
+            setweight(to_tsvector('simple', {title}), 'A') ||
+            setweight(to_tsvector('simple', {subject}), 'A') ||
+            setweight(to_tsvector('simple', {level}), 'B') ||
+            setweight(to_tsvector('simple', {city}), 'B') ||
+            setweight(to_tsvector('simple', {description}), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """.format(
+        title=_pg_fold("NEW.title"),
+        subject=_pg_fold("(SELECT name FROM subjects WHERE id = NEW.subject_id)"),
+        level=_pg_fold("NEW.level"),
+        city=_pg_fold("NEW.city"),
+        description=_pg_fold("NEW.description"),
+    ),
+    "DROP TRIGGER IF EXISTS trg_listings_search_tsv ON listings",
+    "CREATE TRIGGER trg_listings_search_tsv BEFORE INSERT OR UPDATE ON listings "
+    "FOR EACH ROW EXECUTE FUNCTION listings_search_tsv_update()",
+    """
+    CREATE OR REPLACE FUNCTION subjects_search_tsv_touch() RETURNS trigger AS $$
+    BEGIN
+        UPDATE listings SET subject_id = subject_id WHERE subject_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_subjects_search_tsv ON subjects",
+    "CREATE TRIGGER trg_subjects_search_tsv AFTER UPDATE OF name ON subjects "
+    "FOR EACH ROW EXECUTE FUNCTION subjects_search_tsv_touch()",
+    # бэкфилл строк, созданных до появления триггера
+    "UPDATE listings SET title = title WHERE search_tsv IS NULL",
+]
+
+
+def install(engine: Engine) -> None:
+    """Создаёт индекс и триггеры (идемпотентно). Вызывается из bootstrap."""
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            _install_sqlite(conn)
+        elif conn.dialect.name == "postgresql":
+            for stmt in _POSTGRES_DDL:
+                conn.execute(text(stmt))
+
+
+def _install_sqlite(conn: Connection) -> None:
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'listings_fts'")
+    ).first()
+    for stmt in _SQLITE_DDL:
+        conn.execute(text(stmt))
+    if not existed:
+        # индекс только что появился — заливаем уже существующие объявления
+        conn.execute(
+            text(
+                "INSERT INTO listings_fts (rowid, title, description, level, subject, city) "
+                f"SELECT l.id, {_SQLITE_FTS_ROW.format(row='l')} FROM listings AS l"
+            )
+        )
+
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _terms(query: str) -> List[str]:
+    return _WORD_RE.findall(fold_polish(query))[:10]
+
+
+def search_listing_ids(db: Session, query: str, *, limit: int, offset: int = 0) -> List[Tuple[int, float]]:
+    """
+    Возвращает [(listing_id, score)] опубликованных объявлений по убыванию
+    релевантности. Все слова запроса обязательны, последнее — как префикс
+    (поиск «на лету» по мере набора).
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    if db.bind.dialect.name == "postgresql":
+        tsquery = " & ".join(terms[:-1] + [terms[-1] + ":*"])
+        rows = db.execute(
+            text(
+                "SELECT l.id, ts_rank(l.search_tsv, q) AS score "
+                "FROM listings AS l, to_tsquery('simple', :q) AS q "
+                "WHERE l.search_tsv @@ q AND l.is_published "
+                "ORDER BY score DESC, l.id DESC LIMIT :limit OFFSET :offset"
+            ),
+            {"q": tsquery, "limit": limit, "offset": offset},
+        )
+        return [(row[0], float(row[1])) for row in rows]
+
+    # в FTS5 каждое слово берём в кавычки — никакого синтаксиса MATCH от клиента
+    match = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+    rows = db.execute(
+        text(
+            f"SELECT f.rowid, bm25(listings_fts, {_BM25_WEIGHTS}) AS rank "
+            "FROM listings_fts AS f JOIN listings AS l ON l.id = f.rowid "
+            "WHERE listings_fts MATCH :match AND l.is_published = 1 "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ),
+        {"match": match.strip(), "limit": limit, "offset": offset},
+    )
+    # bm25 в SQLite: чем меньше, тем лучше — переворачиваем знак
+    return [(row[0], -float(row[1])) for row in rows]
@@ -1,25 +1,37 @@
 import os
 import re
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
-from jose import jwt
-from passlib.context import CryptContext
+# jose и passlib тяжёлые на импорт (cryptography, bcrypt-бэкенды),
+# поэтому подтягиваем их лениво — при первом логине/проверке токена,
+# а не на старте каждого воркера.
 
 SECRET = os.getenv("JWT_SECRET", "dev-secret")
 ALGO = "HS256"
 EXPIRES_MIN = int(os.getenv("JWT_EXPIRES_MIN", "1440"))
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
 PASS_RE = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[^A-Za-z0-9]).{8,}$")
 
 
+class InvalidToken(Exception):
+    pass
+
+
+@lru_cache(maxsize=1)
+def pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
 def hash_password(raw: str) -> str:
-    return pwd.hash(raw)
+    return pwd_context().hash(raw)
 
 
 def verify_password(raw: str, hashed: str) -> bool:
-    return pwd.verify(raw, hashed)
+    return pwd_context().verify(raw, hashed)
 
 
 def validate_email(email: str) -> bool:
@@ -31,6 +43,8 @@ def validate_password_strength(password: str) -> bool:
 
 
 def create_access_token(sub: str) -> str:
+    from jose import jwt
+
     now = datetime.now(timezone.utc)
     payload = {
         "sub": sub,
@@ -38,3 +52,12 @@ def create_access_token(sub: str) -> str:
         "exp": int((now + timedelta(minutes=EXPIRES_MIN)).timestamp()),
     }
     return jwt.encode(payload, SECRET, algorithm=ALGO)
+
+
+def decode_access_token(token: str) -> dict:
+    from jose import JWTError, jwt
+
+    try:
+        return jwt.decode(token, SECRET, algorithms=[ALGO])
+    except JWTError as exc:
+        raise InvalidToken(str(exc)) from exc
@@ -22,6 +22,9 @@ from app.models import (
     UserPreference,
     Listing,
 )
+from app.lesson_types import replace_lesson_types
+from app.routers.subjects import invalidate_subjects_cache
+from app.student_cards import refresh_student_card
 from app.security import hash_password  # если у тебя другой модуль — поправь импорт
 
 
@@ -83,8 +86,8 @@ def ensure_preferences(
             group_classes=group_classes,
             city=city,
             hourly_rate=hourly_rate,
-            types=",".join(types) if types else None,
         )
+        user.preferences = pref
         db.add(pref)
     else:
         pref.online = online
@@ -92,12 +95,15 @@ def ensure_preferences(
         pref.group_classes = group_classes
         pref.city = city
         pref.hourly_rate = hourly_rate
-        pref.types = ",".join(types) if types else None
+
+    replace_lesson_types(db, pref, types)
 
     if subjects is not None:
         # many-to-many: заменим текущий набор предметов
         user.subjects = subjects
 
+    refresh_student_card(db, user)
+
 
 def create_listing_if_missing(
     db,
@@ -285,6 +291,7 @@ def seed():
         )
 
         db.commit()
+        invalidate_subjects_cache()
         print(">>> Seed completed successfully.")
         print("Created/updated users:")
         for u in db.query(User).all():
@@ -1,6 +1,7 @@
 # seed_subjects.py
 from app.db import SessionLocal
 from app.models import Subject
+from app.routers.subjects import invalidate_subjects_cache
 
 SUBJECTS = [
     "Matematyka",
@@ -16,4 +17,6 @@ for name in SUBJECTS:
         db.add(Subject(name=name))
 db.commit()
 db.close()
+# запущенные воркеры перечитают список (шина инвалидации app.cache)
+invalidate_subjects_cache()
 print("OK, subjects seeded")
@@ -0,0 +1,34 @@
+# app/serve.py
+"""
+Запуск API в multi-worker режиме с подготовкой в мастер-процессе:
+
+    python -m app.serve --workers 4 --port 8000
+
+Мастер один раз создаёт схему и только потом форкает воркеры,
+поэтому каждый новый воркер стартует без DDL.
+"""
+
+import argparse
+import os
+
+from app import bootstrap
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Korfinder API server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    args = parser.parse_args()
+
+    bootstrap.init_schema()
+    # воркеры наследуют окружение мастера
+    os.environ[bootstrap.SCHEMA_READY_ENV] = "1"
+
+    import uvicorn
+
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
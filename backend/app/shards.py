@@ -0,0 +1,269 @@
+# app/shards.py
+"""
+Разнесение самых объёмных таблиц по N базам (шардам).
+
+- swipes, swipes_archive — по from_user_id (свайпы пользователя рядом);
+- messages, messages_archive — по match_id (весь чат в одном шарде).
+
+Шарды перечисляются в SHARD_DATABASE_URLS через запятую (для тестов —
+несколько локальных SQLite-файлов). Номер шарда — key % N, поэтому N
+после запуска не меняется без переноса данных.
+
+Без SHARD_DATABASE_URLS шард один — основная БД, и ShardSessions отдаёт
+ту же сессию запроса: всё в одной транзакции, как до шардирования.
+
+С шардами:
+- id свайпов и сообщений — не autoincrement шарда, а счётчик из id_blocks
+  того же шарда, который берётся короткой отдельной транзакцией:
+  id = номер * N + номер шарда. На id ссылаются outbox, уведомления и
+  клиент, поэтому они уникальны глобально; внутри шарда (а значит, у
+  одного автора свайпов / в одном чате) они растут по времени;
+- запись в шард и в основную БД — две транзакции. ShardSessions.commit()
+  коммитит шарды первыми, чтобы события outbox и уведомления не ссылались
+  на несуществующие строки, затем основную БД. Если основная (или другой
+  шард) не закоммитилась, уже закоммиченные изменения шардов откатываются
+  компенсацией: вставленные строки удаляются, изменённые и удалённые —
+  восстанавливаются. Иначе свайп или сообщение остались бы без события
+  outbox и ключа идемпотентности, и повтор запроса записал бы дубль;
+- связей и JOIN'ов между шардом и основной БД нет: id матчей сначала
+  читаются из основной БД, потом по ним идут запросы в шарды.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from fastapi import Depends
+from sqlalchemy import and_, create_engine, delete, event, func, inspect, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db import Base, connect_args_for, get_db, session_factory_for
+from app.models import IdBlock, Message, MessageArchive, Swipe, SwipeArchive
+
+log = logging.getLogger(__name__)
+
+SHARD_URLS: List[str] = [u.strip() for u in os.getenv("SHARD_DATABASE_URLS", "").split(",") if u.strip()]
+
+SHARD_TABLES = (
+    Swipe.__table__,
+    SwipeArchive.__table__,
+    Message.__table__,
+    MessageArchive.__table__,
+    IdBlock.__table__,
+)
+
+# таблица -> колонка ключа шардирования
+_SHARD_KEYS = {
+    "swipes": "from_user_id",
+    "swipes_archive": "from_user_id",
+    "messages": "match_id",
+    "messages_archive": "match_id",
+}
+
+_engines = [
+    create_engine(url, echo=False, future=True, connect_args=connect_args_for(url)) for url in SHARD_URLS
+]
+_factories = [
+    sessionmaker(bind=e, autoflush=False, autocommit=False, future=True) for e in _engines
+]
+
+
+def is_sharded() -> bool:
+    return bool(_engines)
+
+
+def count() -> int:
+    return len(_engines) or 1
+
+
+def shard_of(key: int) -> int:
+    return key % count()
+
+
+def group_by_shard(keys: Iterable[int]) -> Dict[int, List[int]]:
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for key in keys:
+        groups[shard_of(key)].append(key)
+    return groups
+
+
+def install_schema() -> List[Engine]:
+    """
+    Создаёт шардированные таблицы в каждом шарде. Возвращает движки шардов —
+    колонки и индексы, добавленные позже, докатывает app.bootstrap.
+    """
+    for shard_engine in _engines:
+        Base.metadata.create_all(bind=shard_engine, tables=list(SHARD_TABLES))
+    return list(_engines)
+
+
+# --- id -----------------------------------------------------------------------
+
+
+def _next_seq(index: int, table: str) -> int:
+    """
+    Следующий номер счётчика table в шарде — отдельной короткой транзакцией,
+    а не в транзакции вставки: иначе строка счётчика оставалась бы
+    заблокированной до конца запроса и все вставки в шард шли бы по одной.
+    Номер, взятый откатившимся запросом, просто пропускается — keyset'ам
+    нужен только рост внутри шарда, а не id без дыр.
+    """
+    bump = (
+        update(IdBlock)
+        .where(IdBlock.name == table)
+        .values(next_id=IdBlock.next_id + 1)
+        .returning(IdBlock.next_id)
+    )
+    while True:
+        with _engines[index].begin() as conn:
+            taken = conn.execute(bump).scalar()
+            if taken is not None:
+                return taken - 1
+            # первый id в шарде: продолжаем после уже существующих строк
+            top = 0
+            for t in (Base.metadata.tables[table], Base.metadata.tables[f"{table}_archive"]):
+                top = max(top, conn.execute(select(func.max(t.c.id))).scalar() or 0)
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(IdBlock).values(name=table, next_id=top // count() + 2))
+            except IntegrityError:
+                continue  # другой процесс успел создать счётчик
+            return top // count() + 1
+
+
+def _pk_filter(obj):
+    table = obj.__table__
+    return and_(*[column == getattr(obj, column.key) for column in table.primary_key.columns])
+
+
+def _row(obj) -> dict:
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def next_id(index: int, table: str) -> int:
+    """id = номер в шарде * N + номер шарда: уникален глобально и растёт внутри шарда."""
+    return _next_seq(index, table) * count() + index
+
+
+# --- сессии -------------------------------------------------------------------
+
+
+def session_factory(index: int, db: Session) -> Callable[[], Session]:
+    """Фабрика сессий шарда (для потоковых ответов); без шардов — как у db."""
+    return _factories[index] if is_sharded() else session_factory_for(db)
+
+
+class ShardSessions:
+    """
+    Сессии шардов на один запрос или проход воркера. Открываются лениво;
+    без шардирования везде возвращается primary.
+    """
+
+    def __init__(self, primary: Session) -> None:
+        self.primary = primary
+        self._open: Dict[int, Session] = {}
+        # шард -> компенсирующие запросы для уже записанных изменений
+        self._undo: Dict[int, list] = defaultdict(list)
+
+    def get(self, index: int) -> Session:
+        if not is_sharded():
+            return self.primary
+        session = self._open.get(index)
+        if session is None:
+            session = self._open[index] = _factories[index]()
+            event.listen(session, "after_flush", lambda s, _: self._track(index, s))
+        return session
+
+    def _track(self, index: int, session: Session) -> None:
+        """Запоминает, как откатить то, что flush записал в шард (см. commit())."""
+        undo = self._undo[index]
+        for obj in session.new:
+            if obj.__tablename__ in _SHARD_KEYS:
+                undo.append(delete(obj.__table__).where(_pk_filter(obj)))
+        for obj in session.dirty:
+            if obj.__tablename__ in _SHARD_KEYS:
+                state = inspect(obj)
+                old = {
+                    attr.key: attr.history.deleted[0]
+                    for attr in state.attrs
+                    if attr.key in obj.__table__.c and attr.history.deleted
+                }
+                if old:
+                    undo.append(update(obj.__table__).where(_pk_filter(obj)).values(**old))
+        for obj in session.deleted:
+            if obj.__tablename__ in _SHARD_KEYS:
+                undo.append(insert(obj.__table__).values(**_row(obj)))
+
+    def for_user(self, user_id: int) -> Session:
+        return self.get(shard_of(user_id))
+
+    def for_match(self, match_id: int) -> Session:
+        return self.get(shard_of(match_id))
+
+    def each(self) -> Iterator[Tuple[int, Session]]:
+        for index in range(count()):
+            yield index, self.get(index)
+
+    def add(self, obj) -> Session:
+        """Кладёт строку в её шард (по ключу таблицы). Возвращает сессию шарда."""
+        table = obj.__tablename__
+        index = shard_of(getattr(obj, _SHARD_KEYS[table]))
+        session = self.get(index)
+        if is_sharded() and obj.id is None and table in ("swipes", "messages"):
+            obj.id = next_id(index, table)
+        session.add(obj)
+        return session
+
+    def commit(self) -> None:
+        """
+        Коммитит открытые шарды, затем основную БД. Если что-то не
+        закоммитилось, откатывает и уже закоммиченные шарды (компенсацией).
+        """
+        committed: List[int] = []
+        try:
+            for index, session in self._open.items():
+                session.commit()
+                committed.append(index)
+            self.primary.commit()
+        except Exception:
+            for session in self._open.values():
+                session.rollback()
+            self.primary.rollback()
+            self._compensate(committed)
+            raise
+        finally:
+            self._undo.clear()
+
+    def _compensate(self, indexes: List[int]) -> None:
+        for index in indexes:
+            statements = self._undo.get(index)
+            if not statements:
+                continue
+            try:
+                with _engines[index].begin() as conn:
+                    for stmt in reversed(statements):
+                        conn.execute(stmt)
+            except Exception:
+                log.exception("shard %s: compensation failed, %d statements lost", index, len(statements))
+
+    def close(self) -> None:
+        for session in self._open.values():
+            session.close()
+        self._open.clear()
+
+    def __enter__(self) -> "ShardSessions":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def get_shards(db: Session = Depends(get_db)) -> Iterator[ShardSessions]:
+    shards = ShardSessions(db)
+    try:
+        yield shards
+    finally:
+        shards.close()
@@ -0,0 +1,72 @@
+# app/streaming.py
+"""
+Потоковые ответы в NDJSON для больших списков (сообщения, объявления).
+
+Клиент просит поток заголовком ``Accept: application/x-ndjson``. Тогда
+строки читаются курсором пачками по STREAM_CHUNK (yield_per) и кодируются
+по одной пачке за раз: память на запрос не растёт с размером выборки,
+первая пачка уходит клиенту, пока остальные ещё читаются из БД.
+
+Генератор открывает свою сессию — он работает уже после того, как
+обработчик запроса вернул ответ.
+"""
+
+import json
+import os
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.db import SessionLocal
+
+NDJSON = "application/x-ndjson"
+STREAM_CHUNK = int(os.getenv("STREAM_CHUNK", "200"))
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+
+def iter_ndjson(
+    statements: Iterable[Select],
+    encode: Callable[[Any], Any],
+    *,
+    limit: Optional[int] = None,
+    chunk: int = STREAM_CHUNK,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Iterator[str]:
+    """
+    Выполняет statements по очереди и отдаёт строки NDJSON пачками.
+    limit — общий лимит строк на все statements (None — без лимита).
+    """
+    left = limit
+    with session_factory() as db:
+        for stmt in statements:
+            if left is not None:
+                if left <= 0:
+                    return
+                stmt = stmt.limit(left)
+            result = db.execute(stmt.execution_options(yield_per=chunk)).scalars()
+            for rows in result.partitions():
+                if left is not None:
+                    left -= len(rows)
+                yield "".join(
+                    json.dumps(jsonable_encoder(encode(row)), ensure_ascii=False) + "\n"
+                    for row in rows
+                )
+
+
+def ndjson_response(
+    statements: Iterable[Select],
+    encode: Callable[[Any], Any],
+    *,
+    limit: Optional[int] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> StreamingResponse:
+    return StreamingResponse(
+        iter_ndjson(statements, encode, limit=limit, session_factory=session_factory), media_type=NDJSON
+    )
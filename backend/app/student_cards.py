@@ -0,0 +1,100 @@
+# app/student_cards.py
+"""Материализованные карточки учеников (student_cards) для feed репетитора."""
+
+from typing import List
+
+from sqlalchemy.orm import Session, selectinload
+
+from app.models import StudentCard, User, UserPreference, UserRole
+from app.schemas import ListingOut
+
+
+def build_card_fields(user: User) -> dict:
+    pref = user.preferences
+    subject_name = user.subjects[0].name if user.subjects else None
+
+    types = pref.type_names if pref else []
+    level = ", ".join(types) if types else None
+
+    desc_parts: List[str] = []
+    if types:
+        desc_parts.append("Potrzebuje wsparcia w: " + ", ".join(types) + ".")
+    if pref:
+        if pref.online and pref.offline:
+            desc_parts.append("Zajęcia online lub stacjonarnie.")
+        elif pref.online:
+            desc_parts.append("Preferuje zajęcia online.")
+        elif pref.offline:
+            desc_parts.append("Preferuje zajęcia stacjonarne.")
+        if pref.city:
+            desc_parts.append(f"Miasto: {pref.city}.")
+    description = " ".join(desc_parts) or "Aktywny uczeń szuka korepetycji."
+
+    title_subject = f" z {subject_name}" if subject_name else ""
+    title = f"{user.first_name} szuka korepetytora{title_subject}"
+
+    return {
+        "title": title,
+        "description": description,
+        "level": level,
+        "subject": subject_name,
+        "hourly_rate": pref.hourly_rate if pref else None,
+        "city": pref.city if pref else None,
+        "created_at": user.created_at,
+    }
+
+
+def refresh_student_card(db: Session, user: User) -> None:
+    """Пересобирает карточку ученика (без commit). Для репетиторов — no-op."""
+    if user.role != UserRole.student:
+        return
+    fields = build_card_fields(user)
+    card = db.get(StudentCard, user.id)
+    if card is None:
+        db.add(StudentCard(user_id=user.id, **fields))
+    else:
+        for key, value in fields.items():
+            setattr(card, key, value)
+
+
+def backfill_student_cards(db: Session, batch_size: int = 500) -> int:
+    """Создаёт карточки ученикам, у которых их ещё нет (после деплоя)."""
+    created = 0
+    while True:
+        users = (
+            db.query(User)
+            .outerjoin(StudentCard, StudentCard.user_id == User.id)
+            .filter(StudentCard.user_id.is_(None))
+            .filter(User.role == UserRole.student)
+            .filter(User.onboarding_done == True)  # noqa: E712
+            .options(
+                selectinload(User.preferences).selectinload(UserPreference.lesson_types),
+                selectinload(User.subjects),
+            )
+            .limit(batch_size)
+            .all()
+        )
+        if not users:
+            return created
+        for user in users:
+            refresh_student_card(db, user)
+        db.commit()
+        created += len(users)
+
+
+def card_to_listing(card: StudentCard) -> ListingOut:
+    return ListingOut(
+        id=-card.user_id,
+        owner_id=card.user_id,
+        tutor_id=card.user_id,
+        title=card.title,
+        description=card.description,
+        subject=card.subject,
+        level=card.level,
+        price_per_hour=card.hourly_rate,
+        city=card.city,
+        is_published=True,
+        created_at=card.created_at,
+        photo_url=None,
+        role=UserRole.student.value,
+    )
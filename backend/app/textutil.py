@@ -0,0 +1,12 @@
+# app/textutil.py
+"""Мелкие текстовые хелперы, общие для поиска и геокодинга."""
+
+# польские буквы -> латиница
+PL_FROM = "ąćęłńóśźżĄĆĘŁŃÓŚŹŻ"
+PL_TO = "acelnoszzACELNOSZZ"
+_PL_TABLE = str.maketrans(PL_FROM, PL_TO)
+
+
+def fold_polish(value: str) -> str:
+    """«Łódź» -> «lodz»: нижний регистр и без польских диакритик."""
+    return value.lower().translate(_PL_TABLE)
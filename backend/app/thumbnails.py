@@ -0,0 +1,40 @@
+# app/thumbnails.py
+"""
+Генерация превью фотографий. Выполняется в пуле процессов (app.blobs),
+поэтому модуль намеренно лёгкий: только Pillow, без БД и FastAPI.
+
+Pillow — опциональная зависимость: без неё превью не строятся, а вместо
+них отдаётся оригинал.
+"""
+
+import os
+from typing import Dict, Tuple
+
+
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def make_thumbnails(src: str, targets: Dict[str, Tuple[str, int]], quality: int = 80) -> Dict[str, str]:
+    """
+    Сжимает src в JPEG-превью. targets: {вариант: (путь, макс. сторона)}.
+    Возвращает {вариант: путь} для созданных файлов.
+    """
+    from PIL import Image, ImageOps
+
+    done: Dict[str, str] = {}
+    with Image.open(src) as original:
+        # учитываем поворот из EXIF — иначе вертикальные фото с телефона лягут набок
+        image = ImageOps.exif_transpose(original).convert("RGB")
+        for variant, (path, size) in targets.items():
+            thumb = image.copy()
+            thumb.thumbnail((size, size), Image.LANCZOS)
+            tmp = f"{path}.tmp{os.getpid()}"
+            thumb.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+            os.replace(tmp, path)
+            done[variant] = path
+    return done
@@ -0,0 +1,95 @@
+# app/warmup.py
+"""
+Прогрев воркера перед тем, как отдавать трафик.
+
+- проверяем, что БД вообще отвечает (SELECT 1);
+- открываем несколько соединений, чтобы пул не был холодным;
+- заполняем кэш предметов;
+- один раз выполняем «горячие» запросы (auth, feed, matches, messages),
+  чтобы SQLAlchemy скомпилировал их и положил в свой compiled cache.
+
+Пока прогрев не прошёл, /health/ready отвечает 503.
+"""
+
+import logging
+import os
+from contextlib import ExitStack
+
+from sqlalchemy import or_, text
+
+from app.db import SessionLocal, engine
+
+log = logging.getLogger(__name__)
+
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+
+_ready = False
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def check_db() -> bool:
+    """Дешёвая проверка доступности БД: берём соединение из пула и делаем SELECT 1."""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:  # noqa: BLE001 — для health нам важен только факт ошибки
+        log.exception("DB check failed")
+        return False
+
+
+def _warm_pool() -> None:
+    # Открываем сразу несколько соединений и возвращаем их в пул —
+    # первые параллельные запросы после деплоя не будут ждать connect().
+    size = getattr(engine.pool, "size", lambda: 1)()
+    count = max(1, min(WARMUP_CONNECTIONS, size))
+    with ExitStack() as stack:
+        for _ in range(count):
+            conn = stack.enter_context(engine.connect())
+            conn.execute(text("SELECT 1"))
+
+
+def _warm_hot_queries() -> None:
+    # импорты здесь, чтобы не тянуть роутеры при импорте модуля
+    from app.models import Match, Message, User, UserRole
+    from app.routers.feed import _student_profiles_feed, _tutor_listings_feed
+    from app.routers.subjects import load_subjects
+
+    # «пустые» пользователи: нужны только id/role для построения запросов
+    student = User(id=0, role=UserRole.student)
+    tutor = User(id=0, role=UserRole.tutor)
+
+    with SessionLocal() as db:
+        load_subjects(db, refresh=True)
+        # get_current_user
+        db.query(User).filter(User.email == "").first()
+        # feed для ученика и для репетитора
+        _tutor_listings_feed(current_user=student, limit=1, exclude_ids=set(), db=db)
+        _student_profiles_feed(current_user=tutor, limit=1, exclude_ids=set(), db=db)
+        # matches / messages
+        db.query(Match).filter(Match.is_active == True).filter(  # noqa: E712
+            or_(Match.user1_id == 0, Match.user2_id == 0)
+        ).order_by(Match.created_at.desc()).all()
+        db.query(Message).filter(Message.match_id == 0).order_by(
+            Message.created_at.asc()
+        ).limit(1).all()
+
+
+def warm_up() -> bool:
+    """Прогревает воркер. Возвращает True, если всё прошло и воркер готов."""
+    global _ready
+    if not check_db():
+        _ready = False
+        return False
+    try:
+        _warm_pool()
+        _warm_hot_queries()
+    except Exception:  # noqa: BLE001
+        log.exception("Warmup failed")
+        _ready = False
+        return False
+    _ready = True
+    return True
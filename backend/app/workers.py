@@ -0,0 +1,73 @@
+# app/workers.py
+"""
+Фоновые задачи внутри процесса API.
+
+BackgroundWorker крутит job() в отдельном потоке: раз в interval секунд или
+сразу по wake(). Если job() вернул truthy (обработал полную пачку и работа,
+скорее всего, ещё есть), следующий проход запускается без паузы.
+"""
+
+import logging
+import threading
+from typing import Callable, List, Optional
+
+log = logging.getLogger(__name__)
+
+_registry: List["BackgroundWorker"] = []
+
+
+class BackgroundWorker:
+    def __init__(self, name: str, job: Callable[[], object], interval: float) -> None:
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        _registry.append(self)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"worker-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_once(self) -> object:
+        try:
+            return self.job()
+        except Exception:  # noqa: BLE001 — воркер не должен умирать от одной ошибки
+            log.exception("Background job %s failed", self.name)
+            return None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            more = self.run_once()
+            if more and not self._stop.is_set():
+                continue
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def start_all() -> None:
+    for worker in _registry:
+        worker.start()
+
+
+def stop_all() -> None:
+    for worker in _registry:
+        worker.stop()
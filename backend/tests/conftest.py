@@ -0,0 +1,66 @@
+"""
+Общее окружение тестов. Приложение импортируется один раз на процесс
+pytest, поэтому переменные окружения выставляются здесь, до первого
+импорта app: основная БД и три шарда (SHARD_DATABASE_URLS) — локальные
+SQLite-файлы во временной папке, фоновые воркеры выключены.
+
+Запуск: cd backend && python -m pytest tests
+"""
+
+import itertools
+import os
+import tempfile
+
+_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_dir}/primary.db"
+os.environ["SHARD_DATABASE_URLS"] = ",".join(f"sqlite:///{_dir}/shard{i}.db" for i in range(3))
+os.environ["BACKGROUND_WORKERS"] = "0"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Subject  # noqa: E402
+
+P = "/api/v1"
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def client():
+    # autouse: startup-хуки создают схему и для тестов без HTTP-запросов
+    with TestClient(app) as c:
+        with SessionLocal() as db:
+            db.add_all([Subject(name=name) for name in ("Matematyka", "Fizyka")])
+            db.commit()
+        yield c
+
+
+@pytest.fixture(scope="session")
+def register(client):
+    """register(name, role) -> (user_id, headers): новый пользователь с анкетой."""
+
+    def register(name: str, role: str = "student"):
+        r = client.post(
+            P + "/auth/register",
+            json=dict(
+                first_name=name,
+                last_name="X",
+                email=f"{name}.{next(_emails)}@ex.com",
+                role=role,
+                password="Abcdef1!",
+            ),
+        )
+        assert r.status_code == 200, r.text
+        headers = {"Authorization": "Bearer " + r.json()["token"]}
+        r = client.post(
+            P + "/onboarding",
+            headers=headers,
+            json=dict(online=True, offline=False, city="Koszalin", hourly_rate=80, types=["matura"], subjects=[1]),
+        )
+        assert r.status_code == 200, r.text
+        return client.get(P + "/auth/me", headers=headers).json()["id"], headers
+
+    return register
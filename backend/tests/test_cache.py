@@ -0,0 +1,72 @@
+"""
+Кэш (app.cache): локальный бэкенд и шина инвалидации между процессами.
+«Другой процесс» имитируется строкой cache_invalidations с чужим origin.
+"""
+
+from sqlalchemy import insert
+
+from app import cache
+from app.cache import Cache, LocalBackend
+from app.db import engine
+from app.models import CacheInvalidation
+
+
+def _publish_from_other_process(namespace: str, key=None) -> None:
+    with engine.begin() as conn:
+        conn.execute(insert(CacheInvalidation).values(namespace=namespace, key=key, origin="other-process"))
+
+
+def test_local_backend_lru_and_ttl():
+    backend = LocalBackend(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")  # a — самый свежий
+    backend.set("c", 3, ttl=60)
+    assert backend.get("b") is cache._MISSING
+    assert backend.get("a") == 1
+
+    backend.set("old", 1, ttl=-1)
+    assert backend.get("old") is cache._MISSING
+
+
+def test_bus_delivers_other_process_invalidations():
+    c = Cache("test-bus", ttl=60)
+    cache.poll_invalidations()  # первый вызов только запоминает конец шины
+    c.set("k1", 1)
+    c.set("k2", 2)
+
+    _publish_from_other_process("test-bus", "k1")
+    assert cache.poll_invalidations() == 1
+    assert c.get("k1") is None
+    assert c.get("k2") == 2
+
+    # без ключа — весь namespace
+    _publish_from_other_process("test-bus")
+    cache.poll_invalidations()
+    assert c.get("k2") is None
+
+
+def test_own_invalidations_are_not_reapplied():
+    c = Cache("test-bus-own", ttl=60)
+    cache.poll_invalidations()
+    c.set("k", 1)
+    c.invalidate("k")  # локально уже выброшено, в шину ушло с нашим origin
+    assert c.get("k") is None
+
+    c.set("k", 2)
+    assert cache.poll_invalidations() == 0
+    assert c.get("k") == 2
+
+
+def test_get_or_load_caches_loader_result():
+    c = Cache("test-load", ttl=60)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert c.get_or_load("x", load) == {"value": 1}
+    assert c.get_or_load("x", load) == {"value": 1}
+    c.invalidate()
+    assert c.get_or_load("x", load) == {"value": 2}
@@ -0,0 +1,123 @@
+"""
+Idempotency-Key (app.idempotency): повтор отдаёт сохранённый ответ,
+занятый ключ — 409, освобождение после ошибки и перехват ключа,
+брошенного упавшим процессом.
+"""
+
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from app import idempotency
+from app.db import SessionLocal, engine
+from app.idempotency import Idempotency
+from app.models import IdempotencyKey
+
+P = "/api/v1"
+
+
+@pytest.fixture(scope="module")
+def user_id(register):
+    return register("idem")[0]
+
+
+def _age(user_id: int, key: str, delta: timedelta) -> None:
+    """Сдвигает захват ключа в прошлое — как будто его процесс давно умер."""
+    where = (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    with engine.begin() as conn:
+        created_at = conn.execute(select(IdempotencyKey.created_at).where(*where)).scalar_one()
+        conn.execute(update(IdempotencyKey).where(*where).values(created_at=created_at - delta))
+
+
+def _finish(idem: Idempotency, content: dict) -> None:
+    with SessionLocal() as db:
+        idem.finish(db, content, status_code=201)
+        db.commit()
+
+
+def test_without_header_nothing_is_stored(user_id):
+    idem = Idempotency("test", None)
+    assert idem.start(user_id, {"a": 1}) is None
+    _finish(idem, {"ok": True})
+    with SessionLocal() as db:
+        assert db.query(IdempotencyKey).filter(IdempotencyKey.scope == "test").count() == 0
+
+
+def test_replay_conflict_and_mismatch(user_id):
+    first = Idempotency("test", "k-replay")
+    assert first.start(user_id, {"a": 1}) is None
+
+    # первый запрос ещё идёт
+    with pytest.raises(HTTPException) as exc:
+        Idempotency("test", "k-replay").start(user_id, {"a": 1})
+    assert exc.value.status_code == 409
+    assert exc.value.headers == {"Retry-After": "1"}
+
+    _finish(first, {"id": 7})
+    replay = Idempotency("test", "k-replay").start(user_id, {"a": 1})
+    assert replay.status_code == 201
+    assert replay.body == b'{"id":7}'
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+    with pytest.raises(HTTPException) as exc:
+        Idempotency("test", "k-replay").start(user_id, {"a": 2})
+    assert exc.value.status_code == 422
+
+
+def test_release_lets_retry_run_again(user_id):
+    failed = Idempotency("test", "k-release")
+    failed.start(user_id, {"a": 1})
+    failed.release()  # обработчик упал, ответа нет
+
+    retry = Idempotency("test", "k-release")
+    assert retry.start(user_id, {"a": 1}) is None
+    _finish(retry, {"id": 1})
+    # release после сохранённого ответа ключ не трогает
+    retry.release()
+    assert Idempotency("test", "k-release").start(user_id, {"a": 1}).status_code == 201
+
+
+def test_stale_claim_taken_over(user_id):
+    slow = Idempotency("test", "k-takeover")
+    slow.start(user_id, {"a": 1})
+
+    # моложе CLAIM_TIMEOUT — ключ ещё чужой
+    _age(user_id, "k-takeover", idempotency.CLAIM_TIMEOUT / 2)
+    with pytest.raises(HTTPException):
+        Idempotency("test", "k-takeover").start(user_id, {"a": 1})
+
+    _age(user_id, "k-takeover", idempotency.CLAIM_TIMEOUT)
+    retry = Idempotency("test", "k-takeover")
+    assert retry.start(user_id, {"a": 1}) is None
+
+    # первый запрос всё-таки дошёл до finish — ключ уже не его, запись откатится
+    with SessionLocal() as db:
+        with pytest.raises(HTTPException) as exc:
+            slow.finish(db, {"id": "slow"})
+        assert exc.value.status_code == 409
+        db.rollback()
+    # и его release не снимает чужой захват
+    slow.release()
+
+    _finish(retry, {"id": "retry"})
+    assert Idempotency("test", "k-takeover").start(user_id, {"a": 1}).body == b'{"id":"retry"}'
+
+
+def test_failed_handler_releases_key(client, register):
+    (student_id, student), (tutor_id, tutor) = register("idem-student"), register("idem-tutor", "tutor")
+    headers = {**student, "Idempotency-Key": "swipe-1"}
+    body = {"target_user_id": tutor_id, "like": True}
+
+    client.post(P + "/blocks", headers=tutor, json={"user_id": student_id})
+    r = client.post(P + "/swipes", headers=headers, json=body)
+    assert r.status_code == 403  # ошибка после start() — ключ освобождается
+    client.delete(P + f"/blocks/{student_id}", headers=tutor)
+
+    # повтор с тем же ключом выполняется заново, а не отдаёт 403
+    r = client.post(P + "/swipes", headers=headers, json=body)
+    assert r.status_code == 200, r.text
+    again = client.post(P + "/swipes", headers=headers, json=body)
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == r.json()
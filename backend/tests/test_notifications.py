@@ -0,0 +1,136 @@
+"""
+Push-уведомления (app.notifications): склейка по получателю, захват
+пачки claim_token'ом и доставка через MemorySender.
+"""
+
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+
+from app import notifications
+from app.db import SessionLocal
+from app.models import NotificationOutbox
+from app.notifications import MemorySender, coalesce, deliver_pending
+
+P = "/api/v1"
+
+
+def _row(recipient_id: int, kind: str, match_id: Optional[int], **payload) -> NotificationOutbox:
+    return NotificationOutbox(recipient_id=recipient_id, kind=kind, match_id=match_id, payload=json.dumps(payload))
+
+
+@pytest.fixture
+def sender():
+    # очередь общая с другими тестами — сначала доставляем накопленное
+    notifications.set_sender(MemorySender())
+    while deliver_pending():
+        pass
+    sender = MemorySender()
+    notifications.set_sender(sender)
+    yield sender
+    notifications.set_sender(None)
+
+
+def test_coalesce_one_notification_per_recipient():
+    rows = [
+        _row(1, "message", 10, preview="a"),
+        _row(2, "match", 11),
+        _row(1, "message", 10, preview="b"),
+        _row(1, "message", 12, preview="ostatnia"),
+        _row(3, "match", 13),
+        _row(3, "message", 13, preview="x"),
+    ]
+    by_recipient = {n.recipient_id: n for n in coalesce(rows)}
+
+    assert len(by_recipient) == 3
+    assert by_recipient[1].title == "3 nowe wiadomości"
+    assert by_recipient[1].body == "ostatnia"
+    assert by_recipient[1].data == {"match_ids": [10, 12], "matches": 0, "messages": 3}
+    assert by_recipient[2].title == "Nowe dopasowanie!"
+    assert by_recipient[3].title == "Masz nowe powiadomienia"
+
+
+@pytest.mark.parametrize(
+    "count, title",
+    [
+        (1, "Nowa wiadomość"),
+        (2, "2 nowe wiadomości"),
+        (5, "5 nowych wiadomości"),
+        (12, "12 nowych wiadomości"),
+        (22, "22 nowe wiadomości"),
+    ],
+)
+def test_coalesce_polish_plurals(count, title):
+    [notification] = coalesce([_row(1, "message", 1, preview="x") for _ in range(count)])
+    assert notification.title == title
+
+
+def test_sender_from_env(monkeypatch):
+    monkeypatch.setenv("NOTIFY_SENDER", "app.notifications:MemorySender")
+    notifications.set_sender(None)
+    try:
+        sender = notifications.get_sender()
+        assert isinstance(sender, MemorySender)
+        assert notifications.get_sender() is sender
+    finally:
+        notifications.set_sender(None)
+
+
+def test_match_and_messages_delivered_once(client, register, sender):
+    tutor_id, tutor = register("notif-tutor", "tutor")
+    student_id, student = register("notif-student")
+    client.post(P + "/swipes", headers=tutor, json={"target_user_id": student_id, "like": True})
+    client.post(P + "/swipes", headers=student, json={"target_user_id": tutor_id, "like": True})
+    match_id = client.get(P + "/matches", headers=student).json()[0]["id"]
+    for body in ("Cześć", "Jak się masz?", "Do jutra"):
+        r = client.post(P + "/messages", headers=student, json={"match_id": match_id, "body": body})
+        assert r.status_code == 201, r.text
+
+    assert deliver_pending() is False  # пачка неполная
+    # матч — свайпнувшему последним пуш не нужен, он узнал из ответа
+    assert [(n.recipient_id, n.title, n.body) for n in sender.sent] == [
+        (tutor_id, "Masz nowe powiadomienia", "Dopasowania: 1, wiadomości: 3.")
+    ]
+
+    # доставленное не отправляется повторно
+    deliver_pending()
+    assert len(sender.sent) == 1
+
+
+def test_claimed_rows_skipped_until_timeout(register, sender):
+    user_id, _ = register("notif-claimed")
+    with SessionLocal() as db:
+        row = _row(user_id, "match", None)
+        # строку «забрал» другой процесс только что
+        row.claim_token, row.claimed_at = "other-worker", datetime.utcnow()
+        db.add(row)
+        db.commit()
+        row_id = row.id
+
+    deliver_pending()
+    assert sender.sent == []
+
+    # процесс умер: по CLAIM_TIMEOUT строка снова в очереди
+    with SessionLocal() as db:
+        db.get(NotificationOutbox, row_id).claimed_at = (
+            datetime.utcnow() - notifications.CLAIM_TIMEOUT - timedelta(seconds=1)
+        )
+        db.commit()
+    deliver_pending()
+    assert [n.recipient_id for n in sender.sent] == [user_id]
+    with SessionLocal() as db:
+        row = db.get(NotificationOutbox, row_id)
+        assert row.delivered_at is not None and row.claim_token != "other-worker"
+
+
+def test_batch_size_limits_claim(register, sender):
+    user_ids = [register(f"notif-batch{i}")[0] for i in range(3)]
+    with SessionLocal() as db:
+        db.add_all([_row(user_id, "match", None) for user_id in user_ids])
+        db.commit()
+
+    assert deliver_pending(batch_size=2) is True  # полная пачка — возможно, есть ещё
+    assert deliver_pending(batch_size=2) is False
+    assert sorted(n.recipient_id for n in sender.sent) == sorted(user_ids)
@@ -0,0 +1,57 @@
+"""
+Потребители outbox (app.outbox): курсор сдвигается compare-and-set'ом,
+и если одноимённый потребитель в другом процессе успел раньше, работа
+handler'а откатывается вместе с несостоявшимся сдвигом.
+"""
+
+from app import outbox
+from app.db import SessionLocal
+from app.models import OutboxCursor
+from app.outbox import Consumer, advance_cursor, get_cursor, record
+
+
+def _record(count: int, topic: str) -> None:
+    with SessionLocal() as db:
+        for i in range(count):
+            record(db, f"{topic}.created", i)
+        db.commit()
+
+
+def test_advance_cursor_is_compare_and_set():
+    with SessionLocal() as db:
+        assert advance_cursor(db, "test-cas", 0, 5) is True
+        db.commit()
+        # второй «процесс» с устаревшим курсором
+        assert advance_cursor(db, "test-cas", 0, 7) is False
+        assert advance_cursor(db, "test-cas", 3, 7) is False
+        assert advance_cursor(db, "test-cas", 5, 9) is True
+        db.commit()
+        assert get_cursor(db, "test-cas") == 9
+
+
+def test_poll_handles_batch_once():
+    _record(3, "casonce")
+    seen = []
+    consumer = Consumer("test-once", lambda db, batch: seen.extend(e.id for e in batch), topics=["casonce"])
+
+    assert consumer.poll() == 3
+    assert consumer.poll() == 0
+    # второй экземпляр с тем же именем читает тот же курсор
+    assert Consumer("test-once", lambda db, batch: seen.extend(batch), topics=["casonce"]).poll() == 0
+    assert len(seen) == 3
+
+
+def test_poll_rolls_back_when_other_process_won():
+    _record(2, "caslost")
+
+    def handler(db, batch):
+        db.add(OutboxCursor(consumer="test-lost-side-effect", last_id=1))
+        # пока handler работал, другой процесс обработал ту же пачку
+        with SessionLocal() as other:
+            assert advance_cursor(other, "test-lost", 0, batch[-1].id)
+            other.commit()
+
+    assert Consumer("test-lost", handler, topics=["caslost"]).poll() == 0
+    with SessionLocal() as db:
+        assert db.get(OutboxCursor, "test-lost-side-effect") is None
+        assert get_cursor(db, "test-lost") == outbox.read_batch(db, 0, topics=["caslost"])[-1].id
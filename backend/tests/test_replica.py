@@ -0,0 +1,85 @@
+"""
+Чтение с реплики (app.db): GET идут на реплику, кроме клиента с живой
+подписанной cookie STICKY_COOKIE, которую ставит ответ на запись.
+Реплика — отдельный SQLite-файл со схемой, но без данных: «отстала»
+на всё, поэтому по ответу видно, какая БД обслужила запрос.
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import db as db_module
+from app.db import STICKY_COOKIE, Base
+
+P = "/api/v1"
+
+
+@pytest.fixture
+def replica(client, tmp_path, monkeypatch):
+    replica_engine = create_engine(f"sqlite:///{tmp_path}/replica.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=replica_engine)
+    monkeypatch.setattr(db_module, "replica_engine", replica_engine)
+    monkeypatch.setattr(
+        db_module, "ReplicaSessionLocal", sessionmaker(bind=replica_engine, autoflush=False, future=True)
+    )
+    client.cookies.clear()
+    yield replica_engine
+    client.cookies.clear()
+    replica_engine.dispose()
+
+
+def _register(client, name: str) -> dict:
+    r = client.post(
+        P + "/auth/register",
+        json=dict(first_name=name, last_name="X", email=f"{name}@ex.com", role="student", password="Abcdef1!"),
+    )
+    assert r.status_code == 200, r.text
+    return {"Authorization": "Bearer " + r.json()["token"]}
+
+
+def test_write_makes_client_read_primary(client, replica):
+    headers = _register(client, "sticky")
+    assert STICKY_COOKIE in client.cookies
+
+    # своя запись видна сразу: чтение идёт в основную БД
+    assert client.get(P + "/auth/me", headers=headers).status_code == 200
+
+    # без cookie — реплика, где пользователя ещё нет
+    client.cookies.clear()
+    r = client.get(P + "/auth/me", headers=headers)
+    assert r.status_code == 401
+    assert r.json()["detail"] == "User not found"
+
+
+def test_reads_do_not_set_cookie(client, replica):
+    headers = _register(client, "sticky-read")
+    client.cookies.clear()
+    r = client.get(P + "/subjects", headers=headers)
+    assert "set-cookie" not in r.headers
+
+
+def test_forged_or_expired_cookie_ignored(client, replica):
+    headers = _register(client, "sticky-forged")
+    until = str(int(time.time()) + 60)
+
+    client.cookies.clear()
+    client.cookies.set(STICKY_COOKIE, f"{until}.{'0' * 32}")
+    assert client.get(P + "/auth/me", headers=headers).status_code == 401
+
+    expired = str(int(time.time()) - 1)
+    client.cookies.clear()
+    client.cookies.set(STICKY_COOKIE, f"{expired}.{db_module._sign(expired)}")
+    assert client.get(P + "/auth/me", headers=headers).status_code == 401
+
+    client.cookies.clear()
+    client.cookies.set(STICKY_COOKIE, f"{until}.{db_module._sign(until)}")
+    assert client.get(P + "/auth/me", headers=headers).status_code == 200
+
+
+def test_without_replica_no_cookie(client):
+    client.cookies.clear()
+    _register(client, "no-replica")
+    assert STICKY_COOKIE not in client.cookies
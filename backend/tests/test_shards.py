@@ -0,0 +1,94 @@
+"""
+Шардирование swipes/messages на нескольких локальных SQLite-файлах
+(SHARD_DATABASE_URLS): матч между пользователями из разных шардов,
+сообщения в шарде матча и откат шарда, если основная БД не закоммитилась.
+
+Окружение (основная БД и три шарда) — в conftest.py.
+"""
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app import shards
+from app.db import engine
+from app.models import Message, Swipe
+
+P = "/api/v1"
+
+
+def _count(index: int, model, *where) -> int:
+    with shards._engines[index].connect() as conn:
+        return conn.execute(select(func.count()).select_from(model).where(*where)).scalar()
+
+
+@pytest.fixture(scope="module")
+def users(register):
+    # подряд идущие id: tutor и student — в разных шардах
+    roles = (("tutor", "tutor"), ("other", "tutor"), ("student", "student"))
+    return {name: register(name, role) for name, role in roles}
+
+
+@pytest.fixture(scope="module")
+def match_id(client, users):
+    (tutor_id, tutor), (student_id, student) = users["tutor"], users["student"]
+    assert shards.shard_of(tutor_id) != shards.shard_of(student_id)
+
+    r = client.post(P + "/swipes", headers=tutor, json={"target_user_id": student_id, "like": True})
+    assert r.json() == {"match": False}
+    # встречный лайк ищется в шарде второго пользователя
+    r = client.post(P + "/swipes", headers=student, json={"target_user_id": tutor_id, "like": True})
+    assert r.json() == {"match": True}
+
+    matches = client.get(P + "/matches", headers=student).json()
+    assert [m["target_user_id"] for m in matches] == [tutor_id]
+    return matches[0]["id"]
+
+
+def test_swipes_live_in_author_shard(users, match_id):
+    for name in ("tutor", "student"):
+        user_id = users[name][0]
+        for index in range(shards.count()):
+            expected = 1 if index == shards.shard_of(user_id) else 0
+            assert _count(index, Swipe, Swipe.from_user_id == user_id) == expected
+
+
+def test_messages_routed_to_match_shard(client, users, match_id):
+    r = client.post(P + "/messages", headers=users["student"][1], json={"match_id": match_id, "body": "Cześć"})
+    assert r.status_code == 201, r.text
+    assert shards.shard_of(r.json()["id"]) == shards.shard_of(match_id)
+
+    for index in range(shards.count()):
+        expected = 1 if index == shards.shard_of(match_id) else 0
+        assert _count(index, Message, Message.match_id == match_id) == expected
+
+    listed = client.get(P + f"/messages?match_id={match_id}", headers=users["tutor"][1]).json()
+    assert [m["body"] for m in listed] == ["Cześć"]
+
+
+def test_failed_primary_commit_rolls_back_shard(client, users, match_id):
+    headers = {**users["tutor"][1], "Idempotency-Key": "msg-1"}
+    body = {"match_id": match_id, "body": "Dzień dobry"}
+    index = shards.shard_of(match_id)
+    before = _count(index, Message, Message.match_id == match_id)
+
+    def fail(session):
+        if session.get_bind() is engine:
+            raise RuntimeError("primary is down")
+
+    event.listen(Session, "before_commit", fail)
+    try:
+        with pytest.raises(RuntimeError):
+            client.post(P + "/messages", headers=headers, json=body)
+    finally:
+        event.remove(Session, "before_commit", fail)
+    # сообщение уже было в шарде — компенсация его удалила
+    assert _count(index, Message, Message.match_id == match_id) == before
+
+    # повтор с тем же ключом выполняется заново и пишет ровно одно сообщение
+    r = client.post(P + "/messages", headers=headers, json=body)
+    assert r.status_code == 201, r.text
+    again = client.post(P + "/messages", headers=headers, json=body)
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == r.json()
+    assert _count(index, Message, Message.match_id == match_id) == before + 1
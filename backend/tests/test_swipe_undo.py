@@ -0,0 +1,59 @@
+"""
+Отмена свайпов (POST /swipes/undo): порядок по времени действия, а не по
+созданию свайпа; пересвайп возвращает прежнюю оценку; матч на отменённом
+лайке удаляется.
+"""
+
+import pytest
+
+P = "/api/v1"
+
+
+@pytest.fixture
+def users(register):
+    roles = (("undo-student", "student"), ("undo-tutor1", "tutor"), ("undo-tutor2", "tutor"))
+    return [register(name, role) for name, role in roles]
+
+
+def _history(client, headers) -> dict:
+    return {s["target_user_id"]: s["like"] for s in client.get(P + "/swipes/history", headers=headers).json()}
+
+
+def test_reswipe_undone_first_and_restores_previous(client, users):
+    (student_id, student), (tutor1_id, tutor1), (tutor2_id, _) = users
+
+    def swipe(target_id, like):
+        return client.post(P + "/swipes", headers=student, json={"target_user_id": target_id, "like": like}).json()
+
+    swipe(tutor1_id, False)  # старый дизлайк
+    swipe(tutor2_id, True)  # более новый лайк
+    client.post(P + "/swipes", headers=tutor1, json={"target_user_id": student_id, "like": True})
+    # пересвайп старого дизлайка — самое свежее действие, даёт матч
+    assert swipe(tutor1_id, True) == {"match": True}
+    match_id = client.get(P + "/matches", headers=student).json()[0]["id"]
+
+    r = client.post(P + "/swipes/undo", headers=student, json={"count": 1}).json()
+    assert [s["target_user_id"] for s in r["undone"]] == [tutor1_id]
+    assert r["unmatched_ids"] == [match_id]
+    assert _history(client, student) == {tutor1_id: False, tutor2_id: True}
+    assert client.get(P + "/matches", headers=student).json() == []
+
+    # дальше — по времени действий: лайк tutor2, затем исходный дизлайк
+    r = client.post(P + "/swipes/undo", headers=student, json={"count": 5}).json()
+    assert [s["target_user_id"] for s in r["undone"]] == [tutor2_id, tutor1_id]
+    assert _history(client, student) == {}
+
+    r = client.post(P + "/swipes/undo", headers=student, json={"count": 1}).json()
+    assert r == {"undone": [], "unmatched_ids": []}
+
+
+def test_undone_like_can_match_again(client, users):
+    (student_id, student), (tutor_id, tutor), _ = users
+    client.post(P + "/swipes", headers=tutor, json={"target_user_id": student_id, "like": True})
+    client.post(P + "/swipes", headers=student, json={"target_user_id": tutor_id, "like": True})
+
+    r = client.post(P + "/swipes/undo", headers=student, json={"count": 1}).json()
+    assert len(r["unmatched_ids"]) == 1
+    # матч без переписки удалён, а не погашен — повторный лайк создаёт новый
+    r = client.post(P + "/swipes", headers=student, json={"target_user_id": tutor_id, "like": True})
+    assert r.json() == {"match": True}